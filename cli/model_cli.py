@@ -7,15 +7,18 @@ import sys
 import os
 import argparse
 import json
+from functools import lru_cache
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, TYPE_CHECKING
 
 # 添加项目根目录到路径
 project_root = Path(__file__).parent.parent
 sys.path.insert(0, str(project_root))
 
-from core.model_manager import get_model_manager, ModelInfo
-from core.ai_config_manager import get_ai_config_manager
+# 模型管理相关模块依赖requests/yaml等，按需在各命令中延迟导入，
+# 避免 --help 等简单调用承担额外的启动开销
+if TYPE_CHECKING:
+    from core.model_manager import ModelInfo
 
 def print_header(title: str):
     """打印标题"""
@@ -27,36 +30,43 @@ def print_subheader(title: str):
     """打印子标题"""
     print(f"\n--- {title} ---")
 
-def format_model_info(model: ModelInfo, detailed: bool = False) -> str:
-    """格式化模型信息"""
+def write_lines(lines: List[str]):
+    """一次性输出多行文本，避免逐行print带来的多次写入"""
+    sys.stdout.write('\n'.join(lines) + '\n')
+
+@lru_cache(maxsize=256)
+def _format_model_info(name: str, model_id: str, recommended: bool, parameters: str,
+                       quantization: str, compatibility_score: float, description: str) -> str:
+    """按模型字段缓存格式化结果（同一次运行中模型字段不变）"""
     status = []
-    if model.recommended:
+    if recommended:
         status.append("⭐推荐")
+    if parameters:
+        status.append(f"🔢{parameters}")
+    if quantization:
+        status.append(f"🎯{quantization}")
 
-    lines = [
-        f"📱 {model.name}",
-        f"   ID: {model.id}",
-    ]
-
-    if model.parameters:
-        status.append(f"🔢{model.parameters}")
-    if model.quantization:
-        status.append(f"🎯{model.quantization}")
-
+    text = f"📱 {name}\n   ID: {model_id}\n"
     if status:
-        lines.append(f"   标签: {' '.join(status)}")
-
-    lines.append(f"   兼容性: {model.compatibility_score:.1f}/5.0")
-
-    if detailed and model.description:
-        lines.append(f"   描述: {model.description}")
+        text += f"   标签: {' '.join(status)}\n"
+    text += f"   兼容性: {compatibility_score:.1f}/5.0"
+    if description:
+        text += f"\n   描述: {description}"
+    return text
 
-    return '\n'.join(lines)
+def format_model_info(model: "ModelInfo", detailed: bool = False) -> str:
+    """格式化模型信息"""
+    return _format_model_info(
+        model.name, model.id, model.recommended, model.parameters, model.quantization,
+        model.compatibility_score, model.description if detailed else None
+    )
 
 def cmd_status(args):
     """显示服务器状态"""
     print_header("LM Studio服务器状态")
 
+    from core.model_manager import get_model_manager
+
     manager = get_model_manager()
     status = manager.get_server_status(force_refresh=args.refresh)
 
@@ -84,6 +94,8 @@ def cmd_list(args):
     """列出可用模型"""
     print_header("可用模型列表")
 
+    from core.model_manager import get_model_manager
+
     manager = get_model_manager()
     models = manager.refresh_models(force_refresh=args.refresh)
 
@@ -95,35 +107,40 @@ def cmd_list(args):
     current_model = manager.get_current_model()
     current_id = current_model.id if current_model else None
 
-    print(f"共发现 {len(models)} 个模型:\n")
+    lines = [f"共发现 {len(models)} 个模型:\n"]
 
     for i, model in enumerate(models, 1):
-        print(f"{i}. {format_model_info(model, detailed=args.detailed)}")
+        lines.append(f"{i}. {format_model_info(model, detailed=args.detailed)}")
         if model.id == current_id:
-            print("   ✅ 当前选中")
-        print()
+            lines.append("   ✅ 当前选中")
+        lines.append("")
 
     if args.recommendations:
-        print_subheader("推荐模型")
+        lines.append("\n--- 推荐模型 ---")
         recommended = [m for m in models if m.recommended][:3]
         if recommended:
             for model in recommended:
-                print(f"⭐ {format_model_info(model)}")
-                print()
+                lines.append(f"⭐ {format_model_info(model)}")
+                lines.append("")
         else:
-            print("暂无推荐模型")
+            lines.append("暂无推荐模型")
+
+    write_lines(lines)
 
 def cmd_select(args):
     """选择模型"""
     print_header(f"选择模型: {args.model_id}")
 
+    from core.model_manager import get_model_manager
+
     manager = get_model_manager()
 
-    # 验证模型是否存在
-    models = manager.refresh_models()
-    model_ids = [m.id for m in models]
+    # 验证模型是否存在（select_model会复用这次获取的模型列表）
+    models = manager.refresh_models(force_refresh=args.refresh)
+    models_by_id = {m.id: m for m in models}
+    model = models_by_id.get(args.model_id)
 
-    if args.model_id not in model_ids:
+    if model is None:
         print(f"❌ 模型 '{args.model_id}' 不存在")
         print("\n可用模型:")
         for model in models:
@@ -136,11 +153,8 @@ def cmd_select(args):
     if success:
         print(f"✅ 已选择模型: {args.model_id}")
 
-        # 获取模型信息
-        model = next((m for m in models if m.id == args.model_id), None)
-        if model:
-            print(f"\n模型信息:")
-            print(format_model_info(model, detailed=True))
+        print(f"\n模型信息:")
+        print(format_model_info(model, detailed=True))
     else:
         print("❌ 选择模型失败")
 
@@ -148,6 +162,8 @@ def cmd_test(args):
     """测试模型"""
     print_header(f"测试模型: {args.model_id}")
 
+    from core.model_manager import get_model_manager
+
     manager = get_model_manager()
 
     print("正在测试模型响应...")
@@ -169,6 +185,8 @@ def cmd_recommend(args):
     """获取模型推荐"""
     print_header(f"模型推荐 - {args.use_case}")
 
+    from core.model_manager import get_model_manager
+
     manager = get_model_manager()
     recommendations = manager.get_model_recommendations(args.use_case)
 
@@ -176,11 +194,13 @@ def cmd_recommend(args):
         print("😔 暂无推荐模型")
         return
 
-    print(f"为您推荐以下 {len(recommendations)} 个模型:\n")
+    lines = [f"为您推荐以下 {len(recommendations)} 个模型:\n"]
 
     for i, model in enumerate(recommendations, 1):
-        print(f"{i}. {format_model_info(model, detailed=True)}")
-        print()
+        lines.append(f"{i}. {format_model_info(model, detailed=True)}")
+        lines.append("")
+
+    write_lines(lines)
 
     # 显示推荐理由
     use_case_descriptions = {
@@ -196,6 +216,8 @@ def cmd_current(args):
     """显示当前模型"""
     print_header("当前选中模型")
 
+    from core.model_manager import get_model_manager
+
     manager = get_model_manager()
     current = manager.get_current_model()
 
@@ -218,33 +240,43 @@ def cmd_export(args):
     """导出模型列表"""
     print_header("导出模型列表")
 
+    from core.model_manager import get_model_manager
+
     manager = get_model_manager()
 
-    if args.format == "json":
-        data = manager.export_model_list("json")
-        if args.output:
-            with open(args.output, 'w', encoding='utf-8') as f:
-                f.write(data)
-            print(f"✅ 已导出到: {args.output}")
-        else:
-            print(data)
+    if args.format not in ("json", "csv"):
+        print(f"❌ 不支持的格式: {args.format}")
+        return
 
-    elif args.format == "csv":
-        data = manager.export_model_list("csv")
-        if args.output:
-            with open(args.output, 'w', encoding='utf-8') as f:
-                f.write(data)
+    if args.output:
+        # 直接流式写入临时文件，避免先在内存中生成完整的导出字符串；
+        # 导出成功后再原子替换目标文件，失败时不会留下空文件或写了一半的文件
+        tmp_path = f"{args.output}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                success = manager.write_model_list(f, args.format)
+            if success:
+                os.replace(tmp_path, args.output)
+        except OSError as e:
+            print(f"❌ 导出失败: {e}")
+            return
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+        if success:
             print(f"✅ 已导出到: {args.output}")
         else:
-            print(data)
-
+            print("❌ 导出失败")
     else:
-        print(f"❌ 不支持的格式: {args.format}")
+        print(manager.export_model_list(args.format))
 
 def cmd_config(args):
     """显示配置"""
     print_header("AI配置信息")
 
+    from core.ai_config_manager import get_ai_config_manager
+
     config_manager = get_ai_config_manager()
     config = config_manager.get_full_config()
 
@@ -257,37 +289,89 @@ def cmd_config(args):
             print(f"可用配置节: {', '.join(config.keys())}")
     else:
         print("📋 完整配置:")
-        print(json.dumps(config, indent=2, ensure_ascii=False))
+        print(json.dumps(dict(config), indent=2, ensure_ascii=False))
 
 def cmd_search(args):
     """搜索模型"""
     print_header(f"搜索模型: {args.query}")
 
+    from core.model_manager import get_model_manager
+
     manager = get_model_manager()
-    models = manager.refresh_models()
+    models = manager.refresh_models(force_refresh=args.refresh)
 
+    # 在名称、ID、描述中搜索
     query_lower = args.query.lower()
-    results = []
-
-    for model in models:
-        # 在名称、ID、描述中搜索
-        if (query_lower in model.name.lower() or
-            query_lower in model.id.lower() or
-            (model.description and query_lower in model.description.lower())):
-            results.append(model)
+    results = [model for model in models if query_lower in model.search_text]
 
     if not results:
         print(f"😔 未找到匹配 '{args.query}' 的模型")
         return
 
-    print(f"找到 {len(results)} 个匹配的模型:\n")
+    lines = [f"找到 {len(results)} 个匹配的模型:\n"]
 
     for i, model in enumerate(results, 1):
-        print(f"{i}. {format_model_info(model, detailed=args.detailed)}")
-        print()
-
-def main():
-    """主函数"""
+        lines.append(f"{i}. {format_model_info(model, detailed=args.detailed)}")
+        lines.append("")
+
+    write_lines(lines)
+
+def _configure_status(parser):
+    parser.add_argument('--refresh', action='store_true', help='刷新状态')
+
+def _configure_list(parser):
+    parser.add_argument('--refresh', action='store_true', help='刷新模型列表')
+    parser.add_argument('--detailed', '-d', action='store_true', help='显示详细信息')
+    parser.add_argument('--recommendations', '-r', action='store_true', help='显示推荐标记')
+
+def _configure_select(parser):
+    parser.add_argument('model_id', help='模型ID')
+
+def _configure_test(parser):
+    parser.add_argument('model_id', help='模型ID')
+    parser.add_argument('--prompt', '-p', default='你好，请简单介绍一下自己。', help='测试提示词')
+
+def _configure_recommend(parser):
+    parser.add_argument('--use-case', choices=['general', 'security_analysis', 'speed'],
+                        default='general', help='使用场景')
+
+def _configure_export(parser):
+    parser.add_argument('--format', choices=['json', 'csv'], default='json', help='导出格式')
+    parser.add_argument('--output', '-o', help='输出文件路径')
+
+def _configure_config(parser):
+    parser.add_argument('--section', '-s', help='显示特定配置节')
+
+def _configure_search(parser):
+    parser.add_argument('query', help='搜索关键词')
+    parser.add_argument('--detailed', '-d', action='store_true', help='显示详细信息')
+
+# 子命令表: 命令名 -> (处理函数, 帮助信息, 参数配置函数)
+COMMANDS = {
+    'status': (cmd_status, '显示服务器状态', _configure_status),
+    'list': (cmd_list, '列出可用模型', _configure_list),
+    'select': (cmd_select, '选择模型', _configure_select),
+    'test': (cmd_test, '测试模型', _configure_test),
+    'recommend': (cmd_recommend, '获取模型推荐', _configure_recommend),
+    'current': (cmd_current, '显示当前模型', None),
+    'export': (cmd_export, '导出模型列表', _configure_export),
+    'config': (cmd_config, '显示配置信息', _configure_config),
+    'search': (cmd_search, '搜索模型', _configure_search),
+}
+
+def _find_command(argv: List[str]):
+    """预扫描命令行参数，返回第一个非选项参数（全局选项均不带值）"""
+    for arg in argv:
+        if not arg.startswith('-'):
+            return arg
+    return None
+
+def build_parser(command: str = None) -> argparse.ArgumentParser:
+    """构建命令行解析器
+
+    指定已知的command时只构建该子命令的解析器，否则构建全部子命令
+    （用于 --help、未知命令或未指定命令的情况）。
+    """
     parser = argparse.ArgumentParser(
         description='SSlogs AI模型管理命令行工具',
         formatter_class=argparse.RawDescriptionHelpFormatter,
@@ -310,47 +394,18 @@ def main():
 
     subparsers = parser.add_subparsers(dest='command', help='可用命令')
 
-    # status命令
-    status_parser = subparsers.add_parser('status', help='显示服务器状态')
-    status_parser.add_argument('--refresh', action='store_true', help='刷新状态')
+    names = [command] if command in COMMANDS else COMMANDS
+    for name in names:
+        _, help_text, configure = COMMANDS[name]
+        subparser = subparsers.add_parser(name, help=help_text)
+        if configure:
+            configure(subparser)
 
-    # list命令
-    list_parser = subparsers.add_parser('list', help='列出可用模型')
-    list_parser.add_argument('--refresh', action='store_true', help='刷新模型列表')
-    list_parser.add_argument('--detailed', '-d', action='store_true', help='显示详细信息')
-    list_parser.add_argument('--recommendations', '-r', action='store_true', help='显示推荐标记')
-
-    # select命令
-    select_parser = subparsers.add_parser('select', help='选择模型')
-    select_parser.add_argument('model_id', help='模型ID')
-
-    # test命令
-    test_parser = subparsers.add_parser('test', help='测试模型')
-    test_parser.add_argument('model_id', help='模型ID')
-    test_parser.add_argument('--prompt', '-p', default='你好，请简单介绍一下自己。', help='测试提示词')
-
-    # recommend命令
-    recommend_parser = subparsers.add_parser('recommend', help='获取模型推荐')
-    recommend_parser.add_argument('--use-case', choices=['general', 'security_analysis', 'speed'],
-                                 default='general', help='使用场景')
-
-    # current命令
-    current_parser = subparsers.add_parser('current', help='显示当前模型')
-
-    # export命令
-    export_parser = subparsers.add_parser('export', help='导出模型列表')
-    export_parser.add_argument('--format', choices=['json', 'csv'], default='json', help='导出格式')
-    export_parser.add_argument('--output', '-o', help='输出文件路径')
-
-    # config命令
-    config_parser = subparsers.add_parser('config', help='显示配置信息')
-    config_parser.add_argument('--section', '-s', help='显示特定配置节')
-
-    # search命令
-    search_parser = subparsers.add_parser('search', help='搜索模型')
-    search_parser.add_argument('query', help='搜索关键词')
-    search_parser.add_argument('--detailed', '-d', action='store_true', help='显示详细信息')
+    return parser
 
+def main():
+    """主函数"""
+    parser = build_parser(_find_command(sys.argv[1:]))
     args = parser.parse_args()
 
     if not args.command:
@@ -358,27 +413,8 @@ def main():
         return
 
     try:
-        if args.command == 'status':
-            cmd_status(args)
-        elif args.command == 'list':
-            cmd_list(args)
-        elif args.command == 'select':
-            cmd_select(args)
-        elif args.command == 'test':
-            cmd_test(args)
-        elif args.command == 'recommend':
-            cmd_recommend(args)
-        elif args.command == 'current':
-            cmd_current(args)
-        elif args.command == 'export':
-            cmd_export(args)
-        elif args.command == 'config':
-            cmd_config(args)
-        elif args.command == 'search':
-            cmd_search(args)
-        else:
-            print(f"❌ 未知命令: {args.command}")
-            parser.print_help()
+        handler = COMMANDS[args.command][0]
+        handler(args)
 
     except KeyboardInterrupt:
         print("\n\n⏹️ 操作已取消")
@@ -389,4 +425,4 @@ def main():
             traceback.print_exc()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
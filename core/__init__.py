@@ -2,18 +2,47 @@
 核心模块初始化文件
 """
 
+import importlib
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .parser import LogParser
+    from .rule_engine import RuleEngine
+    from .ai_analyzer import AIAnalyzer
+    from .reporter import ReportGenerator
+    from .ip_utils import analyze_ip_access, IPGeoLocator
+
 # 导出所有必要的类和函数，方便主程序导入
-from .parser import LogParser
-from .rule_engine import RuleEngine
-from .ai_analyzer import AIAnalyzer
-from .reporter import ReportGenerator
-from .ip_utils import analyze_ip_access, IPGeoLocator
+# 各子模块依赖requests/yaml/geoip2等较重的第三方库，首次访问时才导入
+_LAZY_IMPORTS = {
+    'LogParser': '.parser',
+    'RuleEngine': '.rule_engine',
+    'AIAnalyzer': '.ai_analyzer',
+    'ReportGenerator': '.reporter',
+    'analyze_ip_access': '.ip_utils',
+    'IPGeoLocator': '.ip_utils',
+}
 
 __all__ = [
     'LogParser',
-    'RuleEngine', 
+    'RuleEngine',
     'AIAnalyzer',
     'ReportGenerator',
     'analyze_ip_access',
     'IPGeoLocator'
-]
\ No newline at end of file
+]
+
+
+def __getattr__(name):
+    """按需导入导出的类和函数（PEP 562）"""
+    if name in _LAZY_IMPORTS:
+        module = importlib.import_module(_LAZY_IMPORTS[name], __name__)
+        value = getattr(module, name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    """让dir()/自动补全能看到尚未导入的导出项"""
+    return sorted(set(globals()) | set(__all__))
@@ -1,170 +1,80 @@
-import requests
+import os
+import re
+import asyncio
+import json
+import random
+import hashlib
+import threading
 import logging
-import yaml
 import time
-from typing import Dict, Any
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from pathlib import Path
+from functools import lru_cache, partial
+from types import MappingProxyType
+from typing import TYPE_CHECKING, Dict, Any, Callable, List, Mapping, Optional, Tuple
+from .http_utils import AdaptiveTokenBucket, parse_retry_after
 from .exceptions import AIServiceError, AIServiceUnavailableError, AIAuthenticationError, AIRateLimitError
 
-class AIAnalyzer:
-    def __init__(self, config_path: str = 'config.yaml'):
-        self.config = self._load_config(config_path)
-        self.ai_type = self.config.get('ai', {}).get('type', 'cloud')
-        self.cloud_provider = self.config.get('ai', {}).get('cloud_provider', 'deepseek')
-        self.local_provider = self.config.get('ai', {}).get('local_provider', 'ollama')
-        self.logger = logging.getLogger(__name__)
-        
-        # 重试配置
-        self.max_retries = self.config.get('ai', {}).get('max_retries', 3)
-        self.retry_delay = self.config.get('ai', {}).get('retry_delay', 1)
-        self.retry_backoff = self.config.get('ai', {}).get('retry_backoff', 2)
-        
-        # 超时配置
-        self.default_timeout = self.config.get('ai', {}).get('default_timeout', 30)
+# orjson为可选依赖，未安装时回退到标准库json
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
-        # 加载云端模型配置
-        if self.cloud_provider == 'deepseek':
-            self.deepseek_config = self.config.get('deepseek', {})
-            self.api_key = self.deepseek_config.get('api_key', '')
-            self.cloud_model = self.deepseek_config.get('model', 'deepseek-ai/DeepSeek-V3')
-            self.cloud_base_url = self.deepseek_config.get('base_url', 'https://api.siliconflow.cn/v1/chat/completions')
-            self.cloud_headers = {
-                'Authorization': f'Bearer {self.api_key}',
-                'Content-Type': 'application/json'
-            }
+if TYPE_CHECKING:
+    import requests
 
-        # 加载本地模型配置
-        if self.local_provider == 'ollama':
-            self.ollama_config = self.config.get('ollama', {})
-            self.local_model = self.ollama_config.get('model', 'deepseek-r1:1.5b')
-            self.local_base_url = self.ollama_config.get('base_url', 'http://localhost:11434/api/chat')
-            self.local_headers = {
-                'Content-Type': 'application/json'
-            }
-
-    def _load_config(self, config_path: str) -> Dict[str, Any]:
-        try:
-            with open(config_path, 'r', encoding='utf-8') as f:
-                return yaml.safe_load(f)
-        except Exception as e:
-            logging.error(f"加载配置文件失败: {e}")
-            return {}
-
-    def _make_request_with_retry(self, url: str, headers: Dict[str, str], payload: Dict[str, Any], timeout: int) -> requests.Response:
-        """带重试机制的请求方法"""
-        last_exception = None
-
-        for attempt in range(self.max_retries):
-            try:
-                response = requests.post(url, headers=headers, json=payload, timeout=timeout)
-                response.raise_for_status()
-                return response
 
-            except requests.exceptions.Timeout as e:
-                last_exception = AIServiceUnavailableError(
-                    f"AI服务请求超时 (尝试 {attempt + 1}/{self.max_retries})",
-                    error_code="TIMEOUT",
-                    details={"url": url, "timeout": timeout, "attempt": attempt + 1}
-                )
-                self.logger.warning(str(last_exception))
+# requests/aiohttp导入较慢，首次发送请求时才导入，离线生成备用分析时完全不必导入
+@lru_cache(maxsize=None)
+def _requests():
+    import requests
+    return requests
 
-            except requests.exceptions.ConnectionError as e:
-                last_exception = AIServiceUnavailableError(
-                    f"无法连接到AI服务 (尝试 {attempt + 1}/{self.max_retries})",
-                    error_code="CONNECTION_ERROR",
-                    details={"url": url, "attempt": attempt + 1}
-                )
-                self.logger.warning(str(last_exception))
 
-            except requests.exceptions.HTTPError as e:
-                status_code = e.response.status_code
-                error_details = {
-                    "status_code": status_code,
-                    "url": url,
-                    "attempt": attempt + 1,
-                    "response_text": e.response.text[:200] if hasattr(e.response, 'text') else ''
-                }
+@lru_cache(maxsize=None)
+def _aiohttp():
+    """aiohttp仅异步分析接口需要，未安装时返回None"""
+    try:
+        import aiohttp
+    except ImportError:
+        return None
+    return aiohttp
 
-                if status_code == 401:
-                    raise AIAuthenticationError(
-                        "AI服务认证失败，请检查API密钥",
-                        error_code="AUTHENTICATION_FAILED",
-                        details=error_details
-                    )
-                elif status_code == 429:
-                    last_exception = AIRateLimitError(
-                        f"AI服务请求频率限制 (尝试 {attempt + 1}/{self.max_retries})",
-                        error_code="RATE_LIMIT",
-                        details=error_details
-                    )
-                    self.logger.warning(str(last_exception))
-                elif 400 <= status_code < 500:
-                    raise AIServiceError(
-                        f"AI服务客户端错误: HTTP {status_code}",
-                        error_code="CLIENT_ERROR",
-                        details=error_details
-                    )
-                elif status_code >= 500:
-                    last_exception = AIServiceUnavailableError(
-                        f"AI服务服务器错误: HTTP {status_code} (尝试 {attempt + 1}/{self.max_retries})",
-                        error_code="SERVER_ERROR",
-                        details=error_details
-                    )
-                    self.logger.warning(str(last_exception))
 
-            except requests.exceptions.RequestException as e:
-                last_exception = AIServiceError(
-                    f"AI服务请求异常: {e} (尝试 {attempt + 1}/{self.max_retries})",
-                    error_code="REQUEST_EXCEPTION",
-                    details={"url": url, "error": str(e), "attempt": attempt + 1}
-                )
-                self.logger.warning(str(last_exception))
+def _json_dumps(obj: Any) -> bytes:
+    """序列化请求体为UTF-8字节串"""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False).encode('utf-8')
 
-            except Exception as e:
-                last_exception = AIServiceError(
-                    f"AI服务未知错误: {e} (尝试 {attempt + 1}/{self.max_retries})",
-                    error_code="UNKNOWN_ERROR",
-                    details={"url": url, "error": str(e), "attempt": attempt + 1}
-                )
-                self.logger.warning(str(last_exception))
 
-            # 如果不是最后一次尝试，等待后重试
-            if attempt < self.max_retries - 1:
-                wait_time = self.retry_delay * (2 ** attempt)  # 指数退避
-                self.logger.info(f"等待 {wait_time} 秒后重试...")
-                time.sleep(wait_time)
+def _json_loads(data: bytes) -> Any:
+    """反序列化响应体"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
 
-        # 所有重试都失败了，抛出最后一个异常
-        if last_exception:
-            raise last_exception
-        else:
-            raise AIServiceUnavailableError(
-                "所有重试尝试都失败了",
-                error_code="ALL_RETRIES_FAILED"
-            )
+# 提示词模板存放在 core/prompts 目录，导入时读取一次
+_PROMPTS_DIR = Path(__file__).parent / "prompts"
 
-    def _get_attack_specific_prompt(self, log_context: str, attack_category: str = None, attack_name: str = None) -> str:
-        """根据攻击类型生成专门的AI分析提示词"""
 
-        # 通用分析框架
-        base_framework = """
-请基于以下日志内容进行深度安全分析：
+def _load_prompt(name: str) -> str:
+    """读取提示词模板文件"""
+    return (_PROMPTS_DIR / name).read_text(encoding='utf-8')
 
-**分析要求:**
-1. 攻击技术分析（技术手段、攻击复杂度、载荷特征）
-2. 影响范围评估（数据风险、系统损害、业务影响）
-3. 应急响应措施（立即处置、漏洞修复、后续监控）
-4. 威胁情报分析（攻击者特征、组织归属、后续威胁）
 
-**日志内容:**
-{log_context}
+# 通用分析框架（日志内容通过 {log_context} 占位符插入）
+_BASE_FRAMEWORK = _load_prompt('analyze.txt')
+_BASE_FRAMEWORK_PREFIX, _BASE_FRAMEWORK_SUFFIX = _BASE_FRAMEWORK.split('{log_context}', 1)
 
-**输出格式:**
-请使用结构化的Markdown格式回复，包含上述四个方面的详细分析。
-"""
+# 解析规则生成提示词，日志样例拼接在前后两段之间
+_RULES_PROMPT_PREFIX, _RULES_PROMPT_SUFFIX = _load_prompt('generate_rules.txt').split('{log_sample}', 1)
 
-        # 针对不同攻击类型的专门提示词
-        specialized_prompts = {
-            'injection': f"""
+# 针对不同攻击类型的专门提示词（拼接在通用分析框架之前）
+_SPECIALIZED_PROMPT_HEADERS = {
+    'injection': """
 作为数据库安全专家，请重点分析以下SQL注入攻击：
 
 **重点关注:**
@@ -173,10 +83,9 @@ class AIAnalyzer:
 - 数据泄露范围和敏感信息访问
 - 数据库持久化后门风险
 
-{base_framework}
 """,
 
-            'xss': f"""
+    'xss': """
 作为Web应用安全专家，请重点分析以下XSS攻击：
 
 **重点关注:**
@@ -185,10 +94,9 @@ class AIAnalyzer:
 - 浏览器攻击向量（CSRF、Clickjacking配合）
 - 持久化攻击和蠕虫传播可能
 
-{base_framework}
 """,
 
-            'rce': f"""
+    'rce': """
 作为系统安全专家，请重点分析以下远程代码执行攻击：
 
 **重点关注:**
@@ -197,10 +105,9 @@ class AIAnalyzer:
 - 横向移动和内网渗透风险
 - 数据窃取和系统控制威胁
 
-{base_framework}
 """,
 
-            'ssrf': f"""
+    'ssrf': """
 作为网络安全专家，请重点分析以下SSRF攻击：
 
 **重点关注:**
@@ -209,10 +116,9 @@ class AIAnalyzer:
 - 服务指纹识别和后续攻击可能
 - 云环境凭证窃取风险
 
-{base_framework}
 """,
 
-            'api_security': f"""
+    'api_security': """
 作为API安全专家，请重点分析以下API安全威胁：
 
 **重点关注:**
@@ -221,10 +127,9 @@ class AIAnalyzer:
 - 数据泄露和业务逻辑滥用
 - API滥用和拒绝服务风险
 
-{base_framework}
 """,
 
-            'cloud_security': f"""
+    'cloud_security': """
 作为云安全专家，请重点分析以下云原生威胁：
 
 **重点关注:**
@@ -233,72 +138,36 @@ class AIAnalyzer:
 - 云配置错误和凭证泄露
 - 横向云环境渗透威胁
 
-{base_framework}
-"""
-        }
-
-        # 根据攻击类别选择专门提示词
-        if attack_category in specialized_prompts:
-            return specialized_prompts[attack_category].format(log_context=log_context)
-
-        # 如果有具体攻击名称，尝试从名称推断类型
-        if attack_name:
-            attack_name_lower = attack_name.lower()
-            if 'sql' in attack_name_lower or 'injection' in attack_name_lower:
-                return specialized_prompts['injection'].format(log_context=log_context)
-            elif 'xss' in attack_name_lower or 'script' in attack_name_lower:
-                return specialized_prompts['xss'].format(log_context=log_context)
-            elif 'rce' in attack_name_lower or 'command' in attack_name_lower or 'exec' in attack_name_lower:
-                return specialized_prompts['rce'].format(log_context=log_context)
-            elif 'ssrf' in attack_name_lower:
-                return specialized_prompts['ssrf'].format(log_context=log_context)
-            elif 'api' in attack_name_lower or 'graphql' in attack_name_lower or 'rest' in attack_name_lower:
-                return specialized_prompts['api_security'].format(log_context=log_context)
-            elif 'kubernetes' in attack_name_lower or 'docker' in attack_name_lower or 'cloud' in attack_name_lower:
-                return specialized_prompts['cloud_security'].format(log_context=log_context)
-
-        # 默认使用通用提示词
-        return base_framework.format(log_context=log_context)
-
-    def analyze_log(self, log_context: str, attack_category: str = None, attack_name: str = None, threat_score: float = None) -> str:
-        """增强的AI分析 - 支持攻击类型特定的深度分析"""
-        if not log_context or not log_context.strip():
-            return "无有效日志内容可供分析"
-
-        # 为避免过长的上下文影响性能，限制日志长度
-        if len(log_context) > 5000:
-            log_context = log_context[:5000] + "\n... (日志内容被截断) ..."
-
-        # 根据威胁评分调整分析的深度
-        urgency_level = "常规" if not threat_score or threat_score < 6.0 else "紧急"
-
-        # 生成攻击类型特定的提示词
-        prompt = self._get_attack_specific_prompt(log_context, attack_category, attack_name)
-
-        # 添加威胁评分相关信息
-        if threat_score:
-            prompt = f"**威胁评分:** {threat_score:.1f}/10.0 ({urgency_level}级别)\n\n{prompt}"
-
-        try:
-            if self.ai_type == 'local' and self.local_provider == 'ollama':
-                return self._analyze_with_ollama(prompt)
-            else:
-                try:
-                    return self._analyze_with_cloud(prompt)
-                except Exception as e:
-                    error_msg = f"云端AI分析失败: {str(e)}"
-                    self.logger.warning(error_msg)
-                    return self._generate_fallback_analysis(attack_category, threat_score)
-
-        except Exception as e:
-            self.logger.error(f"AI分析失败: {e}")
-            return self._generate_fallback_analysis(attack_category, threat_score)
-
-    def _generate_fallback_analysis(self, attack_category: str, threat_score: float) -> str:
-        """生成备用分析结果（当AI不可用时）"""
-
-        fallback_templates = {
-            'injection': """
+""",
+}
+
+# 预先拼接好每类攻击的完整模板，调用时只需插入日志内容: {类别: (前半段, 后半段)}
+_SPECIALIZED_PROMPTS = {
+    category: (header + _BASE_FRAMEWORK_PREFIX, _BASE_FRAMEWORK_SUFFIX + "\n")
+    for category, header in _SPECIALIZED_PROMPT_HEADERS.items()
+}
+
+# 攻击名称关键字到攻击类别的映射，按顺序匹配
+_ATTACK_NAME_KEYWORDS = (
+    (('sql', 'injection'), 'injection'),
+    (('xss', 'script'), 'xss'),
+    (('rce', 'command', 'exec'), 'rce'),
+    (('ssrf',), 'ssrf'),
+    (('api', 'graphql', 'rest'), 'api_security'),
+    (('kubernetes', 'docker', 'cloud'), 'cloud_security'),
+)
+
+# 所有关键字合并为一个正则，每个捕获组对应一个类别，一次扫描即可定位
+# 整体放在零宽前瞻中，匹配不消耗字符，相互重叠的关键字（如 apinjection 中的 api 和 injection）都能被找到；
+# 用于小写化后的名称，与逐个 `in` 判断的大小写语义一致
+_ATTACK_NAME_RE = re.compile(
+    '(?=' + '|'.join('(' + '|'.join(map(re.escape, keywords)) + ')' for keywords, _ in _ATTACK_NAME_KEYWORDS) + ')'
+)
+_ATTACK_NAME_CATEGORIES = tuple(category for _, category in _ATTACK_NAME_KEYWORDS)
+
+# AI不可用时的备用分析结果
+_FALLBACK_TEMPLATES = {
+    'injection': """
 ## SQL注入攻击分析
 
 ### 攻击技术分析
@@ -318,7 +187,7 @@ class AIAnalyzer:
 4. 监控异常数据库操作
 """,
 
-            'xss': """
+    'xss': """
 ## XSS攻击分析
 
 ### 攻击技术分析
@@ -338,7 +207,7 @@ class AIAnalyzer:
 4. 通知用户修改密码
 """,
 
-            'rce': """
+    'rce': """
 ## 远程代码执行攻击分析
 
 ### 攻击技术分析
@@ -358,7 +227,7 @@ class AIAnalyzer:
 4. 重新构建受感染系统
 """,
 
-            'ssrf': """
+    'ssrf': """
 ## SSRF攻击分析
 
 ### 攻击技术分析
@@ -377,9 +246,9 @@ class AIAnalyzer:
 3. 更新云服务安全配置
 4. 监控异常网络请求
 """
-        }
+}
 
-        template = fallback_templates.get(attack_category, """
+_FALLBACK_DEFAULT = """
 ## 安全威胁分析
 
 ### 攻击检测
@@ -396,7 +265,757 @@ class AIAnalyzer:
 2. 收集和分析日志
 3. 修复识别的漏洞
 4. 加强监控措施
-""")
+"""
+
+# 批量分析时合并多段日志的提示词，每段日志前加编号分隔标记
+_BATCH_PROMPT_HEADER = """以下共有 {count} 段相互独立的日志分析任务，每段以 "--- LOG 序号 ---" 开头。
+请分别完成每个任务，并只返回一个长度为 {count} 的JSON字符串数组，第i个元素是第i段的完整分析结果（Markdown格式）。
+不要输出JSON数组以外的任何内容。
+"""
+_BATCH_ITEM_MARKER = "\n--- LOG {index} ---\n"
+
+# 日志上下文超出长度上限时追加的截断标记
+_TRUNCATED_SUFFIX = "\n... (日志内容被截断) ..."
+
+
+def _extract_yaml_block(ai_content: str) -> Optional[str]:
+    """提取AI返回内容中 ```yaml ... ``` 代码块的内容，没有代码块时返回None"""
+    marker = ai_content.find('```yaml')
+    if marker < 0:
+        return None
+    # 标记后可能跟有空白，代码块内容从标记所在行之后开始
+    body_start = ai_content.find('\n', marker + 7)
+    if body_start < 0 or ai_content[marker + 7:body_start].strip():
+        return None
+    body_start += 1
+    end = ai_content.find('\n```', body_start)
+    if end < 0:
+        return None
+    return ai_content[body_start:end]
+
+
+@lru_cache(maxsize=None)
+def _yaml():
+    """首次需要解析YAML时才导入PyYAML（配置文件缺失时完全不必导入）"""
+    import yaml
+    return yaml
+
+
+@lru_cache(maxsize=None)
+def _yaml_safe_loader():
+    """优先使用libyaml的C实现"""
+    yaml = _yaml()
+    return getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+
+def _yaml_load(text: str) -> Any:
+    """使用SafeLoader解析YAML文本"""
+    return _yaml().load(text, Loader=_yaml_safe_loader())
+
+
+def _freeze(value: Any) -> Any:
+    """递归转换为只读结构：dict转MappingProxyType，list转tuple"""
+    if isinstance(value, dict):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+@lru_cache(maxsize=8)
+def _load_config_file(config_path: str, mtime_ns: int, size: int) -> Mapping[str, Any]:
+    """解析配置文件，按(绝对路径, 修改时间, 文件大小)缓存，文件修改后自动失效
+
+    返回的配置在各实例间共享，入缓存时已递归冻结为只读结构
+    """
+    with open(config_path, 'r', encoding='utf-8') as f:
+        text = f.read()
+    # 空文件或只有 {} 时无需解析
+    if text.strip() in ('', '{}'):
+        return MappingProxyType({})
+    return _freeze(_yaml_load(text) or {})
+
+
+def _select_prompt_template(attack_category: str = None, attack_name: str = None) -> Tuple[str, str]:
+    """根据攻击类型选择专门的分析提示词模板，返回(日志前部分, 日志后部分)"""
+    template = _SPECIALIZED_PROMPTS.get(attack_category)
+    if template is not None:
+        return template
+
+    # 如果没有匹配的攻击类别，尝试从攻击名称推断类型
+    if attack_name:
+        # 名称中命中多个类别时按 _ATTACK_NAME_KEYWORDS 的顺序取优先级最高者，与扫描到的位置无关
+        groups = [m.lastindex for m in _ATTACK_NAME_RE.finditer(attack_name.lower())]
+        if groups:
+            return _SPECIALIZED_PROMPTS[_ATTACK_NAME_CATEGORIES[min(groups) - 1]]
+
+    # 默认使用通用提示词
+    return _BASE_FRAMEWORK_PREFIX, _BASE_FRAMEWORK_SUFFIX
+
+
+@lru_cache(maxsize=64)
+def _prompt_template(attack_category: str, attack_name: str, threat_header: str) -> Tuple[str, str]:
+    """缓存提示词中日志内容以外的部分，键中不含日志内容以保证缓存有界"""
+    prefix, suffix = _select_prompt_template(attack_category, attack_name)
+    return threat_header + prefix, suffix
+
+
+def _close_future_response(future):
+    """关闭对冲请求中未被采用的响应"""
+    if not future.cancelled() and future.exception() is None:
+        future.result().close()
+
+
+class AIAnalyzer:
+    # 按服务地址共享的令牌桶，同一进程内的所有实例和线程共同遵守
+    _rate_buckets: Dict[str, AdaptiveTokenBucket] = {}
+    _rate_buckets_lock = threading.Lock()
+
+    def __init__(self, config_path: str = 'config.yaml'):
+        self.config = self._load_config(config_path)
+        self.ai_type = self.config.get('ai', {}).get('type', 'cloud')
+        self.cloud_provider = self.config.get('ai', {}).get('cloud_provider', 'deepseek')
+        self.local_provider = self.config.get('ai', {}).get('local_provider', 'ollama')
+        self.logger = logging.getLogger(__name__)
+        
+        # 重试配置
+        self.max_retries = self.config.get('ai', {}).get('max_retries', 3)
+        self.retry_delay = self.config.get('ai', {}).get('retry_delay', 1)
+        self.retry_backoff = self.config.get('ai', {}).get('retry_backoff', 2)
+        self.retry_max_wait = self.config.get('ai', {}).get('retry_max_wait', 10)
+        self.retry_deadline = self.config.get('ai', {}).get('retry_deadline', 120)
+        
+        # 超时配置
+        self.default_timeout = self.config.get('ai', {}).get('default_timeout', 30)
+
+        # 发送给AI的日志上下文长度上限（字符数）
+        self.max_context_chars = self.config.get('ai', {}).get('max_context_chars', 5000)
+
+        # 批量分析时单次请求合并的日志段数
+        self.max_batch_size = self.config.get('ai', {}).get('max_batch_size', 10)
+        # 合并请求的max_tokens上限，避免超出云端API允许的最大输出长度
+        self.batch_max_tokens = self.config.get('ai', {}).get('batch_max_tokens', 8192)
+
+        # 流式接收分析结果，边下载边解析
+        self.stream_responses = self.config.get('ai', {}).get('stream', True)
+
+        # AI响应缓存：相同模型+相同提示词直接复用上次的分析结果（LRU+过期时间，0表示禁用）
+        self.cache_size = self.config.get('ai', {}).get('cache_size', 512)
+        self.cache_ttl = self.config.get('ai', {}).get('cache_ttl', 3600)
+        self._response_cache: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+        # HTTP会话在首次请求时创建，见 _session
+        self._http_session = None
+        self._session_lock = threading.Lock()
+
+        # 异步接口使用的aiohttp会话，需在事件循环内创建，首次调用时初始化
+        # 会话绑定创建它的事件循环，换了事件循环（如再次 asyncio.run）时需重新创建
+        self._aclient = None
+        self._aclient_loop = None
+
+        # 对冲请求：首个请求超过该秒数仍未响应时并发补发一个，取先返回者（0表示禁用）
+        self.hedge_delay = self.config.get('ai', {}).get('hedge_delay', 0)
+        self._hedge_executor = None
+        self._hedge_lock = threading.Lock()
+
+        # 自适应限速（每秒请求数），默认0表示不限速；云端API有速率限制时可在 ai.rate_limit 中开启
+        self.rate_limit = self.config.get('ai', {}).get('rate_limit', 0)
+        self.rate_limit_burst = self.config.get('ai', {}).get('rate_limit_burst', 5)
+        self.rate_limit_min = self.config.get('ai', {}).get('rate_limit_min', 0.2)
+        self.rate_limit_max = self.config.get('ai', {}).get('rate_limit_max', 50)
+
+        # 加载云端模型配置
+        if self.cloud_provider == 'deepseek':
+            self.deepseek_config = self.config.get('deepseek', {})
+            self.api_key = self.deepseek_config.get('api_key', '')
+            self.cloud_model = self.deepseek_config.get('model', 'deepseek-ai/DeepSeek-V3')
+            self.cloud_base_url = self.deepseek_config.get('base_url', 'https://api.siliconflow.cn/v1/chat/completions')
+            self.cloud_headers = {
+                'Authorization': f'Bearer {self.api_key}'
+            }
+
+        # 加载本地模型配置
+        if self.local_provider == 'ollama':
+            self.ollama_config = self.config.get('ollama', {})
+            self.local_model = self.ollama_config.get('model', 'deepseek-r1:1.5b')
+            # base_url 既可以是服务根地址，也可以是完整的 /api/chat 地址
+            base_url = self.ollama_config.get('base_url', 'http://localhost:11434').rstrip('/')
+            if base_url.endswith('/api/chat'):
+                base_url = base_url[:-len('/api/chat')]
+            self.local_root = base_url
+            self.local_chat_url = f"{base_url}/api/chat"
+            self.local_base_url = self.local_chat_url
+            self.local_headers = {}
+
+    def _load_config(self, config_path: str) -> Mapping[str, Any]:
+        abs_path = os.path.abspath(config_path)
+        if not os.path.isfile(abs_path):
+            # 配置文件不存在时直接使用默认配置，不必导入yaml
+            logging.warning(f"配置文件不存在，使用默认配置: {abs_path}")
+            return {}
+        try:
+            st = os.stat(abs_path)
+            return _load_config_file(abs_path, st.st_mtime_ns, st.st_size)
+        except Exception as e:
+            logging.error(f"加载配置文件失败: {e}")
+            return {}
+
+    @property
+    def _session(self) -> "requests.Session":
+        """复用HTTP连接（keep-alive + 连接池），避免每次请求重新建立TCP/TLS连接"""
+        with self._session_lock:
+            if self._http_session is None:
+                requests = _requests()
+                session = requests.Session()
+                session.headers.update({'Content-Type': 'application/json'})
+                # 重试由 _make_request_with_retry 统一处理，适配器本身不再重试
+                adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=8, max_retries=0)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                self._http_session = session
+            return self._http_session
+
+    def _make_request_with_retry(self, url: str, headers: Dict[str, str], payload: Dict[str, Any], timeout: int,
+                                 stream: bool = False) -> "requests.Response":
+        """带重试机制的请求方法，stream=True时响应体由调用方逐行读取"""
+        requests = _requests()
+        last_exception = None
+        deadline = time.monotonic() + self.retry_deadline
+        # 请求体只序列化一次，各次重试复用
+        body = _json_dumps(payload)
+
+        bucket = self._get_rate_bucket(url)
+
+        for attempt in range(self.max_retries):
+            retry_after = None
+            if bucket is not None:
+                wait_time = bucket.reserve()
+                if wait_time > 0:
+                    time.sleep(wait_time)
+            try:
+                response = self._post(url, headers, body, timeout, stream)
+                response.raise_for_status()
+                if bucket is not None:
+                    bucket.on_success()
+                return response
+
+            except requests.exceptions.Timeout as e:
+                last_exception = AIServiceUnavailableError(
+                    f"AI服务请求超时 (尝试 {attempt + 1}/{self.max_retries})",
+                    error_code="TIMEOUT",
+                    details={"url": url, "timeout": timeout, "attempt": attempt + 1}
+                )
+                self.logger.warning(str(last_exception))
+
+            except requests.exceptions.ConnectionError as e:
+                last_exception = AIServiceUnavailableError(
+                    f"无法连接到AI服务 (尝试 {attempt + 1}/{self.max_retries})",
+                    error_code="CONNECTION_ERROR",
+                    details={"url": url, "attempt": attempt + 1}
+                )
+                self.logger.warning(str(last_exception))
+
+            except requests.exceptions.HTTPError as e:
+                status_code = e.response.status_code
+                error_details = {
+                    "status_code": status_code,
+                    "url": url,
+                    "attempt": attempt + 1,
+                    "response_text": e.response.text[:200] if hasattr(e.response, 'text') else ''
+                }
+
+                last_exception = self._http_status_error(status_code, error_details, attempt)
+                if bucket is not None:
+                    bucket.on_throttle()
+                retry_after = parse_retry_after(e.response)
+                if retry_after is not None:
+                    last_exception.details['retry_after'] = retry_after
+                self.logger.warning(str(last_exception))
+
+            except requests.exceptions.RequestException as e:
+                last_exception = AIServiceError(
+                    f"AI服务请求异常: {e} (尝试 {attempt + 1}/{self.max_retries})",
+                    error_code="REQUEST_EXCEPTION",
+                    details={"url": url, "error": str(e), "attempt": attempt + 1}
+                )
+                self.logger.warning(str(last_exception))
+
+            except Exception as e:
+                last_exception = AIServiceError(
+                    f"AI服务未知错误: {e} (尝试 {attempt + 1}/{self.max_retries})",
+                    error_code="UNKNOWN_ERROR",
+                    details={"url": url, "error": str(e), "attempt": attempt + 1}
+                )
+                self.logger.warning(str(last_exception))
+
+            # 如果不是最后一次尝试，等待后重试
+            if attempt < self.max_retries - 1:
+                wait_time = self._retry_wait_time(attempt, retry_after, deadline)
+                if wait_time is None:
+                    break
+                time.sleep(wait_time)
+
+        # 所有重试都失败了，抛出最后一个异常
+        self._raise_retries_exhausted(last_exception)
+
+    def _post(self, url: str, headers: Dict[str, str], body: bytes, timeout: int, stream: bool) -> "requests.Response":
+        """发送单次请求，启用对冲时在首个请求迟迟未响应的情况下补发一个并取先成功者"""
+        if not self.hedge_delay or self.hedge_delay <= 0:
+            return self._session.post(url, headers=headers, data=body, timeout=timeout, stream=stream)
+
+        executor = self._get_hedge_executor()
+        submit = partial(executor.submit, self._session.post, url, headers=headers, data=body,
+                         timeout=timeout, stream=stream)
+        first = submit()
+        done, _ = wait([first], timeout=self.hedge_delay)
+        if done:
+            return first.result()
+
+        self.logger.debug(f"请求超过 {self.hedge_delay} 秒未响应，发送对冲请求")
+        pending = {first, submit()}
+        while True:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            winner = done.pop()
+            if winner.exception() is None or not pending:
+                break
+        # 丢弃较慢的请求，其响应返回后立即释放连接
+        for loser in pending | done:
+            loser.add_done_callback(_close_future_response)
+        return winner.result()
+
+    def _get_hedge_executor(self) -> ThreadPoolExecutor:
+        with self._hedge_lock:
+            if self._hedge_executor is None:
+                self._hedge_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='ai-hedge')
+            return self._hedge_executor
+
+    def _get_rate_bucket(self, url: str):
+        """获取目标服务地址对应的令牌桶，未启用限速时返回None"""
+        if not self.rate_limit or self.rate_limit <= 0:
+            return None
+        with self._rate_buckets_lock:
+            bucket = self._rate_buckets.get(url)
+            if bucket is None:
+                bucket = AdaptiveTokenBucket(self.rate_limit, self.rate_limit_burst,
+                                              self.rate_limit_min, self.rate_limit_max)
+                self._rate_buckets[url] = bucket
+            return bucket
+
+    def _http_status_error(self, status_code: int, error_details: Dict[str, Any], attempt: int) -> AIServiceError:
+        """将HTTP错误状态码转换为AI服务异常，不可重试的错误直接抛出"""
+        if status_code == 401:
+            raise AIAuthenticationError(
+                "AI服务认证失败，请检查API密钥",
+                error_code="AUTHENTICATION_FAILED",
+                details=error_details
+            )
+        elif status_code == 429:
+            return AIRateLimitError(
+                f"AI服务请求频率限制 (尝试 {attempt + 1}/{self.max_retries})",
+                error_code="RATE_LIMIT",
+                details=error_details
+            )
+        elif 400 <= status_code < 500:
+            raise AIServiceError(
+                f"AI服务客户端错误: HTTP {status_code}",
+                error_code="CLIENT_ERROR",
+                details=error_details
+            )
+        return AIServiceUnavailableError(
+            f"AI服务服务器错误: HTTP {status_code} (尝试 {attempt + 1}/{self.max_retries})",
+            error_code="SERVER_ERROR",
+            details=error_details
+        )
+
+    def _retry_wait_time(self, attempt: int, retry_after, deadline: float):
+        """计算下次重试前的等待秒数，超出总时限时返回None"""
+        if retry_after is not None:
+            # 服务端明确给出了等待时间，同样不超过单次等待上限
+            wait_time = min(retry_after, self.retry_max_wait)
+        else:
+            # 带随机抖动的指数退避，避免多个客户端同时重试
+            wait_time = min(self.retry_delay * (self.retry_backoff ** attempt) * random.uniform(0.5, 1.5),
+                            self.retry_max_wait)
+
+        if time.monotonic() + wait_time >= deadline:
+            self.logger.warning(f"重试等待将超出总时限 {self.retry_deadline} 秒，放弃重试")
+            return None
+
+        self.logger.info(f"等待 {wait_time:.2f} 秒后重试...")
+        return wait_time
+
+    @staticmethod
+    def _raise_retries_exhausted(last_exception):
+        if last_exception:
+            raise last_exception
+        raise AIServiceUnavailableError(
+            "所有重试尝试都失败了",
+            error_code="ALL_RETRIES_FAILED"
+        )
+
+    async def _ensure_async_session(self):
+        """确保异步HTTP会话存在"""
+        aiohttp = _aiohttp()
+        if aiohttp is None:
+            raise AIServiceError("异步分析需要安装aiohttp", error_code="DEPENDENCY_MISSING")
+        loop = asyncio.get_running_loop()
+        if self._aclient is not None and self._aclient_loop is not loop:
+            await self._release_async_session()
+        if self._aclient is None or self._aclient.closed:
+            self._aclient = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=100, limit_per_host=20),
+                headers={'Content-Type': 'application/json'}
+            )
+            self._aclient_loop = loop
+        return self._aclient
+
+    async def _release_async_session(self):
+        """释放当前异步会话，会话可能属于当前、已关闭或其他线程中的事件循环"""
+        session, owner_loop = self._aclient, self._aclient_loop
+        self._aclient = None
+        self._aclient_loop = None
+        if session is None or session.closed:
+            return
+        if owner_loop is None or owner_loop is asyncio.get_running_loop() or owner_loop.is_closed():
+            # 原事件循环已关闭时连接器只清理内部状态，不会再向该循环调度任务，可在当前循环中关闭
+            await session.close()
+        elif owner_loop.is_running():
+            # 原事件循环仍在其他线程运行，交给它关闭
+            asyncio.run_coroutine_threadsafe(session.close(), owner_loop)
+        else:
+            # 原事件循环已停止但未关闭，仍可能被重新运行，只解除本实例对会话的引用
+            session.detach()
+
+    async def _amake_request_with_retry(self, url: str, headers: Dict[str, str], payload: Dict[str, Any], timeout: int) -> Any:
+        """_make_request_with_retry 的异步版本，返回解析后的JSON响应"""
+        session = await self._ensure_async_session()
+        aiohttp = _aiohttp()
+        last_exception = None
+        deadline = time.monotonic() + self.retry_deadline
+        body = _json_dumps(payload)
+        bucket = self._get_rate_bucket(url)
+
+        for attempt in range(self.max_retries):
+            retry_after = None
+            if bucket is not None:
+                wait_time = bucket.reserve()
+                if wait_time > 0:
+                    await asyncio.sleep(wait_time)
+            try:
+                async with session.post(url, headers=headers, data=body,
+                                        timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+                    if response.status < 400:
+                        result = _json_loads(await response.read())
+                        if bucket is not None:
+                            bucket.on_success()
+                        return result
+
+                    response_text = await response.text(errors='replace')
+                    error_details = {
+                        "status_code": response.status,
+                        "url": url,
+                        "attempt": attempt + 1,
+                        "response_text": response_text[:200]
+                    }
+                    last_exception = self._http_status_error(response.status, error_details, attempt)
+                    if bucket is not None:
+                        bucket.on_throttle()
+                    retry_after = parse_retry_after(response)
+                    if retry_after is not None:
+                        last_exception.details['retry_after'] = retry_after
+                    self.logger.warning(str(last_exception))
+
+            except AIServiceError:
+                raise
+
+            except asyncio.TimeoutError:
+                last_exception = AIServiceUnavailableError(
+                    f"AI服务请求超时 (尝试 {attempt + 1}/{self.max_retries})",
+                    error_code="TIMEOUT",
+                    details={"url": url, "timeout": timeout, "attempt": attempt + 1}
+                )
+                self.logger.warning(str(last_exception))
+
+            except aiohttp.ClientConnectionError:
+                last_exception = AIServiceUnavailableError(
+                    f"无法连接到AI服务 (尝试 {attempt + 1}/{self.max_retries})",
+                    error_code="CONNECTION_ERROR",
+                    details={"url": url, "attempt": attempt + 1}
+                )
+                self.logger.warning(str(last_exception))
+
+            except aiohttp.ClientError as e:
+                last_exception = AIServiceError(
+                    f"AI服务请求异常: {e} (尝试 {attempt + 1}/{self.max_retries})",
+                    error_code="REQUEST_EXCEPTION",
+                    details={"url": url, "error": str(e), "attempt": attempt + 1}
+                )
+                self.logger.warning(str(last_exception))
+
+            if attempt < self.max_retries - 1:
+                wait_time = self._retry_wait_time(attempt, retry_after, deadline)
+                if wait_time is None:
+                    break
+                await asyncio.sleep(wait_time)
+
+        self._raise_retries_exhausted(last_exception)
+
+    @staticmethod
+    def _read_ollama_stream(response: "requests.Response", on_token: Callable[[str], None] = None) -> str:
+        """读取Ollama流式响应（每行一个JSON对象），拼接消息内容，每收到一段内容调用一次on_token"""
+        parts = []
+        try:
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                chunk = _json_loads(line)
+                if 'error' in chunk:
+                    raise AIServiceError(f"Ollama返回错误: {chunk['error']}", error_code="STREAM_ERROR")
+                content = chunk.get('message', {}).get('content', '')
+                if content:
+                    parts.append(content)
+                    if on_token:
+                        on_token(content)
+                if chunk.get('done'):
+                    break
+        finally:
+            response.close()
+        return ''.join(parts)
+
+    @staticmethod
+    def _read_cloud_stream(response: "requests.Response", on_token: Callable[[str], None] = None) -> str:
+        """读取OpenAI兼容接口的SSE流式响应（data: {...}），拼接增量内容"""
+        parts = []
+        try:
+            for line in response.iter_lines():
+                if not line.startswith(b'data:'):
+                    continue
+                data = line[5:].strip()
+                if data == b'[DONE]':
+                    break
+                choices = _json_loads(data).get('choices') or [{}]
+                content = choices[0].get('delta', {}).get('content')
+                if content:
+                    parts.append(content)
+                    if on_token:
+                        on_token(content)
+        finally:
+            response.close()
+        return ''.join(parts)
+
+    @staticmethod
+    def _response_cache_key(model: str, prompt: str) -> str:
+        """根据模型和提示词内容生成缓存键"""
+        return hashlib.blake2b(f"{model}\0{prompt}".encode('utf-8'), digest_size=16).hexdigest()
+
+    def _get_cached_response(self, cache_key: str):
+        """查询AI响应缓存，未命中或已过期返回None"""
+        with self._cache_lock:
+            entry = self._response_cache.get(cache_key)
+            if entry is not None and entry[0] < time.monotonic():
+                del self._response_cache[cache_key]
+                entry = None
+            if entry is None:
+                self.cache_misses += 1
+                return None
+            self._response_cache.move_to_end(cache_key)
+            self.cache_hits += 1
+            return entry[1]
+
+    def _cache_response(self, cache_key: str, content: str):
+        """缓存成功的AI响应，超出容量时淘汰最久未使用的条目"""
+        if self.cache_size <= 0:
+            return
+        with self._cache_lock:
+            self._response_cache[cache_key] = (time.monotonic() + self.cache_ttl, content)
+            self._response_cache.move_to_end(cache_key)
+            while len(self._response_cache) > self.cache_size:
+                self._response_cache.popitem(last=False)
+
+    @staticmethod
+    def _should_use_cache(threat_score: float) -> bool:
+        """严重威胁（评分≥8.0）总是重新分析，不复用缓存结果"""
+        return not threat_score or threat_score < 8.0
+
+    def clear_cache(self):
+        """清空AI响应缓存"""
+        with self._cache_lock:
+            self._response_cache.clear()
+
+    def close(self):
+        """关闭HTTP会话，释放连接池中的keep-alive连接"""
+        if self._hedge_executor is not None:
+            self._hedge_executor.shutdown(wait=False)
+            self._hedge_executor = None
+        if self._http_session is not None:
+            self._http_session.close()
+            self._http_session = None
+
+    async def aclose(self):
+        """关闭异步HTTP会话"""
+        await self._release_async_session()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def analyze_log(self, log_context: str, attack_category: str = None, attack_name: str = None, threat_score: float = None,
+                    on_token: Callable[[str], None] = None) -> str:
+        """增强的AI分析 - 支持攻击类型特定的深度分析
+
+        on_token: 流式模式下每收到一段分析内容即回调，便于界面实时显示；命中缓存时以完整结果回调一次
+        """
+        if not log_context or not log_context.strip():
+            return "无有效日志内容可供分析"
+
+        prompt = self._build_analysis_prompt(log_context, attack_category, attack_name, threat_score)
+        use_cache = self._should_use_cache(threat_score)
+
+        try:
+            if self.ai_type == 'local' and self.local_provider == 'ollama':
+                return self._analyze_with_ollama(prompt, use_cache=use_cache, on_token=on_token)
+            else:
+                try:
+                    return self._analyze_with_cloud(prompt, use_cache=use_cache, on_token=on_token)
+                except Exception as e:
+                    error_msg = f"云端AI分析失败: {str(e)}"
+                    self.logger.warning(error_msg)
+                    return self._generate_fallback_analysis(attack_category, threat_score)
+
+        except Exception as e:
+            self.logger.error(f"AI分析失败: {e}")
+            return self._generate_fallback_analysis(attack_category, threat_score)
+
+    async def analyze_log_async(self, log_context: str, attack_category: str = None, attack_name: str = None,
+                                threat_score: float = None) -> str:
+        """analyze_log 的异步版本，可通过 asyncio.gather 并发分析多段日志"""
+        if not log_context or not log_context.strip():
+            return "无有效日志内容可供分析"
+
+        prompt = self._build_analysis_prompt(log_context, attack_category, attack_name, threat_score)
+        use_cache = self._should_use_cache(threat_score)
+
+        try:
+            if self.ai_type == 'local' and self.local_provider == 'ollama':
+                return await self._aanalyze_with_ollama(prompt, use_cache=use_cache)
+            return await self._aanalyze_with_cloud(prompt, use_cache=use_cache)
+        except Exception as e:
+            self.logger.error(f"AI分析失败: {e}")
+            return self._generate_fallback_analysis(attack_category, threat_score)
+
+    def analyze_logs_batch(self, items: List[Tuple]) -> List[str]:
+        """批量分析多段日志，每 max_batch_size 段合并为一次AI请求
+
+        items中每一项为 analyze_log 的参数元组 (log_context, attack_category, attack_name, threat_score)，
+        返回结果与输入顺序一致；某批结果无法解析时该批逐条调用 analyze_log
+        """
+        results: List[Optional[str]] = [None] * len(items)
+        for chunk in self._batch_chunks(items, results):
+            parsed = self._parse_batch_response(self._request_batch(chunk), len(chunk))
+            if parsed is None:
+                parsed = [self.analyze_log(*items[index]) for index, _ in chunk]
+            for (index, _), content in zip(chunk, parsed):
+                results[index] = content
+        return results
+
+    async def analyze_logs_batch_async(self, items: List[Tuple]) -> List[str]:
+        """analyze_logs_batch 的异步版本，各批请求并发发送"""
+        results: List[Optional[str]] = [None] * len(items)
+        chunks = list(self._batch_chunks(items, results))
+        contents = await asyncio.gather(*(self._arequest_batch(chunk) for chunk in chunks))
+        for chunk, content in zip(chunks, contents):
+            parsed = self._parse_batch_response(content, len(chunk))
+            if parsed is None:
+                parsed = await asyncio.gather(*(self.analyze_log_async(*items[index]) for index, _ in chunk))
+            for (index, _), content in zip(chunk, parsed):
+                results[index] = content
+        return results
+
+    def _batch_chunks(self, items: List[Tuple], results: List[Optional[str]]):
+        """生成各批次的 [(序号, 提示词)]，空日志直接写入结果"""
+        pending = []
+        for index, item in enumerate(items):
+            log_context = item[0]
+            if not log_context or not log_context.strip():
+                results[index] = "无有效日志内容可供分析"
+            else:
+                pending.append((index, self._build_analysis_prompt(*item)))
+        batch_size = max(self.max_batch_size, 1)
+        for start in range(0, len(pending), batch_size):
+            yield pending[start:start + batch_size]
+
+    @staticmethod
+    def _build_batch_prompt(chunk: List[Tuple[int, str]]) -> str:
+        parts = [_BATCH_PROMPT_HEADER.format(count=len(chunk))]
+        for number, (_, prompt) in enumerate(chunk, 1):
+            parts.append(_BATCH_ITEM_MARKER.format(index=number))
+            parts.append(prompt)
+        return ''.join(parts)
+
+    def _batch_max_tokens(self, count: int) -> int:
+        max_tokens = self.deepseek_config.get('max_tokens', 1024)
+        return min(max_tokens * count, max(max_tokens, self.batch_max_tokens))
+
+    def _request_batch(self, chunk: List[Tuple[int, str]]) -> Optional[str]:
+        """发送合并后的批量请求，单条时返回None交由逐条分析处理"""
+        if len(chunk) < 2:
+            return None
+        prompt = self._build_batch_prompt(chunk)
+        if self.ai_type == 'local' and self.local_provider == 'ollama':
+            return self._analyze_with_ollama(prompt)
+        return self._analyze_with_cloud(prompt, self._batch_max_tokens(len(chunk)))
+
+    async def _arequest_batch(self, chunk: List[Tuple[int, str]]) -> Optional[str]:
+        if len(chunk) < 2:
+            return None
+        prompt = self._build_batch_prompt(chunk)
+        if self.ai_type == 'local' and self.local_provider == 'ollama':
+            return await self._aanalyze_with_ollama(prompt)
+        return await self._aanalyze_with_cloud(prompt, self._batch_max_tokens(len(chunk)))
+
+    def _parse_batch_response(self, content: Optional[str], count: int) -> Optional[List[str]]:
+        """解析批量分析返回的JSON数组，格式或数量不符时返回None"""
+        if not content:
+            return None
+        start, end = content.find('['), content.rfind(']')
+        try:
+            parsed = _json_loads(content[start:end + 1]) if 0 <= start < end else None
+        except ValueError:
+            parsed = None
+        if (not isinstance(parsed, list) or len(parsed) != count
+                or not all(isinstance(item, str) for item in parsed)):
+            self.logger.warning(f"批量分析结果无法解析（预期{count}条），改为逐条分析")
+            return None
+        return parsed
+
+    def _truncate(self, log_context: str) -> str:
+        """为避免过长的上下文影响性能，限制日志长度"""
+        if len(log_context) <= self.max_context_chars:
+            return log_context
+        return log_context[:self.max_context_chars] + _TRUNCATED_SUFFIX
+
+    def _build_analysis_prompt(self, log_context: str, attack_category: str = None, attack_name: str = None,
+                               threat_score: float = None) -> str:
+        """组装分析提示词：截断过长日志、选择攻击类型模板、附加威胁评分"""
+        log_context = self._truncate(log_context)
+
+        # 添加威胁评分相关信息，并根据威胁评分调整分析的深度
+        threat_header = ''
+        if threat_score:
+            urgency_level = "常规" if threat_score < 6.0 else "紧急"
+            threat_header = f"**威胁评分:** {threat_score:.1f}/10.0 ({urgency_level}级别)\n\n"
+
+        prefix, suffix = _prompt_template(attack_category, attack_name, threat_header)
+        return prefix + log_context + suffix
+
+    def _generate_fallback_analysis(self, attack_category: str, threat_score: float) -> str:
+        """生成备用分析结果（当AI不可用时）"""
+        template = _FALLBACK_TEMPLATES.get(attack_category, _FALLBACK_DEFAULT)
 
         # 添加威胁评分信息
         if threat_score:
@@ -405,68 +1024,146 @@ class AIAnalyzer:
 
         return template
 
-    def _analyze_with_ollama(self, prompt: str) -> str:
-        """使用本地Ollama模型进行分析"""
-        payload = {
+    def _build_ollama_payload(self, prompt: str, stream: bool) -> Dict[str, Any]:
+        return {
             "model": self.local_model,
             "messages": [{"role": "user", "content": prompt}],
-            "stream": False
+            "stream": stream
         }
+
+    def _build_cloud_payload(self, prompt: str, stream: bool, max_tokens: int = None) -> Dict[str, Any]:
+        return {
+            "model": self.cloud_model,
+            "stream": stream,
+            "max_tokens": max_tokens or self.deepseek_config.get('max_tokens', 1024),
+            "temperature": 0.7,
+            "top_p": 0.7,
+            "messages": [{"role": "user", "content": prompt}]
+        }
+
+    def _finish_content(self, content: str, cache_key: str) -> str:
+        """缓存非空的分析结果"""
+        if content:
+            self._cache_response(cache_key, content)
+            return content
+        self.logger.error("AI返回内容为空")
+        return "AI分析结果为空"
+
+    def _finish_ollama_result(self, result: Dict[str, Any], cache_key: str) -> str:
+        """处理Ollama非流式响应格式"""
+        if 'message' in result and 'content' in result['message']:
+            content = result['message']['content']
+            self._cache_response(cache_key, content)
+            return content
+        else:
+            self.logger.error(f"Ollama响应格式异常: {result}")
+            return "AI分析结果格式异常"
+
+    def _finish_cloud_result(self, result: Dict[str, Any], cache_key: str) -> str:
+        """处理云端API非流式响应格式"""
+        if 'choices' in result and len(result['choices']) > 0:
+            message = result['choices'][0].get('message', {})
+            return self._finish_content(message.get('content', ''), cache_key)
+        else:
+            self.logger.error(f"云端API响应格式异常: {result}")
+            return "AI分析结果格式异常"
+
+    def _analyze_with_ollama(self, prompt: str, use_cache: bool = True,
+                             on_token: Callable[[str], None] = None) -> str:
+        """使用本地Ollama模型进行分析"""
+        cache_key = self._response_cache_key(self.local_model, prompt)
+        cached = self._get_cached_response(cache_key) if use_cache else None
+        if cached is not None:
+            self.logger.debug("使用缓存的AI分析结果")
+            if on_token:
+                on_token(cached)
+            return cached
+
+        payload = self._build_ollama_payload(prompt, self.stream_responses)
         
         try:
             response = self._make_request_with_retry(
-                self.local_base_url,
+                self.local_chat_url,
                 self.local_headers,
                 payload,
-                self.ollama_config.get('timeout', 60)
+                self.ollama_config.get('timeout', 60),
+                stream=self.stream_responses
             )
-            result = response.json()
-            
-            # 处理Ollama响应格式
-            if 'message' in result and 'content' in result['message']:
-                return result['message']['content']
-            else:
-                self.logger.error(f"Ollama响应格式异常: {result}")
-                return "AI分析结果格式异常"
+            if self.stream_responses:
+                return self._finish_content(self._read_ollama_stream(response, on_token), cache_key)
+            return self._finish_ollama_result(_json_loads(response.content), cache_key)
         except Exception as e:
             self.logger.error(f"Ollama分析失败: {e}")
             return f"本地AI分析失败: {str(e)}"
 
-    def _analyze_with_cloud(self, prompt: str) -> str:
+    def _analyze_with_cloud(self, prompt: str, max_tokens: int = None, use_cache: bool = True,
+                            on_token: Callable[[str], None] = None) -> str:
         """使用云端模型进行分析"""
         if not self.api_key:
             return "AI分析失败: 未配置API密钥"
-        
-        payload = {
-            "model": self.cloud_model,
-            "stream": False,
-            "max_tokens": self.deepseek_config.get('max_tokens', 1024),
-            "temperature": 0.7,
-            "top_p": 0.7,
-            "messages": [{"role": "user", "content": prompt}]
-        }
+
+        cache_key = self._response_cache_key(self.cloud_model, prompt)
+        cached = self._get_cached_response(cache_key) if use_cache else None
+        if cached is not None:
+            self.logger.debug("使用缓存的AI分析结果")
+            if on_token:
+                on_token(cached)
+            return cached
+
+        payload = self._build_cloud_payload(prompt, self.stream_responses, max_tokens)
         
         try:
             response = self._make_request_with_retry(
                 self.cloud_base_url,
                 self.cloud_headers,
                 payload,
+                self.deepseek_config.get('timeout', 30),
+                stream=self.stream_responses
+            )
+            if self.stream_responses:
+                return self._finish_content(self._read_cloud_stream(response, on_token), cache_key)
+            return self._finish_cloud_result(_json_loads(response.content), cache_key)
+        except Exception as e:
+            self.logger.error(f"云端AI分析失败: {e}")
+            return f"云端AI分析失败: {str(e)}"
+
+    async def _aanalyze_with_ollama(self, prompt: str, use_cache: bool = True) -> str:
+        """异步调用本地Ollama模型（非流式）"""
+        cache_key = self._response_cache_key(self.local_model, prompt)
+        cached = self._get_cached_response(cache_key) if use_cache else None
+        if cached is not None:
+            return cached
+
+        try:
+            result = await self._amake_request_with_retry(
+                self.local_chat_url,
+                self.local_headers,
+                self._build_ollama_payload(prompt, False),
+                self.ollama_config.get('timeout', 60)
+            )
+            return self._finish_ollama_result(result, cache_key)
+        except Exception as e:
+            self.logger.error(f"Ollama分析失败: {e}")
+            return f"本地AI分析失败: {str(e)}"
+
+    async def _aanalyze_with_cloud(self, prompt: str, max_tokens: int = None, use_cache: bool = True) -> str:
+        """异步调用云端模型（非流式）"""
+        if not self.api_key:
+            return "AI分析失败: 未配置API密钥"
+
+        cache_key = self._response_cache_key(self.cloud_model, prompt)
+        cached = self._get_cached_response(cache_key) if use_cache else None
+        if cached is not None:
+            return cached
+
+        try:
+            result = await self._amake_request_with_retry(
+                self.cloud_base_url,
+                self.cloud_headers,
+                self._build_cloud_payload(prompt, False, max_tokens),
                 self.deepseek_config.get('timeout', 30)
             )
-            result = response.json()
-            
-            # 处理云端API响应格式
-            if 'choices' in result and len(result['choices']) > 0:
-                message = result['choices'][0].get('message', {})
-                content = message.get('content', '')
-                if content:
-                    return content
-                else:
-                    self.logger.error("AI返回内容为空")
-                    return "AI分析结果为空"
-            else:
-                self.logger.error(f"云端API响应格式异常: {result}")
-                return "AI分析结果格式异常"
+            return self._finish_cloud_result(result, cache_key)
         except Exception as e:
             self.logger.error(f"云端AI分析失败: {e}")
             return f"云端AI分析失败: {str(e)}"
@@ -476,21 +1173,7 @@ class AIAnalyzer:
         if not log_sample or not log_sample.strip():
             return {"error": "日志样例为空"}
         
-        prompt = f"""任务:分析日志样例并生成仅包含YAML格式的解析规则，无任何额外文本或解释。
-日志样例: {log_sample}
-输出要求:
-1. 仅返回YAML数组，每个元素必须包含name和regex字段
-2. regex使用单引号包裹，确保能匹配整个字段内容
-3. 字段名使用下划线命名法(snake_case)
-4. 按日志出现顺序排列字段
-示例格式:
-- name: src_ip
-  regex: '(\d+\.\d+\.\d+\.\d+)'
-- name: timestamp
-  regex: '\[(.*?)\]'
-- name: request_method
-  regex: '"([A-Z]+)'
-严格遵循上述格式，不要添加任何说明文字！"""
+        prompt = _RULES_PROMPT_PREFIX + log_sample + _RULES_PROMPT_SUFFIX
 
         try:
             if self.ai_type == 'local' and self.local_provider == 'ollama':
@@ -515,12 +1198,12 @@ class AIAnalyzer:
         }
         
         response = self._make_request_with_retry(
-            f"{self.local_base_url}/api/chat",
+            self.local_chat_url,
             self.local_headers,
             payload,
             self.ollama_config.get('timeout', 60)
         )
-        result = response.json()
+        result = _json_loads(response.content)
         return result.get('message', {}).get('content', '')
 
     def _generate_rules_with_cloud(self, prompt: str) -> str:
@@ -536,18 +1219,15 @@ class AIAnalyzer:
             payload,
             self.deepseek_config.get('timeout', 60)
         )
-        result = response.json()
+        result = _json_loads(response.content)
         return result.get("choices", [{}])[0].get("message", {}).get("content", "")
 
     def _parse_yaml_rules(self, ai_content: str) -> Dict[str, Any]:
         """解析AI返回的YAML规则"""
         try:
             # 提取YAML内容（处理可能的代码块标记）
-            import re
-            yaml_match = re.search(r'```yaml\n(.*?)\n```', ai_content, re.DOTALL)
-            if yaml_match:
-                yaml_content = yaml_match.group(1)
-            else:
+            yaml_content = _extract_yaml_block(ai_content)
+            if yaml_content is None:
                 # 尝试直接使用内容作为YAML
                 yaml_content = ai_content.strip()
 
@@ -555,22 +1235,28 @@ class AIAnalyzer:
                 self.logger.error("AI返回内容为空")
                 return {"error": "AI返回内容为空"}
 
-            parsed_rules = yaml.safe_load(yaml_content)
+            parsed_rules = _yaml_load(yaml_content)
             if not isinstance(parsed_rules, list):
                 self.logger.error(f"AI返回格式错误，预期列表但得到: {type(parsed_rules).__name__}")
                 return {"error": f"AI返回格式错误，预期列表但得到: {type(parsed_rules).__name__}"}
 
-            # 转换为字段字典
+            # 转换为字段字典，正则在此处一次性编译校验，后续逐行匹配直接复用
             fields = {}
+            raw_fields = {}
             for item in parsed_rules:
                 if isinstance(item, dict) and 'name' in item and 'regex' in item:
-                    fields[item['name']] = item['regex']
+                    try:
+                        fields[item['name']] = re.compile(item['regex'])
+                    except (re.error, TypeError) as e:
+                        self.logger.warning(f"字段 {item['name']} 的正则无效: {e}")
+                        continue
+                    raw_fields[item['name']] = item['regex']
                 else:
                     self.logger.warning(f"无效的规则项: {item}")
 
-            return {"fields": fields}
+            return {"fields": fields, "raw": raw_fields}
 
-        except yaml.YAMLError as e:
+        except _yaml().YAMLError as e:
             self.logger.error(f"YAML解析失败: {e}\n原始内容: {ai_content}")
             return {"error": f"YAML解析失败: {e}"}
         except Exception as e:
@@ -4,17 +4,220 @@ AI配置管理器
 管理LM Studio模型配置和AI功能设置
 """
 
-import yaml
-import json
+import copy
+import hashlib
 import logging
+from contextlib import contextmanager, suppress
+from functools import lru_cache, wraps
+from types import MappingProxyType
 from pathlib import Path
-from typing import Dict, Any, Optional, List
-from dataclasses import dataclass, asdict
+from typing import TYPE_CHECKING, Dict, Any, Optional, List, Mapping
+from dataclasses import dataclass, asdict, field
 import os
+import sys
+import threading
 
-from core.lm_studio_connector import LMStudioConfig, SECURITY_ANALYSIS_CONFIG, THREAT_ASSESSMENT_CONFIG, INTERACTIVE_QUERY_CONFIG
-
-@dataclass
+# LM Studio连接器依赖requests/aiohttp，只在真正需要LM Studio配置对象时才导入
+if TYPE_CHECKING:
+    from core.lm_studio_connector import LMStudioConfig
+
+
+@lru_cache(maxsize=None)
+def _yaml_io():
+    """按需导入PyYAML，返回(yaml, Loader, Dumper)，优先使用libyaml的C实现"""
+    import yaml
+    if hasattr(yaml, 'CSafeLoader') and hasattr(yaml, 'CSafeDumper'):
+        return yaml, yaml.CSafeLoader, yaml.CSafeDumper
+    logging.getLogger(__name__).warning("PyYAML未编译libyaml扩展，AI配置将使用纯Python解析器")
+    return yaml, yaml.SafeLoader, yaml.SafeDumper
+
+@lru_cache(maxsize=None)
+def _json_codec():
+    """按需选择JSON编解码实现，返回(dumps, loads)；优先使用orjson，未安装时回退到标准库json"""
+    try:
+        import orjson
+    except ImportError:
+        import json
+
+        def dumps(obj) -> bytes:
+            return json.dumps(obj, indent=2, ensure_ascii=False).encode('utf-8')
+
+        return dumps, json.loads
+
+    def dumps(obj) -> bytes:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+
+    return dumps, orjson.loads
+
+
+# 进程内已解析配置文件缓存: {绝对路径: ((st_mtime_ns, st_size), 配置)}
+# 文件未变化时重复加载只需一次stat和深拷贝，无需重新解析YAML
+_PARSED_CACHE: Dict[str, tuple] = {}
+
+
+def _file_signature(path: Path) -> tuple:
+    st = path.stat()
+    return st.st_mtime_ns, st.st_size
+
+
+def _intern_keys(value):
+    """递归驻留配置字典的键
+
+    代码中的键字面量本身已被驻留，解析得到的键驻留后字典查找可直接按身份命中，省去逐字符比较
+    """
+    if isinstance(value, dict):
+        return {sys.intern(k) if isinstance(k, str) else k: _intern_keys(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_intern_keys(v) for v in value]
+    return value
+
+
+def _sidecar_path(path: Path) -> Path:
+    """YAML配置对应的JSON缓存文件（如 ai_config.yaml.json）"""
+    return path.with_name(path.name + '.json')
+
+
+def _read_sidecar(path: Path, signature: tuple) -> Optional[Dict[str, Any]]:
+    """读取与YAML配置签名一致的JSON缓存，缺失、过期或损坏时返回None"""
+    import json
+
+    try:
+        data = json.loads(_sidecar_path(path).read_bytes())
+    except (OSError, ValueError):
+        return None
+    # 文件时间戳精度可能较粗，只比较新旧不可靠，这里要求签名完全一致
+    if not isinstance(data, dict) or data.get("source") != list(signature):
+        return None
+    config = data.get("config")
+    return config if isinstance(config, dict) else None
+
+
+def _write_sidecar(path: Path, config: Dict[str, Any]):
+    """原子地写入JSON缓存，配置含JSON无法无损表示的值时不写"""
+    import json
+
+    sidecar = _sidecar_path(path)
+    tmp = sidecar.with_name(sidecar.name + '.tmp')
+    try:
+        payload = json.dumps(config, ensure_ascii=False)
+        # 日期、非字符串键等经JSON往返后会变样，这类配置只能走YAML
+        if json.loads(payload) != config:
+            return
+        payload = json.dumps({"source": list(_file_signature(path)), "config": config}, ensure_ascii=False)
+        tmp.write_text(payload, encoding='utf-8')
+        os.replace(tmp, sidecar)
+    except (TypeError, ValueError, OSError) as e:
+        logging.getLogger(__name__).debug(f"写入配置JSON缓存失败: {e}")
+        with suppress(OSError):
+            tmp.unlink(missing_ok=True)
+
+
+# 默认威胁等级分数与敏感字段，被默认配置和各配置数据类共用
+_DEFAULT_THREAT_LEVELS = MappingProxyType({
+    "critical": 9.5,
+    "high": 7.5,
+    "medium": 5.5,
+    "low": 3.5
+})
+_DEFAULT_SENSITIVE_FIELDS = (
+    "password", "token", "api_key", "secret", "credential",
+    "session", "cookie", "authorization", "auth"
+)
+
+# 取不到配置节时使用的只读空映射，避免每次调用都新建{}
+_EMPTY = MappingProxyType({})
+
+# 默认配置，只在模块加载时构建一次，使用时深拷贝
+_DEFAULT_CONFIG = {
+    "lm_studio": {
+        "host": "127.0.0.1",
+        "port": 1234,
+        "timeout": 30,
+        "retry_attempts": 3,
+        "retry_delay": 1.0,
+        "retry_backoff": 2.0,
+        "max_concurrency": 8,
+        "rate_limit": 0.0,
+        "model": {
+            "preferred_model": "",
+            "max_tokens": 2048,
+            "marshal_max_tokens": 4096,
+            "temperature": 0.7,
+            "top_p": 0.9,
+            "frequency_penalty": 0.0,
+            "presence_penalty": 0.0
+        },
+        "cache": {
+            "enabled": True,
+            "ttl": 3600,
+            "max_size": 1000
+        }
+    },
+    "ai_features": {
+        "threat_analysis": True,
+        "natural_language_query": True,
+        "rule_explanation": True,
+        "security_recommendations": True,
+        "batch_analysis": True
+    },
+    "analysis": {
+        "scoring_weights": {
+            "ai_weight": 0.4,
+            "rule_weight": 0.6,
+            "threat_levels": dict(_DEFAULT_THREAT_LEVELS)
+        },
+        "thresholds": {
+            "confidence_threshold": 0.3,
+            "threat_score_threshold": 5.0,
+            "processing_time_threshold": 10.0
+        }
+    },
+    "performance": {
+        "max_concurrent_requests": 5,
+        "batch_size": 10,
+        "request_timeout": 30,
+        "batch_timeout": 60,
+        "max_memory_usage": "1GB",
+        "max_cpu_usage": 50,
+        "match_cache_size": 4096
+    },
+    "logging": {
+        "level": "INFO",
+        "detailed_logging": False,
+        "log_requests": False,
+        "log_responses": False
+    },
+    "security": {
+        "filter_sensitive_data": True,
+        "sensitive_fields": list(_DEFAULT_SENSITIVE_FIELDS)
+    }
+}
+
+
+# 配置数据类在Python 3.10+上使用__slots__，省去实例__dict__；更早版本保持原样
+_DATACLASS_OPTIONS = {"slots": True} if sys.version_info >= (3, 10) else {}
+
+
+def _memoize_by_generation(method):
+    """按配置代数缓存getter结果，配置变更（代数递增）后才重新构建
+
+    缓存的对象会在多次调用间共享，只用于调用方不会原地修改返回值的getter
+    """
+    name = method.__name__
+
+    @wraps(method)
+    def wrapper(self):
+        cached = self._memo.get(name)
+        if cached is not None and cached[0] == self._gen:
+            return cached[1]
+        value = method(self)
+        self._memo[name] = (self._gen, value)
+        return value
+
+    return wrapper
+
+
+@dataclass(**_DATACLASS_OPTIONS)
 class AIAnalysisConfig:
     """AI分析配置"""
     threat_analysis: bool = True
@@ -23,30 +226,21 @@ class AIAnalysisConfig:
     security_recommendations: bool = True
     batch_analysis: bool = True
 
-@dataclass
+@dataclass(**_DATACLASS_OPTIONS)
 class AnalysisThresholds:
     """分析阈值配置"""
     confidence_threshold: float = 0.3
     threat_score_threshold: float = 5.0
     processing_time_threshold: float = 10.0
 
-@dataclass
+@dataclass(**_DATACLASS_OPTIONS)
 class ScoringWeights:
     """评分权重配置"""
     ai_weight: float = 0.4
     rule_weight: float = 0.6
-    threat_levels: Dict[str, float] = None
+    threat_levels: Dict[str, float] = field(default_factory=lambda: dict(_DEFAULT_THREAT_LEVELS))
 
-    def __post_init__(self):
-        if self.threat_levels is None:
-            self.threat_levels = {
-                "critical": 9.5,
-                "high": 7.5,
-                "medium": 5.5,
-                "low": 3.5
-            }
-
-@dataclass
+@dataclass(**_DATACLASS_OPTIONS)
 class PerformanceConfig:
     """性能配置"""
     max_concurrent_requests: int = 5
@@ -55,8 +249,9 @@ class PerformanceConfig:
     batch_timeout: int = 60
     max_memory_usage: str = "1GB"
     max_cpu_usage: int = 50
+    match_cache_size: int = 4096  # 规则匹配结果缓存条数，0表示不缓存
 
-@dataclass
+@dataclass(**_DATACLASS_OPTIONS)
 class LoggingConfig:
     """日志配置"""
     level: str = "INFO"
@@ -64,18 +259,20 @@ class LoggingConfig:
     log_requests: bool = False
     log_responses: bool = False
 
-@dataclass
+@dataclass(**_DATACLASS_OPTIONS)
 class SecurityConfig:
     """安全配置"""
     filter_sensitive_data: bool = True
-    sensitive_fields: List[str] = None
+    sensitive_fields: List[str] = field(default_factory=lambda: list(_DEFAULT_SENSITIVE_FIELDS))
+    # 归一化大小写后的敏感字段集合，供逐条记录做O(1)成员判断
+    sensitive_fields_set: frozenset = field(init=False, repr=False, compare=False)
 
     def __post_init__(self):
-        if self.sensitive_fields is None:
-            self.sensitive_fields = [
-                "password", "token", "api_key", "secret", "credential",
-                "session", "cookie", "authorization", "auth"
-            ]
+        self.sensitive_fields_set = frozenset(f.casefold() for f in self.sensitive_fields)
+
+    def is_sensitive(self, field_name: str) -> bool:
+        """字段名是否属于敏感字段（不区分大小写）"""
+        return field_name.casefold() in self.sensitive_fields_set
 
 class AIConfigManager:
     """AI配置管理器"""
@@ -84,6 +281,18 @@ class AIConfigManager:
         self.config_file = Path(config_file)
         self.logger = logging.getLogger(__name__)
         self.config = {}
+        # 当前配置尚未写入磁盘（例如配置文件缺失时使用的默认配置）
+        self._dirty = False
+        # 配置代数，每次修改配置时递增，用于失效getter缓存
+        self._gen = 0
+        self._memo: Dict[str, tuple] = {}
+        # (配置代数, ai_features只读视图)，供 is_feature_enabled 使用
+        self._features_view: Optional[tuple] = None
+        # 上次写入内容的摘要及写入后的文件签名，内容未变时跳过写盘
+        self._last_saved: Optional[tuple] = None
+        # defer_saves 嵌套层数，大于0时修改只标记为未保存
+        self._defer_depth = 0
+        self._dir_ready = False
 
         # 加载配置
         self.load_config()
@@ -92,30 +301,74 @@ class AIConfigManager:
         """加载配置文件"""
         try:
             if not self.config_file.exists():
+                # 默认配置暂不落盘，等首次保存或显式调用 ensure_persisted 时再写入
                 self.logger.warning(f"配置文件不存在: {self.config_file}，使用默认配置")
-                self._create_default_config()
+                self._use_default_config()
                 return False
 
-            with open(self.config_file, 'r', encoding='utf-8') as f:
-                self.config = yaml.safe_load(f)
+            cache_key = str(self.config_file.resolve())
+            signature = _file_signature(self.config_file)
+            cached = _PARSED_CACHE.get(cache_key)
+            if cached is not None and cached[0] == signature:
+                self.config = copy.deepcopy(cached[1])
+            else:
+                # JSON缓存与YAML签名一致时直接读取，省去YAML解析
+                config = _read_sidecar(self.config_file, signature)
+                if config is None:
+                    yaml, loader, _ = _yaml_io()
+                    # 一次读入整个文件，由YAML加载器自行解码
+                    config = yaml.load(self.config_file.read_bytes(), Loader=loader)
+                    # 只在配置目录可写时顺带生成JSON缓存，只读安装下加载配置不写任何文件
+                    if os.access(self.config_file.parent, os.W_OK):
+                        _write_sidecar(self.config_file, config)
+                self.config = _intern_keys(config)
+                _PARSED_CACHE[cache_key] = (signature, copy.deepcopy(self.config))
+            self._gen += 1
 
             self.logger.info(f"AI配置已加载: {self.config_file}")
             return True
 
         except Exception as e:
             self.logger.error(f"加载AI配置失败: {e}")
-            self._create_default_config()
+            self._use_default_config()
             return False
 
     def save_config(self) -> bool:
         """保存配置文件"""
         try:
-            # 确保目录存在
-            self.config_file.parent.mkdir(parents=True, exist_ok=True)
-
-            with open(self.config_file, 'w', encoding='utf-8') as f:
-                yaml.dump(self.config, f, default_flow_style=False, allow_unicode=True, indent=2)
-
+            yaml, _, dumper = _yaml_io()
+            # 先在内存中序列化，再一次性写入文件
+            payload = yaml.dump(self.config, Dumper=dumper, default_flow_style=False, allow_unicode=True,
+                                indent=2, encoding='utf-8')
+            digest = hashlib.blake2b(payload, digest_size=16).digest()
+            if self._last_saved is not None and self._last_saved[0] == digest and self._is_unchanged_on_disk():
+                self._dirty = False
+                self._gen += 1
+                self.logger.debug(f"AI配置未变化，跳过写入: {self.config_file}")
+                return True
+
+            # 确保目录存在（每个实例只需检查一次）
+            if not self._dir_ready:
+                self.config_file.parent.mkdir(parents=True, exist_ok=True)
+                self._dir_ready = True
+
+            # 先写临时文件再原子替换，写到一半崩溃也不会损坏原配置
+            tmp = self.config_file.with_name(self.config_file.name + '.tmp')
+            try:
+                tmp.write_bytes(payload)
+                os.replace(tmp, self.config_file)
+            except OSError:
+                tmp.unlink(missing_ok=True)
+                raise
+            _write_sidecar(self.config_file, self.config)
+
+            # 刚写入的内容即为最新解析结果，替换掉该路径的旧缓存
+            signature = _file_signature(self.config_file)
+            _PARSED_CACHE[str(self.config_file.resolve())] = (signature, copy.deepcopy(self.config))
+            self._last_saved = (digest, signature)
+
+            self._dirty = False
+            self._gen += 1
             self.logger.info(f"AI配置已保存: {self.config_file}")
             return True
 
@@ -123,88 +376,72 @@ class AIConfigManager:
             self.logger.error(f"保存AI配置失败: {e}")
             return False
 
-    def _create_default_config(self):
-        """创建默认配置"""
-        self.config = {
-            "lm_studio": {
-                "host": "127.0.0.1",
-                "port": 1234,
-                "timeout": 30,
-                "retry_attempts": 3,
-                "retry_delay": 1.0,
-                "model": {
-                    "preferred_model": "",
-                    "max_tokens": 2048,
-                    "temperature": 0.7,
-                    "top_p": 0.9,
-                    "frequency_penalty": 0.0,
-                    "presence_penalty": 0.0
-                },
-                "cache": {
-                    "enabled": True,
-                    "ttl": 3600,
-                    "max_size": 1000
-                }
-            },
-            "ai_features": {
-                "threat_analysis": True,
-                "natural_language_query": True,
-                "rule_explanation": True,
-                "security_recommendations": True,
-                "batch_analysis": True
-            },
-            "analysis": {
-                "scoring_weights": {
-                    "ai_weight": 0.4,
-                    "rule_weight": 0.6,
-                    "threat_levels": {
-                        "critical": 9.5,
-                        "high": 7.5,
-                        "medium": 5.5,
-                        "low": 3.5
-                    }
-                },
-                "thresholds": {
-                    "confidence_threshold": 0.3,
-                    "threat_score_threshold": 5.0,
-                    "processing_time_threshold": 10.0
-                }
-            },
-            "performance": {
-                "max_concurrent_requests": 5,
-                "batch_size": 10,
-                "request_timeout": 30,
-                "batch_timeout": 60,
-                "max_memory_usage": "1GB",
-                "max_cpu_usage": 50
-            },
-            "logging": {
-                "level": "INFO",
-                "detailed_logging": False,
-                "log_requests": False,
-                "log_responses": False
-            },
-            "security": {
-                "filter_sensitive_data": True,
-                "sensitive_fields": [
-                    "password", "token", "api_key", "secret", "credential",
-                    "session", "cookie", "authorization", "auth"
-                ]
-            }
-        }
+    def _is_unchanged_on_disk(self) -> bool:
+        """配置文件自上次保存后是否未被外部修改"""
+        try:
+            return _file_signature(self.config_file) == self._last_saved[1]
+        except OSError:
+            return False
 
+    def ensure_persisted(self) -> bool:
+        """确保当前配置已写入配置文件"""
+        if not self._dirty:
+            return True
+        return self.save_config()
+
+    def _save_or_defer(self) -> bool:
+        """修改配置后保存；处于 defer_saves 中时只标记为未保存"""
+        self._dirty = True
+        if self._defer_depth:
+            return True
+        return self.save_config()
+
+    @contextmanager
+    def defer_saves(self):
+        """合并多次修改，退出最外层时才统一写入一次配置文件"""
+        self._defer_depth += 1
+        try:
+            yield self
+        finally:
+            self._defer_depth -= 1
+            if not self._defer_depth:
+                self.ensure_persisted()
+
+    def _use_default_config(self):
+        """使用默认配置（仅内存中，不写入磁盘）"""
+        self.config = self._default_config()
+        self._dirty = True
+        self._gen += 1
+
+    def _create_default_config(self):
+        """创建默认配置并写入配置文件"""
+        self._use_default_config()
         self.save_config()
 
-    def get_lm_studio_config(self) -> LMStudioConfig:
-        """获取LM Studio配置"""
-        lm_config = self.config.get("lm_studio", {})
+    @staticmethod
+    def _default_config() -> Dict[str, Any]:
+        """默认配置（深拷贝自模块级常量，调用方可随意修改）"""
+        return copy.deepcopy(_DEFAULT_CONFIG)
+
+    def get_lm_studio_config(self) -> "LMStudioConfig":
+        """获取LM Studio配置
+
+        每次调用都构建新对象：连接器和模型管理会原地修改返回值（如 model_name），不能在调用方之间共享
+        """
+        from core.lm_studio_connector import LMStudioConfig, LMStudioAPIConfig, LMStudioModelConfig
+
+        lm_config = self.config.get("lm_studio") or _EMPTY
+        host = lm_config.get("host", "127.0.0.1")
+        port = lm_config.get("port", 1234)
 
         # 解析API配置
-        api_config = lm_config.get("api", {})
-        from core.lm_studio_connector import LMStudioAPIConfig, LMStudioModelConfig
+        api_config = lm_config.get("api") or _EMPTY
+        base_url = api_config.get("base_url")
+        if base_url is None:
+            base_url = f"http://{host}:{port}/v1"
 
         api = LMStudioAPIConfig(
-            base_url=api_config.get("base_url", f"http://{lm_config.get('host', '127.0.0.1')}:{lm_config.get('port', 1234)}/v1"),
+            base_url=base_url,
             chat_endpoint=api_config.get("chat_endpoint", "/chat/completions"),
             models_endpoint=api_config.get("models_endpoint", "/models"),
             api_key=api_config.get("api_key", ""),
@@ -212,11 +449,12 @@ class AIConfigManager:
         )
 
         # 解析模型配置
-        model_config = lm_config.get("model", {})
+        model_config = lm_config.get("model") or _EMPTY
         model = LMStudioModelConfig(
             preferred_model=model_config.get("preferred_model", ""),
             model_mapping=model_config.get("model_mapping", {}),
             max_tokens=model_config.get("max_tokens", 2048),
+            marshal_max_tokens=model_config.get("marshal_max_tokens", 4096),
             temperature=model_config.get("temperature", 0.7),
             top_p=model_config.get("top_p", 0.9),
             frequency_penalty=model_config.get("frequency_penalty", 0.0),
@@ -226,16 +464,19 @@ class AIConfigManager:
         )
 
         return LMStudioConfig(
-            host=lm_config.get("host", "127.0.0.1"),
-            port=lm_config.get("port", 1234),
+            host=host,
+            port=port,
             timeout=lm_config.get("timeout", 30),
             retry_attempts=lm_config.get("retry_attempts", 3),
             retry_delay=lm_config.get("retry_delay", 1.0),
+            retry_backoff=lm_config.get("retry_backoff", 2.0),
+            max_concurrency=lm_config.get("max_concurrency", 8),
+            rate_limit=lm_config.get("rate_limit", 0.0),
             api=api,
             model=model
         )
 
-    def get_preset_config(self, preset_name: str) -> Optional[LMStudioConfig]:
+    def get_preset_config(self, preset_name: str) -> Optional["LMStudioConfig"]:
         """获取预设配置"""
         presets = self.config.get("presets", {})
         preset_config = presets.get(preset_name)
@@ -247,13 +488,14 @@ class AIConfigManager:
         base_config = self.get_lm_studio_config()
 
         # 应用预设配置
-        from core.lm_studio_connector import LMStudioAPIConfig, LMStudioModelConfig
+        from core.lm_studio_connector import LMStudioConfig, LMStudioModelConfig
 
         # 创建新的模型配置，应用预设值
         model = LMStudioModelConfig(
             preferred_model=base_config.model.preferred_model,
             model_mapping=base_config.model.model_mapping,
             max_tokens=preset_config.get("max_tokens", base_config.model.max_tokens),
+            marshal_max_tokens=base_config.model.marshal_max_tokens,
             temperature=preset_config.get("temperature", base_config.model.temperature),
             top_p=preset_config.get("top_p", base_config.model.top_p),
             frequency_penalty=base_config.model.frequency_penalty,
@@ -268,13 +510,17 @@ class AIConfigManager:
             timeout=base_config.timeout,
             retry_attempts=base_config.retry_attempts,
             retry_delay=base_config.retry_delay,
+            retry_backoff=base_config.retry_backoff,
+            max_concurrency=base_config.max_concurrency,
+            rate_limit=base_config.rate_limit,
             api=base_config.api,
             model=model
         )
 
+    @_memoize_by_generation
     def get_ai_features_config(self) -> AIAnalysisConfig:
         """获取AI功能配置"""
-        features = self.config.get("ai_features", {})
+        features = self.config.get("ai_features") or _EMPTY
 
         return AIAnalysisConfig(
             threat_analysis=features.get("threat_analysis", True),
@@ -284,28 +530,31 @@ class AIConfigManager:
             batch_analysis=features.get("batch_analysis", True)
         )
 
+    @_memoize_by_generation
     def get_analysis_config(self) -> Dict[str, Any]:
         """获取分析配置"""
-        analysis = self.config.get("analysis", {})
+        analysis = self.config.get("analysis") or _EMPTY
+        sw = analysis.get("scoring_weights") or _EMPTY
+        th = analysis.get("thresholds") or _EMPTY
+        threat_levels = sw.get("threat_levels")
 
         return {
             "scoring_weights": ScoringWeights(
-                ai_weight=analysis.get("scoring_weights", {}).get("ai_weight", 0.4),
-                rule_weight=analysis.get("scoring_weights", {}).get("rule_weight", 0.6),
-                threat_levels=analysis.get("scoring_weights", {}).get("threat_levels", {
-                    "critical": 9.5, "high": 7.5, "medium": 5.5, "low": 3.5
-                })
+                ai_weight=sw.get("ai_weight", 0.4),
+                rule_weight=sw.get("rule_weight", 0.6),
+                threat_levels=dict(_DEFAULT_THREAT_LEVELS) if threat_levels is None else threat_levels
             ),
             "thresholds": AnalysisThresholds(
-                confidence_threshold=analysis.get("thresholds", {}).get("confidence_threshold", 0.3),
-                threat_score_threshold=analysis.get("thresholds", {}).get("threat_score_threshold", 5.0),
-                processing_time_threshold=analysis.get("thresholds", {}).get("processing_time_threshold", 10.0)
+                confidence_threshold=th.get("confidence_threshold", 0.3),
+                threat_score_threshold=th.get("threat_score_threshold", 5.0),
+                processing_time_threshold=th.get("processing_time_threshold", 10.0)
             )
         }
 
+    @_memoize_by_generation
     def get_performance_config(self) -> PerformanceConfig:
         """获取性能配置"""
-        perf = self.config.get("performance", {})
+        perf = self.config.get("performance") or _EMPTY
 
         return PerformanceConfig(
             max_concurrent_requests=perf.get("max_concurrent_requests", 5),
@@ -313,12 +562,14 @@ class AIConfigManager:
             request_timeout=perf.get("request_timeout", 30),
             batch_timeout=perf.get("batch_timeout", 60),
             max_memory_usage=perf.get("max_memory_usage", "1GB"),
-            max_cpu_usage=perf.get("max_cpu_usage", 50)
+            max_cpu_usage=perf.get("max_cpu_usage", 50),
+            match_cache_size=perf.get("match_cache_size", 4096)
         )
 
+    @_memoize_by_generation
     def get_logging_config(self) -> LoggingConfig:
         """获取日志配置"""
-        logging_config = self.config.get("logging", {})
+        logging_config = self.config.get("logging") or _EMPTY
 
         return LoggingConfig(
             level=logging_config.get("level", "INFO"),
@@ -327,16 +578,15 @@ class AIConfigManager:
             log_responses=logging_config.get("log_responses", False)
         )
 
+    @_memoize_by_generation
     def get_security_config(self) -> SecurityConfig:
         """获取安全配置"""
-        security = self.config.get("security", {})
+        security = self.config.get("security") or _EMPTY
+        sensitive_fields = security.get("sensitive_fields")
 
         return SecurityConfig(
             filter_sensitive_data=security.get("filter_sensitive_data", True),
-            sensitive_fields=security.get("sensitive_fields", [
-                "password", "token", "api_key", "secret", "credential",
-                "session", "cookie", "authorization", "auth"
-            ])
+            sensitive_fields=list(_DEFAULT_SENSITIVE_FIELDS) if sensitive_fields is None else sensitive_fields
         )
 
     def get_prompt_template(self, template_name: str) -> Optional[str]:
@@ -344,7 +594,7 @@ class AIConfigManager:
         prompts = self.config.get("prompts", {})
         return prompts.get(template_name)
 
-    def update_lm_studio_config(self, config: LMStudioConfig) -> bool:
+    def update_lm_studio_config(self, config: "LMStudioConfig") -> bool:
         """更新LM Studio配置"""
         try:
             if "lm_studio" not in self.config:
@@ -356,16 +606,21 @@ class AIConfigManager:
             lm_config["timeout"] = config.timeout
             lm_config["retry_attempts"] = config.retry_attempts
             lm_config["retry_delay"] = config.retry_delay
+            lm_config["retry_backoff"] = config.retry_backoff
+            lm_config["max_concurrency"] = config.max_concurrency
+            lm_config["rate_limit"] = config.rate_limit
 
             if "model" not in lm_config:
                 lm_config["model"] = {}
 
             lm_config["model"]["preferred_model"] = config.model.preferred_model
             lm_config["model"]["max_tokens"] = config.model.max_tokens
+            lm_config["model"]["marshal_max_tokens"] = config.model.marshal_max_tokens
             lm_config["model"]["temperature"] = config.model.temperature
             lm_config["model"]["top_p"] = config.model.top_p
+            self._gen += 1
 
-            return self.save_config()
+            return self._save_or_defer()
 
         except Exception as e:
             self.logger.error(f"更新LM Studio配置失败: {e}")
@@ -375,41 +630,46 @@ class AIConfigManager:
         """更新AI功能配置"""
         try:
             self.config["ai_features"] = asdict(features)
-            return self.save_config()
+            self._gen += 1
+            return self._save_or_defer()
 
         except Exception as e:
             self.logger.error(f"更新AI功能配置失败: {e}")
             return False
 
-    def enable_ai_feature(self, feature: str) -> bool:
-        """启用特定AI功能"""
-        try:
-            if "ai_features" not in self.config:
-                self.config["ai_features"] = {}
+    def set_ai_feature(self, feature: str, enabled: bool) -> bool:
+        """设置特定AI功能的开关"""
+        return self.set_ai_features({feature: enabled})
 
-            self.config["ai_features"][feature] = True
-            return self.save_config()
+    def set_ai_features(self, updates: Dict[str, bool]) -> bool:
+        """批量设置AI功能开关，只保存一次"""
+        try:
+            self.config.setdefault("ai_features", {}).update(updates)
+            self._gen += 1
+            return self._save_or_defer()
 
         except Exception as e:
-            self.logger.error(f"启用AI功能失败: {e}")
+            self.logger.error(f"设置AI功能失败: {e}")
             return False
 
+    def enable_ai_feature(self, feature: str) -> bool:
+        """启用特定AI功能"""
+        return self.set_ai_feature(feature, True)
+
     def disable_ai_feature(self, feature: str) -> bool:
         """禁用特定AI功能"""
-        try:
-            if "ai_features" not in self.config:
-                self.config["ai_features"] = {}
-
-            self.config["ai_features"][feature] = False
-            return self.save_config()
+        return self.set_ai_feature(feature, False)
 
-        except Exception as e:
-            self.logger.error(f"禁用AI功能失败: {e}")
-            return False
+    def get_ai_features_view(self) -> Mapping[str, bool]:
+        """获取AI功能开关的只读视图，适合连续检查多个开关"""
+        cached = self._features_view
+        if cached is None or cached[0] != self._gen:
+            cached = self._features_view = (self._gen, MappingProxyType(self.config.get("ai_features") or _EMPTY))
+        return cached[1]
 
     def is_feature_enabled(self, feature: str) -> bool:
         """检查AI功能是否启用"""
-        return self.config.get("ai_features", {}).get(feature, False)
+        return self.get_ai_features_view().get(feature, False)
 
     def get_model_compatibility_config(self) -> Dict[str, Any]:
         """获取模型兼容性配置"""
@@ -422,31 +682,29 @@ class AIConfigManager:
     def validate_config(self) -> List[str]:
         """验证配置有效性"""
         issues = []
+        config = self.config
+        lm_config = config.get("lm_studio") or _EMPTY
+        model_config = lm_config.get("model") or _EMPTY
+        scoring = (config.get("analysis") or _EMPTY).get("scoring_weights") or _EMPTY
+        perf = config.get("performance") or _EMPTY
 
         # 验证LM Studio配置
-        lm_config = self.config.get("lm_studio", {})
         if not lm_config.get("host"):
             issues.append("LM Studio主机地址未配置")
         if not lm_config.get("port"):
             issues.append("LM Studio端口未配置")
 
         # 验证模型配置
-        model_config = lm_config.get("model", {})
         if model_config.get("max_tokens", 0) <= 0:
             issues.append("最大令牌数必须大于0")
         if not (0 <= model_config.get("temperature", 0.5) <= 2):
             issues.append("温度参数必须在0-2之间")
 
-        # 验证分析配置
-        analysis = self.config.get("analysis", {})
-        scoring = analysis.get("scoring_weights", {})
-        ai_weight = scoring.get("ai_weight", 0.4)
-        rule_weight = scoring.get("rule_weight", 0.6)
-        if abs(ai_weight + rule_weight - 1.0) > 0.01:
+        # 验证分析配置（按百分比取整比较，避免浮点误差）
+        if round((scoring.get("ai_weight", 0.4) + scoring.get("rule_weight", 0.6)) * 100) != 100:
             issues.append("AI权重和规则权重之和必须等于1.0")
 
         # 验证性能配置
-        perf = self.config.get("performance", {})
         if perf.get("max_concurrent_requests", 0) <= 0:
             issues.append("最大并发请求数必须大于0")
         if perf.get("batch_size", 0) <= 0:
@@ -456,9 +714,10 @@ class AIConfigManager:
 
     def export_config(self, output_file: str) -> bool:
         """导出配置到文件"""
+        dumps, _ = _json_codec()
+
         try:
-            with open(output_file, 'w', encoding='utf-8') as f:
-                json.dump(self.config, f, indent=2, ensure_ascii=False)
+            Path(output_file).write_bytes(dumps(self.config))
 
             self.logger.info(f"配置已导出到: {output_file}")
             return True
@@ -469,27 +728,37 @@ class AIConfigManager:
 
     def import_config(self, input_file: str) -> bool:
         """从文件导入配置"""
+        _, loads = _json_codec()
+
         try:
-            with open(input_file, 'r', encoding='utf-8') as f:
-                imported_config = json.load(f)
+            imported_config = _intern_keys(loads(Path(input_file).read_bytes()))
 
             # 验证导入的配置
             self.config = imported_config
+            self._gen += 1
             issues = self.validate_config()
 
             if issues:
                 self.logger.warning(f"导入的配置存在以下问题: {issues}")
                 return False
 
-            return self.save_config()
+            return self._save_or_defer()
 
         except Exception as e:
             self.logger.error(f"导入配置失败: {e}")
             return False
 
-    def get_full_config(self) -> Dict[str, Any]:
-        """获取完整配置"""
-        return self.config.copy()
+    @_memoize_by_generation
+    def get_full_config(self) -> Mapping[str, Any]:
+        """获取完整配置的只读视图
+
+        不再复制配置；需要修改时请使用 get_full_config_copy()，或直接修改 config 后调用 save_config()
+        """
+        return MappingProxyType(self.config)
+
+    def get_full_config_copy(self) -> Dict[str, Any]:
+        """获取完整配置的深拷贝，可随意修改"""
+        return copy.deepcopy(self.config)
 
     def reset_to_default(self) -> bool:
         """重置为默认配置"""
@@ -504,15 +773,22 @@ class AIConfigManager:
 
 # 全局配置管理器实例
 _global_config_manager = None
+_global_lock = threading.Lock()
 
 def get_ai_config_manager(config_file: str = "config/ai_config.yaml") -> AIConfigManager:
     """获取全局AI配置管理器实例"""
     global _global_config_manager
-    if _global_config_manager is None:
-        _global_config_manager = AIConfigManager(config_file)
-    return _global_config_manager
+    manager = _global_config_manager
+    if manager is not None:
+        return manager
+    # 双重检查，避免多个线程同时首次调用时重复解析配置
+    with _global_lock:
+        if _global_config_manager is None:
+            _global_config_manager = AIConfigManager(config_file)
+        return _global_config_manager
 
 def reset_ai_config_manager():
     """重置全局AI配置管理器"""
     global _global_config_manager
-    _global_config_manager = None
\ No newline at end of file
+    with _global_lock:
+        _global_config_manager = None
\ No newline at end of file
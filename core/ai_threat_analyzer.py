@@ -7,7 +7,10 @@ AI驱动的威胁分析模块
 import asyncio
 import json
 import logging
+import re
+import sys
 import time
+from collections import OrderedDict
 from typing import Dict, List, Any, Optional, Tuple
 from dataclasses import dataclass, asdict
 from datetime import datetime
@@ -16,7 +19,152 @@ import hashlib
 
 from core.lm_studio_connector import LMStudioConnector, LMStudioConfig, ChatMessage, SECURITY_ANALYSIS_CONFIG
 
-@dataclass
+# orjson为可选依赖，可直接序列化dataclass和datetime；未安装时回退到标准库json
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# 请求路径中的纯数字或UUID路径段、查询参数值视为易变ID，生成缓存键前替换为占位符，同一攻击换ID重放时可复用分析结果
+_CACHE_KEY_ID_RE = re.compile(
+    r'\d+|[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}'
+)
+
+
+# 参与生成缓存键的日志字段（顺序固定）
+_CACHE_KEY_FIELDS = ('request_path', 'user_agent', 'request_body', 'status_code')
+
+
+def _template_path(path: str) -> str:
+    """将请求路径归一化为模板形式，只替换整段为ID的路径段和查询参数值"""
+    path, sep, query = path.partition('?')
+    segments = ['#' if _CACHE_KEY_ID_RE.fullmatch(segment) else segment for segment in path.split('/')]
+    templated = '/'.join(segments)
+    if not sep:
+        return templated
+    params = []
+    for param in query.split('&'):
+        name, eq, value = param.partition('=')
+        params.append(name + eq + '#' if eq and _CACHE_KEY_ID_RE.fullmatch(value) else param)
+    return templated + sep + '&'.join(params)
+
+
+def _canonicalize(field: str, value: Any) -> str:
+    """将参与缓存键的日志字段转为字符串，请求路径取模板形式，其余字段（含状态码）原样保留"""
+    if value is None:
+        return ''
+    if field == 'request_path':
+        return _template_path(str(value))
+    return str(value)
+
+
+def _json_default(obj: Any) -> Any:
+    """标准库json无法直接序列化的对象"""
+    if isinstance(obj, datetime):
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _dump_result(result: "AIDetectionResult") -> bytes:
+    """序列化单条检测结果"""
+    if orjson is not None:
+        return orjson.dumps(result)
+    return json.dumps(asdict(result), ensure_ascii=False, default=_json_default).encode('utf-8')
+
+
+# 预筛：无规则命中、状态正常、不带载荷的静态资源请求不值得调用AI
+_PREFILTER_STATUS_CODES = frozenset({"200", "301", "304"})
+_STATIC_ASSET_RE = re.compile(
+    r'\.(?:css|js|png|jpe?g|gif|svg|ico|woff2?|ttf|map)(?:\?[\w.=&%-]*)?$', re.IGNORECASE
+)
+_SUSPICIOUS_UA_RE = re.compile(
+    r'sqlmap|nikto|nmap|masscan|zgrab|acunetix|nessus|nuclei|dirbuster|gobuster|wpscan|'
+    r'python-requests|curl|wget', re.IGNORECASE
+)
+_PREFILTER_SUMMARY = "静态资源请求且未命中任何规则，已跳过AI分析"
+
+# 连接器状态（需请求LM Studio）的缓存秒数
+_STATUS_CACHE_TTL = 30
+
+
+# 威胁等级行中同时出现多个等级时按此优先级取值
+_THREAT_LEVEL_PRIORITY = ("严重", "高", "中", "低")
+_BULLET_PREFIXES = ('-', '•', '*')
+
+# 各威胁等级对应的置信度和基础评分
+_CONFIDENCE_BY_LEVEL = {"严重": 0.9, "高": 0.8, "中": 0.6, "低": 0.4}
+_BASE_SCORE_BY_LEVEL = {"严重": 9.0, "高": 7.5, "中": 5.5, "低": 3.5}
+
+
+def _threat_score(base_score: float, confidence: float) -> float:
+    """按置信度在基础评分和中性分5.0之间插值，并限制在1-10之间"""
+    adjusted_score = base_score * confidence + (1.0 - confidence) * 5.0
+    return min(max(adjusted_score, 1.0), 10.0)
+
+
+# 解析结果的评分只有四种取值，模块加载时算好
+_THREAT_SCORE_BY_LEVEL = {
+    level: _threat_score(_BASE_SCORE_BY_LEVEL[level], confidence)
+    for level, confidence in _CONFIDENCE_BY_LEVEL.items()
+}
+
+
+def _parse_analysis_sections(raw_analysis: str) -> Tuple[str, List[str], List[str], List[str]]:
+    """从分析文本中提取威胁等级、攻击类型、风险因素和建议，不做异常处理"""
+    # 这里使用简单的文本解析，实际项目中可能需要更复杂的NLP处理
+    threat_level = "中"  # 默认值
+    attack_types = []
+    risk_factors = []
+    recommendations = []
+
+    # 当前小节直接指向对应的结果列表，列表项无需再按小节名分派
+    current_section = None
+
+    for line in raw_analysis.split('\n'):
+        line = line.strip()
+        if not line:
+            continue
+        if "威胁等级" in line or "威胁级别" in line:
+            for level in _THREAT_LEVEL_PRIORITY:
+                if level in line:
+                    threat_level = level
+                    break
+        elif "攻击类型" in line:
+            current_section = attack_types
+        elif "风险因素" in line:
+            current_section = risk_factors
+        elif "建议" in line or "措施" in line:
+            current_section = recommendations
+        elif line.startswith(_BULLET_PREFIXES) and current_section is not None:
+            current_section.append(line.lstrip('-•* ').strip())
+
+    return threat_level, attack_types, risk_factors, recommendations
+
+# 多条日志合并为一次请求时的提示词
+_MARSHALED_SYSTEM_PROMPT = """你是一个专业的网络安全分析师。请逐条分析用户给出的日志条目，识别潜在的安全威胁、攻击模式或异常行为。
+
+对每条日志提供以下分析：
+1. 威胁等级评估（低/中/高/严重）
+2. 攻击类型识别
+3. 风险因素分析
+4. 建议的响应措施
+
+请用中文回答，保持专业和准确。"""
+
+_MARSHALED_USER_PROMPT = """请分析以下{count}条安全日志（JSON数组）：
+
+{entries}
+
+请只返回一个包含{count}个字符串的JSON数组，第i个字符串是第i条日志的完整分析，不要输出数组以外的内容。"""
+
+# 合并请求时每条日志提交给模型的字段
+_MARSHALED_FIELDS = ('timestamp', 'src_ip', 'request_method', 'request_path', 'user_agent', 'status_code',
+                     'request_headers', 'request_body', 'additional_info', 'matched_rules')
+
+# 结果数据类在Python 3.10+上使用__slots__，批量分析时每个实例省去一个__dict__
+_DATACLASS_OPTIONS = {"slots": True} if sys.version_info >= (3, 10) else {}
+
+@dataclass(**_DATACLASS_OPTIONS)
 class ThreatAnalysis:
     """威胁分析结果"""
     threat_level: str  # 低, 中, 高, 严重
@@ -29,7 +177,7 @@ class ThreatAnalysis:
     rule_matches: List[str]
     threat_score: float
 
-@dataclass
+@dataclass(**_DATACLASS_OPTIONS)
 class AIDetectionResult:
     """AI检测结果"""
     is_malicious: bool
@@ -46,8 +194,14 @@ class AIThreatAnalyzer:
         self.lm_config = lm_config or SECURITY_ANALYSIS_CONFIG
         self.connector = LMStudioConnector(self.lm_config)
         self.logger = logging.getLogger(__name__)
-        self.analysis_cache = {}  # 分析结果缓存
+        # 分析结果缓存（LRU），超出容量时淘汰最久未使用的条目
+        self.analysis_cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
         self.cache_ttl = 3600  # 缓存1小时
+        self.cache_size = 10000
+        # 是否启用预筛，明显无害的日志直接返回低威胁结果，不调用AI
+        self.prefilter_enabled = True
+        # (探测时间, 连接器状态)，见 get_analyzer_status
+        self._status_cache: Optional[Tuple[float, Dict[str, Any]]] = None
 
         # 初始化连接器
         self._initialize_connector()
@@ -70,16 +224,14 @@ class AIThreatAnalyzer:
 
     def _generate_cache_key(self, log_entry: Dict[str, Any]) -> str:
         """生成缓存键"""
-        # 使用关键日志字段生成哈希
-        key_data = {
-            'src_ip': log_entry.get('src_ip'),
-            'request_path': log_entry.get('request_path'),
-            'user_agent': log_entry.get('user_agent'),
-            'request_body': log_entry.get('request_body'),
-            'status_code': log_entry.get('status_code')
-        }
-        key_str = json.dumps(key_data, sort_keys=True, ensure_ascii=False)
-        return hashlib.md5(key_str.encode('utf-8')).hexdigest()
+        # 使用关键日志字段生成哈希，请求路径中的ID归一化；源IP不参与，同一请求模式来自不同IP时共用结果
+        # 各字段按固定顺序逐个以4字节长度前缀写入摘要，字段内容无论包含什么字符都不会互相混淆
+        digest = hashlib.blake2b(digest_size=16)
+        for field in _CACHE_KEY_FIELDS:
+            data = _canonicalize(field, log_entry.get(field)).encode('utf-8', 'surrogatepass')
+            digest.update(len(data).to_bytes(4, 'little'))
+            digest.update(data)
+        return digest.hexdigest()
 
     def _is_cache_valid(self, cache_entry: Dict[str, Any]) -> bool:
         """检查缓存是否有效"""
@@ -87,61 +239,8 @@ class AIThreatAnalyzer:
 
     def _parse_threat_analysis(self, raw_analysis: str) -> ThreatAnalysis:
         """解析AI分析的威胁信息"""
-        try:
-            # 这里使用简单的文本解析，实际项目中可能需要更复杂的NLP处理
-            lines = raw_analysis.split('\n')
-            threat_level = "中"  # 默认值
-            attack_types = []
-            risk_factors = []
-            confidence = 0.5
-            recommendations = []
-
-            current_section = None
-
-            for line in lines:
-                line = line.strip()
-                if "威胁等级" in line or "威胁级别" in line:
-                    if "严重" in line:
-                        threat_level = "严重"
-                    elif "高" in line:
-                        threat_level = "高"
-                    elif "中" in line:
-                        threat_level = "中"
-                    elif "低" in line:
-                        threat_level = "低"
-                elif "攻击类型" in line:
-                    current_section = "attack_types"
-                elif "风险因素" in line:
-                    current_section = "risk_factors"
-                elif "建议" in line or "措施" in line:
-                    current_section = "recommendations"
-                elif line.startswith('-') or line.startswith('•') or line.startswith('*'):
-                    content = line.lstrip('-•* ').strip()
-                    if current_section == "attack_types":
-                        attack_types.append(content)
-                    elif current_section == "risk_factors":
-                        risk_factors.append(content)
-                    elif current_section == "recommendations":
-                        recommendations.append(content)
-
-            # 根据威胁等级调整置信度
-            confidence_map = {"严重": 0.9, "高": 0.8, "中": 0.6, "低": 0.4}
-            confidence = confidence_map.get(threat_level, 0.5)
-
-            return ThreatAnalysis(
-                threat_level=threat_level,
-                attack_types=attack_types,
-                risk_factors=risk_factors,
-                confidence=confidence,
-                analysis_summary=raw_analysis,
-                recommendations=recommendations,
-                timestamp=datetime.now(),
-                rule_matches=[],
-                threat_score=self._calculate_threat_score(threat_level, confidence)
-            )
-
-        except Exception as e:
-            self.logger.error(f"解析威胁分析失败: {e}")
+        if not isinstance(raw_analysis, str):
+            self.logger.error(f"解析威胁分析失败: 分析结果类型无效 {type(raw_analysis).__name__}")
             # 返回默认分析结果
             return ThreatAnalysis(
                 threat_level="中",
@@ -155,59 +254,131 @@ class AIThreatAnalyzer:
                 threat_score=5.0
             )
 
+        threat_level, attack_types, risk_factors, recommendations = _parse_analysis_sections(raw_analysis)
+
+        # 置信度和评分都只取决于威胁等级，直接查预先算好的表
+        return ThreatAnalysis(
+            threat_level=threat_level,
+            attack_types=attack_types,
+            risk_factors=risk_factors,
+            confidence=_CONFIDENCE_BY_LEVEL[threat_level],
+            analysis_summary=raw_analysis,
+            recommendations=recommendations,
+            timestamp=datetime.now(),
+            rule_matches=[],
+            threat_score=_THREAT_SCORE_BY_LEVEL[threat_level]
+        )
+
     def _calculate_threat_score(self, threat_level: str, confidence: float) -> float:
         """计算威胁评分"""
-        base_scores = {"严重": 9.0, "高": 7.5, "中": 5.5, "低": 3.5}
-        base_score = base_scores.get(threat_level, 5.5)
+        return _threat_score(_BASE_SCORE_BY_LEVEL.get(threat_level, 5.5), confidence)
+
+    def _get_cached_result(self, cache_key: str, start_time: float) -> Optional[AIDetectionResult]:
+        """取出仍在有效期内的缓存结果"""
+        cache_entry = self.analysis_cache.get(cache_key)
+        if cache_entry is None:
+            return None
+        if not self._is_cache_valid(cache_entry):
+            del self.analysis_cache[cache_key]
+            return None
+        self.analysis_cache.move_to_end(cache_key)
+        self.logger.debug(f"使用缓存的分析结果: {cache_key}")
+        cached_result = cache_entry['result']
+        cached_result.processing_time = time.time() - start_time
+        return cached_result
+
+    def _build_detection_result(self, cache_key: str, raw_analysis: str, rule_matches: Optional[List[str]],
+                                start_time: float) -> AIDetectionResult:
+        """由AI原始分析文本生成检测结果并写入缓存"""
+        # 解析分析结果
+        threat_analysis = self._parse_threat_analysis(raw_analysis)
+        threat_analysis.rule_matches = rule_matches or []
+
+        # 创建检测结果
+        result = AIDetectionResult(
+            is_malicious=threat_analysis.threat_level in ["高", "严重"],
+            threat_analysis=threat_analysis,
+            raw_analysis=raw_analysis,
+            processing_time=time.time() - start_time,
+            model_used=self.connector.current_model or "未知",
+            confidence_score=threat_analysis.confidence
+        )
+
+        # 缓存结果
+        self.analysis_cache[cache_key] = {
+            'result': result,
+            'timestamp': time.time()
+        }
+        self.analysis_cache.move_to_end(cache_key)
+        while len(self.analysis_cache) > self.cache_size:
+            self.analysis_cache.popitem(last=False)
 
-        # 调整评分范围到1-10
-        adjusted_score = base_score * confidence + (1.0 - confidence) * 5.0
-        return min(max(adjusted_score, 1.0), 10.0)
+        return result
+
+    def _should_ai_analyze(self, log_entry: Dict[str, Any], rule_matches: Optional[List[str]]) -> bool:
+        """判断日志是否需要AI分析，明显无害的静态资源请求返回False"""
+        if not self.prefilter_enabled or rule_matches:
+            return True
+        if str(log_entry.get('status_code')) not in _PREFILTER_STATUS_CODES:
+            return True
+        if log_entry.get('request_body'):
+            return True
+        if not _STATIC_ASSET_RE.search(str(log_entry.get('request_path') or '')):
+            return True
+        user_agent = log_entry.get('user_agent')
+        return not user_agent or bool(_SUSPICIOUS_UA_RE.search(str(user_agent)))
+
+    @staticmethod
+    def _prefiltered_result(start_time: float) -> AIDetectionResult:
+        """预筛跳过AI分析时返回的低威胁结果"""
+        threat_analysis = ThreatAnalysis(
+            threat_level="低",
+            attack_types=[],
+            risk_factors=[],
+            confidence=_CONFIDENCE_BY_LEVEL["低"],
+            analysis_summary=_PREFILTER_SUMMARY,
+            recommendations=[],
+            timestamp=datetime.now(),
+            rule_matches=[],
+            threat_score=_THREAT_SCORE_BY_LEVEL["低"]
+        )
+        return AIDetectionResult(
+            is_malicious=False,
+            threat_analysis=threat_analysis,
+            raw_analysis=_PREFILTER_SUMMARY,
+            processing_time=time.time() - start_time,
+            model_used="预筛",
+            confidence_score=threat_analysis.confidence
+        )
+
+    @staticmethod
+    def _enhance_log_entry(log_entry: Dict[str, Any], rule_matches: Optional[List[str]]) -> Dict[str, Any]:
+        """准备附带规则匹配信息的日志数据"""
+        enhanced_log = log_entry.copy()
+        if rule_matches:
+            enhanced_log['matched_rules'] = rule_matches
+            enhanced_log['rule_count'] = len(rule_matches)
+        return enhanced_log
 
     def analyze_log_entry(self, log_entry: Dict[str, Any], rule_matches: List[str] = None) -> Optional[AIDetectionResult]:
         """分析单个日志条目"""
         start_time = time.time()
 
+        if not self._should_ai_analyze(log_entry, rule_matches):
+            return self._prefiltered_result(start_time)
+
         # 检查缓存
         cache_key = self._generate_cache_key(log_entry)
-        if cache_key in self.analysis_cache and self._is_cache_valid(self.analysis_cache[cache_key]):
-            self.logger.debug(f"使用缓存的分析结果: {cache_key}")
-            cached_result = self.analysis_cache[cache_key]['result']
-            cached_result.processing_time = time.time() - start_time
+        cached_result = self._get_cached_result(cache_key, start_time)
+        if cached_result is not None:
             return cached_result
 
         try:
-            # 准备增强的日志数据
-            enhanced_log = log_entry.copy()
-            if rule_matches:
-                enhanced_log['matched_rules'] = rule_matches
-                enhanced_log['rule_count'] = len(rule_matches)
-
             # 执行AI分析
-            raw_analysis = self.connector.analyze_security_log(enhanced_log)
+            raw_analysis = self.connector.analyze_security_log(self._enhance_log_entry(log_entry, rule_matches))
 
             if raw_analysis:
-                # 解析分析结果
-                threat_analysis = self._parse_threat_analysis(raw_analysis)
-                threat_analysis.rule_matches = rule_matches or []
-
-                # 创建检测结果
-                result = AIDetectionResult(
-                    is_malicious=threat_analysis.threat_level in ["高", "严重"],
-                    threat_analysis=threat_analysis,
-                    raw_analysis=raw_analysis,
-                    processing_time=time.time() - start_time,
-                    model_used=self.connector.current_model or "未知",
-                    confidence_score=threat_analysis.confidence
-                )
-
-                # 缓存结果
-                self.analysis_cache[cache_key] = {
-                    'result': result,
-                    'timestamp': time.time()
-                }
-
-                return result
+                return self._build_detection_result(cache_key, raw_analysis, rule_matches, start_time)
             else:
                 self.logger.error("AI分析返回空结果")
                 return None
@@ -220,46 +391,21 @@ class AIThreatAnalyzer:
         """异步分析单个日志条目"""
         start_time = time.time()
 
+        if not self._should_ai_analyze(log_entry, rule_matches):
+            return self._prefiltered_result(start_time)
+
         # 检查缓存
         cache_key = self._generate_cache_key(log_entry)
-        if cache_key in self.analysis_cache and self._is_cache_valid(self.analysis_cache[cache_key]):
-            self.logger.debug(f"使用缓存的分析结果: {cache_key}")
-            cached_result = self.analysis_cache[cache_key]['result']
-            cached_result.processing_time = time.time() - start_time
+        cached_result = self._get_cached_result(cache_key, start_time)
+        if cached_result is not None:
             return cached_result
 
         try:
-            # 准备增强的日志数据
-            enhanced_log = log_entry.copy()
-            if rule_matches:
-                enhanced_log['matched_rules'] = rule_matches
-                enhanced_log['rule_count'] = len(rule_matches)
-
             # 执行异步AI分析
-            raw_analysis = await self.connector.analyze_security_log_async(enhanced_log)
+            raw_analysis = await self.connector.analyze_security_log_async(self._enhance_log_entry(log_entry, rule_matches))
 
             if raw_analysis:
-                # 解析分析结果
-                threat_analysis = self._parse_threat_analysis(raw_analysis)
-                threat_analysis.rule_matches = rule_matches or []
-
-                # 创建检测结果
-                result = AIDetectionResult(
-                    is_malicious=threat_analysis.threat_level in ["高", "严重"],
-                    threat_analysis=threat_analysis,
-                    raw_analysis=raw_analysis,
-                    processing_time=time.time() - start_time,
-                    model_used=self.connector.current_model or "未知",
-                    confidence_score=threat_analysis.confidence
-                )
-
-                # 缓存结果
-                self.analysis_cache[cache_key] = {
-                    'result': result,
-                    'timestamp': time.time()
-                }
-
-                return result
+                return self._build_detection_result(cache_key, raw_analysis, rule_matches, start_time)
             else:
                 self.logger.error("异步AI分析返回空结果")
                 return None
@@ -269,30 +415,44 @@ class AIThreatAnalyzer:
             return None
 
     def analyze_log_batch(self, log_entries: List[Dict[str, Any]], rule_matches_list: List[List[str]] = None) -> List[Optional[AIDetectionResult]]:
-        """批量分析日志条目"""
-        if rule_matches_list is None:
-            rule_matches_list = [[] for _ in log_entries]
-
-        results = []
-        for log_entry, rule_matches in zip(log_entries, rule_matches_list):
-            result = self.analyze_log_entry(log_entry, rule_matches)
-            results.append(result)
-
-        return results
-
-    async def analyze_log_batch_async(self, log_entries: List[Dict[str, Any]], rule_matches_list: List[List[str]] = None) -> List[Optional[AIDetectionResult]]:
-        """异步批量分析日志条目"""
+        """批量分析日志条目（内部并发执行异步分析）"""
         if rule_matches_list is None:
             rule_matches_list = [[] for _ in log_entries]
 
-        # 创建异步任务
-        tasks = []
-        for log_entry, rule_matches in zip(log_entries, rule_matches_list):
-            task = self.analyze_log_entry_async(log_entry, rule_matches)
-            tasks.append(task)
-
-        # 并发执行
-        results = await asyncio.gather(*tasks, return_exceptions=True)
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(self._with_private_session(self._analyze_batch_bounded(log_entries, rule_matches_list)))
+
+        # 已处于事件循环中时无法再启动新循环，退回逐条同步分析
+        return [self.analyze_log_entry(log_entry, rule_matches)
+                for log_entry, rule_matches in zip(log_entries, rule_matches_list)]
+
+    async def _with_private_session(self, coro):
+        """在临时事件循环中执行协程，aiohttp会话绑定事件循环，用完即关闭"""
+        previous_session = self.connector.session
+        self.connector.session = None
+        try:
+            return await coro
+        finally:
+            if self.connector.session is not None:
+                await self.connector.session.close()
+            self.connector.session = previous_session
+
+    async def _analyze_batch_bounded(self, log_entries: List[Dict[str, Any]],
+                                     rule_matches_list: List[List[str]]) -> List[Optional[AIDetectionResult]]:
+        """先提交全部任务再统一收集，用信号量限制同时进行的请求数"""
+        semaphore = asyncio.Semaphore(max(1, self.lm_config.max_concurrency))
+
+        async def analyze_one(log_entry, rule_matches):
+            async with semaphore:
+                return await self.analyze_log_entry_async(log_entry, rule_matches)
+
+        results = await asyncio.gather(
+            *(analyze_one(log_entry, rule_matches)
+              for log_entry, rule_matches in zip(log_entries, rule_matches_list)),
+            return_exceptions=True
+        )
 
         # 处理异常
         processed_results = []
@@ -305,6 +465,133 @@ class AIThreatAnalyzer:
 
         return processed_results
 
+    async def analyze_log_batch_async(self, log_entries: List[Dict[str, Any]], rule_matches_list: List[List[str]] = None) -> List[Optional[AIDetectionResult]]:
+        """异步批量分析日志条目"""
+        if rule_matches_list is None:
+            rule_matches_list = [[] for _ in log_entries]
+
+        return await self._analyze_batch_bounded(log_entries, rule_matches_list)
+
+    def analyze_log_batch_marshaled(self, log_entries: List[Dict[str, Any]], rule_matches_list: List[List[str]] = None,
+                                    k: int = 8) -> List[Optional[AIDetectionResult]]:
+        """批量分析日志条目，每k条未命中缓存的日志合并为一次AI请求"""
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(self._with_private_session(
+                self.analyze_log_batch_marshaled_async(log_entries, rule_matches_list, k)))
+
+        # 已处于事件循环中时无法再启动新循环，退回逐条同步分析
+        return self.analyze_log_batch(log_entries, rule_matches_list)
+
+    async def analyze_log_batch_marshaled_async(self, log_entries: List[Dict[str, Any]],
+                                                rule_matches_list: List[List[str]] = None,
+                                                k: int = 8) -> List[Optional[AIDetectionResult]]:
+        """异步批量分析日志条目，每k条未命中缓存的日志合并为一次AI请求"""
+        if rule_matches_list is None:
+            rule_matches_list = [[] for _ in log_entries]
+
+        start_time = time.time()
+        results: List[Optional[AIDetectionResult]] = [None] * len(log_entries)
+
+        # 缓存按条查询，部分命中时只有未命中的日志进入合并请求
+        pending = []
+        for index, (log_entry, rule_matches) in enumerate(zip(log_entries, rule_matches_list)):
+            if not self._should_ai_analyze(log_entry, rule_matches):
+                results[index] = self._prefiltered_result(start_time)
+                continue
+            cache_key = self._generate_cache_key(log_entry)
+            cached_result = self._get_cached_result(cache_key, start_time)
+            if cached_result is not None:
+                results[index] = cached_result
+            else:
+                pending.append((index, cache_key, log_entry, rule_matches))
+
+        k = max(1, k)
+        chunks = [pending[i:i + k] for i in range(0, len(pending), k)]
+        semaphore = asyncio.Semaphore(max(1, self.lm_config.max_concurrency))
+        chunk_results = await asyncio.gather(
+            *(self._analyze_marshaled_chunk(chunk, semaphore) for chunk in chunks),
+            return_exceptions=True
+        )
+
+        for chunk, chunk_result in zip(chunks, chunk_results):
+            if isinstance(chunk_result, Exception):
+                self.logger.error(f"批量分析中发生异常: {chunk_result}")
+                continue
+            for (index, _, _, _), result in zip(chunk, chunk_result):
+                results[index] = result
+
+        return results
+
+    async def _analyze_marshaled_chunk(self, chunk: List[Tuple[int, str, Dict[str, Any], List[str]]],
+                                       semaphore: asyncio.Semaphore) -> List[Optional[AIDetectionResult]]:
+        """合并分析一组日志；响应无法按条拆分时退回逐条分析"""
+        if len(chunk) > 1:
+            start_time = time.time()
+            async with semaphore:
+                raw_analysis = await self.connector.chat_completion_async(
+                    self._build_marshaled_messages(chunk),
+                    temperature=0.3,
+                    max_tokens=self._marshaled_max_tokens(len(chunk))
+                )
+
+            verdicts = self._split_marshaled_response(raw_analysis, len(chunk))
+            if verdicts is not None:
+                return [self._build_detection_result(cache_key, verdict, rule_matches, start_time)
+                        for (_, cache_key, _, rule_matches), verdict in zip(chunk, verdicts)]
+            self.logger.warning(f"合并分析响应无法拆分为{len(chunk)}条结果，改为逐条分析")
+
+        async def analyze_one(log_entry, rule_matches):
+            async with semaphore:
+                return await self.analyze_log_entry_async(log_entry, rule_matches)
+
+        return await asyncio.gather(*(analyze_one(log_entry, rule_matches)
+                                      for _, _, log_entry, rule_matches in chunk))
+
+    def _marshaled_max_tokens(self, count: int) -> int:
+        """合并分析请求的max_tokens：按条数放大，受 marshal_max_tokens 限制，但不低于单条请求的额度"""
+        model = self.lm_config.model
+        return min(model.max_tokens * count, max(model.max_tokens, model.marshal_max_tokens))
+
+    def _build_marshaled_messages(self, chunk: List[Tuple[int, str, Dict[str, Any], List[str]]]) -> List[ChatMessage]:
+        """将一组日志编码为JSON数组并构造合并分析请求"""
+        entries = []
+        for _, _, log_entry, rule_matches in chunk:
+            enhanced_log = self._enhance_log_entry(log_entry, rule_matches)
+            entries.append({field: enhanced_log[field] for field in _MARSHALED_FIELDS if field in enhanced_log})
+
+        user_prompt = _MARSHALED_USER_PROMPT.format(
+            count=len(chunk),
+            entries=json.dumps(entries, ensure_ascii=False, indent=2, default=str)
+        )
+        return [
+            ChatMessage(role="system", content=_MARSHALED_SYSTEM_PROMPT),
+            ChatMessage(role="user", content=user_prompt)
+        ]
+
+    @staticmethod
+    def _split_marshaled_response(raw_analysis: Optional[str], expected: int) -> Optional[List[str]]:
+        """从合并分析响应中取出逐条分析文本，条数不符或格式错误时返回None"""
+        if not raw_analysis:
+            return None
+
+        start = raw_analysis.find('[')
+        end = raw_analysis.rfind(']')
+        if start == -1 or end < start:
+            return None
+
+        try:
+            verdicts = json.loads(raw_analysis[start:end + 1])
+        except ValueError:
+            return None
+
+        if not isinstance(verdicts, list) or len(verdicts) != expected:
+            return None
+        if not all(isinstance(verdict, str) and verdict.strip() for verdict in verdicts):
+            return None
+        return verdicts
+
     def get_security_recommendations(self, analysis_result: AIDetectionResult) -> List[str]:
         """获取安全建议"""
         try:
@@ -355,22 +642,36 @@ class AIThreatAnalyzer:
             self.logger.error(f"自然语言查询失败: {e}")
             return None
 
-    def get_analyzer_status(self) -> Dict[str, Any]:
-        """获取分析器状态"""
-        return {
-            "connector_status": {
+    def get_analyzer_status(self, force_refresh: bool = False) -> Dict[str, Any]:
+        """获取分析器状态
+
+        连接器状态需要请求LM Studio，结果缓存 _STATUS_CACHE_TTL 秒，force_refresh=True 时强制重新探测
+        """
+        now = time.monotonic()
+        if force_refresh or self._status_cache is None or now - self._status_cache[0] >= _STATUS_CACHE_TTL:
+            connector_status = {
                 "connected": self.connector.test_connection(),
                 "current_model": self.connector.current_model,
                 "available_models": self.connector.get_available_models(),
                 "model_info": self.connector.get_model_info()
-            },
+            }
+            self._status_cache = (now, connector_status)
+
+        status = {"connector_status": self._status_cache[1]}
+        status.update(self._get_local_status())
+        return status
+
+    def _get_local_status(self) -> Dict[str, Any]:
+        """不涉及网络请求的分析器状态（缓存与配置）"""
+        return {
             "cache_status": {
                 "cache_size": len(self.analysis_cache),
+                "cache_max_size": self.cache_size,
                 "cache_ttl": self.cache_ttl
             },
             "config": {
-                "temperature": self.lm_config.temperature,
-                "max_tokens": self.lm_config.max_tokens,
+                "temperature": self.lm_config.model.temperature,
+                "max_tokens": self.lm_config.model.max_tokens,
                 "timeout": self.lm_config.timeout
             }
         }
@@ -380,21 +681,30 @@ class AIThreatAnalyzer:
         self.analysis_cache.clear()
         self.logger.info("分析缓存已清空")
 
-    def export_analysis_results(self, results: List[AIDetectionResult], output_file: str) -> bool:
-        """导出分析结果"""
+    def export_analysis_results(self, results: List[AIDetectionResult], output_file: str,
+                                analyzer_info: Optional[Dict[str, Any]] = None) -> bool:
+        """导出分析结果
+
+        analyzer_info 默认只包含缓存与配置信息，不探测LM Studio；需要连接器状态时可传入 get_analyzer_status() 的结果
+        """
         try:
-            export_data = {
+            header = {
                 "export_timestamp": datetime.now().isoformat(),
-                "analyzer_info": self.get_analyzer_status(),
-                "results": [asdict(result) for result in results]
+                "analyzer_info": analyzer_info if analyzer_info is not None else self._get_local_status()
             }
 
-            # 处理datetime对象
-            for result in export_data["results"]:
-                result["threat_analysis"]["timestamp"] = result["threat_analysis"]["timestamp"].isoformat()
-
-            with open(output_file, 'w', encoding='utf-8') as f:
-                json.dump(export_data, f, indent=2, ensure_ascii=False)
+            # 逐条序列化写入，不再先把全部结果转成字典，内存占用与结果数量无关
+            with open(output_file, 'wb') as f:
+                f.write(b'{\n')
+                for key, value in header.items():
+                    f.write(b'  ' + json.dumps(key).encode('utf-8') + b': ')
+                    f.write(json.dumps(value, indent=2, ensure_ascii=False, default=_json_default).encode('utf-8'))
+                    f.write(b',\n')
+                f.write(b'  "results": [')
+                for index, result in enumerate(results):
+                    f.write(b'\n' if index == 0 else b',\n')
+                    f.write(_dump_result(result))
+                f.write(b'\n]\n}\n')
 
             self.logger.info(f"分析结果已导出到: {output_file}")
             return True
@@ -416,4 +726,6 @@ def get_ai_threat_analyzer(lm_config: LMStudioConfig = None) -> AIThreatAnalyzer
 def reset_ai_threat_analyzer():
     """重置全局AI威胁分析器"""
     global _global_analyzer
+    if _global_analyzer is not None:
+        _global_analyzer.connector.close()
     _global_analyzer = None
\ No newline at end of file
@@ -1,20 +1,52 @@
 import os
+import copy
 import logging
-from typing import Dict, Any, List
+from typing import Dict, Any, FrozenSet, List, Optional
+from dataclasses import dataclass
 from pathlib import Path
 import yaml
 from string import Template
 
+# 优先使用libyaml的C解析器，未编译时回退到纯Python实现
+_SafeLoader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+# 进程内已加载配置缓存: {绝对路径: ((st_mtime_ns, st_size), 原始内容, 渲染后内容, 验证并补全默认值后的配置)}
+# 文件未变化时无需重新读取；环境变量替换结果也未变时无需重新解析、验证和补全默认值
+_CONFIG_CACHE: Dict[str, tuple] = {}
+
 class ConfigurationError(Exception):
     """配置相关错误"""
     pass
 
+@dataclass(frozen=True)
+class AIAnalysisSettings:
+    """AI分析筛选条件，加载配置后构建一次，逐条筛选事件时按属性读取"""
+    high_risk_only: bool = True
+    successful_attacks_only: bool = True
+    success_status_codes: FrozenSet[str] = frozenset(['200', '201', '202', '204', '301', '302', '304'])
+    max_ai_analysis: int = 5
+    high_risk_severity: str = 'high'
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> 'AIAnalysisSettings':
+        """从配置字典的ai_analysis节构建"""
+        ai_analysis = config.get('ai_analysis') or {}
+        defaults = cls()
+        return cls(
+            high_risk_only=ai_analysis.get('high_risk_only', defaults.high_risk_only),
+            successful_attacks_only=ai_analysis.get('successful_attacks_only', defaults.successful_attacks_only),
+            success_status_codes=frozenset(ai_analysis.get('success_status_codes', defaults.success_status_codes)),
+            max_ai_analysis=ai_analysis.get('max_ai_analysis', defaults.max_ai_analysis),
+            high_risk_severity=ai_analysis.get('high_risk_severity', defaults.high_risk_severity),
+        )
+
 class ConfigManager:
     """增强的配置管理器 - 支持环境变量和配置验证"""
 
     def __init__(self, config_path: str):
         self.config_path = config_path
         self._config = None
+        self._ai_settings: Optional[AIAnalysisSettings] = None
         self.logger = logging.getLogger(__name__)
 
     def load_config(self) -> Dict[str, Any]:
@@ -23,8 +55,16 @@ class ConfigManager:
             if not os.path.exists(self.config_path):
                 raise ConfigurationError(f"配置文件不存在: {self.config_path}")
 
-            with open(self.config_path, 'r', encoding='utf-8') as f:
-                config_content = f.read()
+            cache_key = os.path.abspath(self.config_path)
+            st = os.stat(self.config_path)
+            signature = (st.st_mtime_ns, st.st_size)
+            cached = _CONFIG_CACHE.get(cache_key)
+            if cached is not None and cached[0] == signature:
+                config_content = cached[1]
+            else:
+                with open(self.config_path, 'r', encoding='utf-8') as f:
+                    config_content = f.read()
+                cached = None
 
             # 使用Template替换环境变量
             template = Template(config_content)
@@ -33,15 +73,25 @@ class ConfigManager:
             except KeyError as e:
                 raise ConfigurationError(f"缺少必需的环境变量: {e}")
 
-            self._config = yaml.safe_load(rendered_content)
+            if cached is not None and cached[2] == rendered_content:
+                config = cached[3]
+            else:
+                self._config = yaml.load(rendered_content, Loader=_SafeLoader)
+
+                # 验证配置
+                validation_errors = self._validate_config()
+                if validation_errors:
+                    raise ConfigurationError(f"配置验证失败:\n" + "\n".join(validation_errors))
 
-            # 验证配置
-            validation_errors = self._validate_config()
-            if validation_errors:
-                raise ConfigurationError(f"配置验证失败:\n" + "\n".join(validation_errors))
+                # 设置默认值
+                self._set_defaults()
 
-            # 设置默认值
-            self._set_defaults()
+                config = self._config
+                _CONFIG_CACHE[cache_key] = (signature, config_content, rendered_content, config)
+
+            # 调用方可能修改返回的配置，缓存中保留未修改的副本
+            self._config = copy.deepcopy(config)
+            self._ai_settings = None
 
             return self._config
 
@@ -133,6 +183,17 @@ class ConfigManager:
         ai.setdefault('max_retries', 3)
         ai.setdefault('retry_delay', 1)
         ai.setdefault('retry_backoff', 2)
+        ai.setdefault('retry_max_wait', 10)
+        ai.setdefault('retry_deadline', 120)
+        ai.setdefault('hedge_delay', 0)
+        ai.setdefault('cache_size', 512)
+        ai.setdefault('cache_ttl', 3600)
+        ai.setdefault('stream', True)
+        ai.setdefault('max_context_chars', 5000)
+        ai.setdefault('max_batch_size', 10)
+        ai.setdefault('batch_max_tokens', 8192)
+        ai.setdefault('rate_limit', 0)
+        ai.setdefault('rate_limit_burst', 5)
         ai.setdefault('default_timeout', 30)
 
     def get_config(self) -> Dict[str, Any]:
@@ -141,6 +202,12 @@ class ConfigManager:
             self.load_config()
         return self._config
 
+    def get_ai_analysis_settings(self) -> AIAnalysisSettings:
+        """获取AI分析筛选条件，同一次加载的配置只构建一次"""
+        if self._ai_settings is None:
+            self._ai_settings = AIAnalysisSettings.from_config(self.get_config())
+        return self._ai_settings
+
     def reload_config(self) -> Dict[str, Any]:
         """重新加载配置"""
         self._config = None
@@ -0,0 +1,68 @@
+"""
+AI服务HTTP请求的公共工具
+自适应限速和Retry-After解析，供AIAnalyzer与LM Studio连接器共用
+"""
+
+import math
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Optional
+
+
+class AdaptiveTokenBucket:
+    """自适应令牌桶：请求成功时逐步提高发送速率，遇到限流或服务端错误时成倍降低（AIMD）"""
+
+    def __init__(self, rate: float, capacity: float, min_rate: float, max_rate: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.tokens = capacity
+        self.last_refill = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """预占一个令牌，返回发送请求前需要等待的秒数"""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.last_refill) * self.rate)
+            self.last_refill = now
+            self.tokens -= 1
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def on_success(self):
+        """加性提升速率，增幅不超过当前速率的10%"""
+        with self._lock:
+            self.rate = min(self.rate + 0.5, self.rate * 1.1, self.max_rate)
+
+    def on_throttle(self):
+        """速率减半并清空剩余令牌，避免并发的请求继续撞上限流"""
+        with self._lock:
+            self.rate = max(self.rate * 0.5, self.min_rate)
+            self.tokens = min(self.tokens, 0.0)
+
+
+def parse_retry_after(response: Any) -> Optional[float]:
+    """解析响应的Retry-After头（秒数或HTTP日期），无效或缺失时返回None
+
+    response可以是requests或aiohttp的响应对象，只需提供headers
+    """
+    value = response.headers.get('Retry-After') if response is not None else None
+    if not value:
+        return None
+    try:
+        seconds = float(value)
+    except ValueError:
+        pass
+    else:
+        # nan、inf 等非有限值视为无效
+        return max(seconds, 0.0) if math.isfinite(seconds) else None
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max((retry_at - datetime.now(timezone.utc)).total_seconds(), 0.0)
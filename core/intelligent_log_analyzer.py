@@ -5,20 +5,105 @@
 """
 
 import asyncio
+import bisect
+import copy
+import hashlib
+import heapq
 import json
 import logging
+import re
+import threading
 import time
-from typing import Dict, List, Any, Optional, Tuple, AsyncGenerator
+from typing import Dict, List, Any, Optional, Tuple, AsyncGenerator, Union
 from datetime import datetime, timedelta
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass, replace
 from pathlib import Path
+import math
 import statistics
-from collections import defaultdict, deque
+from collections import Counter, OrderedDict, defaultdict, deque
 
 from core.rule_engine import RuleEngine, ThreatScore
 from core.ai_threat_analyzer import AIThreatAnalyzer, AIDetectionResult
 from core.ai_config_manager import get_ai_config_manager
 
+# orjson为可选依赖，导出大量结果时序列化更快；未安装时回退到标准库json
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# 严重度与等级数值的双向映射，模块加载时构建一次
+_SEVERITY_RANK = {'critical': 4, 'high': 3, 'medium': 2, 'low': 1}
+_RANK_SEVERITY = {rank: severity for severity, rank in _SEVERITY_RANK.items()}
+
+# 敏感请求路径预编译为一个不区分大小写的多模式正则，每条日志只需一次扫描
+_SENSITIVE_PATHS = ('/admin', '/api/', '/config', '/system', '/root')
+_SENSITIVE_PATH_RE = re.compile('|'.join(map(re.escape, _SENSITIVE_PATHS)), re.IGNORECASE)
+
+# IP声誉增量的威胁评分分界：>=4.0加1，>=6.0加2，>=8.0加3
+_REPUTATION_THRESHOLDS = (4.0, 6.0, 8.0)
+
+# 规则不匹配时间字段，生成日志签名时忽略它们，重复的请求才能命中规则匹配缓存
+_SIGNATURE_IGNORED_FIELDS = frozenset(('timestamp', 'time', 'time_local', '@timestamp'))
+
+
+def _reputation_delta(threat_score: float) -> int:
+    """威胁评分对应的IP声誉增量"""
+    return bisect.bisect_right(_REPUTATION_THRESHOLDS, threat_score)
+
+
+def _export_default(obj: Any) -> str:
+    """导出时无法直接序列化的值：时间转为ISO格式，其余转为字符串"""
+    if isinstance(obj, datetime):
+        return obj.isoformat()
+    return str(obj)
+
+
+def _dump_row(row: Dict[str, Any]) -> bytes:
+    """序列化单条导出记录"""
+    if orjson is not None:
+        return orjson.dumps(row, default=_export_default)
+    return json.dumps(row, ensure_ascii=False, default=_export_default).encode('utf-8')
+
+
+def _mean(values: List[float]) -> float:
+    """浮点数平均值；statistics.mean按分数精确求和，批量统计时开销过大"""
+    return math.fsum(values) / len(values)
+
+
+def _log_signature(log_entry: Dict[str, Any]) -> bytes:
+    """日志内容签名，除时间字段外任一字段不同签名即不同"""
+    content = repr([item for item in log_entry.items() if item[0] not in _SIGNATURE_IGNORED_FIELDS])
+    return hashlib.blake2b(content.encode('utf-8', 'surrogatepass'), digest_size=16).digest()
+
+
+def _copy_rule_match(match: Dict[str, Any], **overrides) -> Dict[str, Any]:
+    """复制一条规则匹配结果：规则定义仍共享，评分和匹配详情各自独立，调用方修改副本不影响缓存"""
+    copied = {**match, **overrides}
+    threat_score = copied.get('threat_score')
+    if isinstance(threat_score, ThreatScore):
+        copied['threat_score'] = replace(threat_score, attack_vectors=list(threat_score.attack_vectors),
+                                         risk_factors=list(threat_score.risk_factors))
+    if 'details' in copied:
+        copied['details'] = copy.deepcopy(copied['details'])
+    return copied
+
+
+def _rule_score_and_level(rule_matches: List[Dict[str, Any]]) -> Tuple[float, str]:
+    """一次遍历规则匹配结果，取最高评分和最高严重度对应的风险级别，无匹配时为(0.0, "low")"""
+    if not rule_matches:
+        return 0.0, 'low'
+    max_score = float('-inf')
+    max_rank = 0
+    for match in rule_matches:
+        threat_score = match['threat_score']
+        if threat_score.score > max_score:
+            max_score = threat_score.score
+        rank = _SEVERITY_RANK.get(threat_score.severity, 0)
+        if rank > max_rank:
+            max_rank = rank
+    return max_score, _RANK_SEVERITY.get(max_rank, 'low')
+
 @dataclass
 class LogAnalysisResult:
     """日志分析结果"""
@@ -53,7 +138,7 @@ class ThreatPattern:
     severity: str
     first_seen: datetime
     last_seen: datetime
-    affected_ips: List[str]
+    affected_ips: Dict[str, None]  # 按首次出现顺序记录的IP集合，成员判断为O(1)
 
 class IntelligentLogAnalyzer:
     """智能日志分析器"""
@@ -68,6 +153,8 @@ class IntelligentLogAnalyzer:
         self.analysis_history = deque(maxlen=1000)  # 最近1000次分析
         self.threat_patterns = {}  # 威胁模式库
         self.ip_reputation = defaultdict(int)  # IP声誉记录
+        self._match_cache: "OrderedDict[bytes, List[Dict[str, Any]]]" = OrderedDict()  # 规则匹配结果LRU缓存
+        self._match_cache_lock = threading.Lock()  # 规则匹配可能在线程池中执行
 
         # 性能统计
         self.performance_stats = {
@@ -91,6 +178,7 @@ class IntelligentLogAnalyzer:
             perf_config = self.config_manager.get_performance_config()
             self.batch_size = perf_config.batch_size
             self.max_concurrent = perf_config.max_concurrent_requests
+            self.match_cache_size = perf_config.match_cache_size
 
             self.logger.info("智能日志分析器配置已加载")
         except Exception as e:
@@ -106,6 +194,7 @@ class IntelligentLogAnalyzer:
             })()
             self.batch_size = 10
             self.max_concurrent = 5
+            self.match_cache_size = 4096
 
     def analyze_log(self, log_entry: Dict[str, Any], force_ai: bool = False) -> LogAnalysisResult:
         """分析单个日志条目"""
@@ -114,7 +203,7 @@ class IntelligentLogAnalyzer:
 
         try:
             # 第一阶段：传统规则匹配
-            rule_matches = self.rule_engine.match_log(log_entry)
+            rule_matches = self._match_rules(log_entry)
             rule_only = False
 
             # 第二阶段：AI增强分析
@@ -136,24 +225,12 @@ class IntelligentLogAnalyzer:
                 if ai_analysis:
                     ai_only = True
 
-            # 第三阶段：结果融合和评分
-            final_result = self._merge_analysis_results(
-                log_entry, rule_matches, ai_analysis, rule_only, ai_enhanced, ai_only
+            # 第三至五阶段：结果融合、威胁模式识别、IP声誉更新
+            final_result = self._finalize_analysis(
+                log_entry, rule_matches, ai_analysis, rule_only, ai_enhanced, ai_only,
+                start_time, analysis_timestamp
             )
 
-            # 第四阶段：威胁模式识别
-            self._identify_threat_patterns(final_result)
-
-            # 第五阶段：IP声誉更新
-            self._update_ip_reputation(final_result)
-
-            # 更新统计信息
-            processing_time = time.time() - start_time
-            self._update_performance_stats(final_result, processing_time)
-
-            final_result.processing_time = processing_time
-            final_result.analysis_timestamp = analysis_timestamp
-
             # 记录分析历史
             self.analysis_history.append(final_result)
 
@@ -161,19 +238,7 @@ class IntelligentLogAnalyzer:
 
         except Exception as e:
             self.logger.error(f"日志分析失败: {e}")
-            processing_time = time.time() - start_time
-
-            return LogAnalysisResult(
-                log_entry=log_entry,
-                rule_matches=[],
-                ai_analysis=None,
-                final_threat_score=0.0,
-                risk_level="unknown",
-                recommendations=[f"分析失败: {str(e)}"],
-                processing_time=processing_time,
-                analysis_timestamp=analysis_timestamp,
-                analysis_source="error"
-            )
+            return self._error_result(log_entry, e, start_time, analysis_timestamp)
 
     async def analyze_log_async(self, log_entry: Dict[str, Any], force_ai: bool = False) -> LogAnalysisResult:
         """异步分析单个日志条目"""
@@ -181,8 +246,8 @@ class IntelligentLogAnalyzer:
         analysis_timestamp = datetime.now()
 
         try:
-            # 第一阶段：传统规则匹配
-            rule_matches = self.rule_engine.match_log(log_entry)
+            # 第一阶段：传统规则匹配，在线程池中执行，正则扫描期间不阻塞事件循环
+            rule_matches = await self._match_rules_async(log_entry)
 
             # 第二阶段：AI增强分析
             ai_analysis = None
@@ -203,41 +268,60 @@ class IntelligentLogAnalyzer:
                 if ai_analysis:
                     ai_only = True
 
-            # 第三阶段：结果融合和评分
-            final_result = self._merge_analysis_results(
-                log_entry, rule_matches, ai_analysis, False, ai_enhanced, ai_only
+            # 第三至五阶段：结果融合、威胁模式识别、IP声誉更新
+            return self._finalize_analysis(
+                log_entry, rule_matches, ai_analysis, False, ai_enhanced, ai_only,
+                start_time, analysis_timestamp
             )
 
-            # 第四阶段：威胁模式识别
-            self._identify_threat_patterns(final_result)
+        except Exception as e:
+            self.logger.error(f"异步日志分析失败: {e}")
+            return self._error_result(log_entry, e, start_time, analysis_timestamp)
+
+    def _finalize_analysis(self, log_entry: Dict[str, Any], rule_matches: List[Dict[str, Any]],
+                           ai_analysis: Optional[AIDetectionResult], rule_only: bool, ai_enhanced: bool,
+                           ai_only: bool, start_time: float, analysis_timestamp: datetime,
+                           update_reputation: bool = True) -> LogAnalysisResult:
+        """融合规则和AI分析结果，并更新威胁模式、IP声誉和性能统计
+
+        update_reputation为False时由调用方统一更新IP声誉
+        """
+        # 第三阶段：结果融合和评分
+        final_result = self._merge_analysis_results(
+            log_entry, rule_matches, ai_analysis, rule_only, ai_enhanced, ai_only
+        )
+
+        # 第四阶段：威胁模式识别
+        self._identify_threat_patterns(final_result)
 
-            # 第五阶段：IP声誉更新
+        # 第五阶段：IP声誉更新
+        if update_reputation:
             self._update_ip_reputation(final_result)
 
-            # 更新统计信息
-            processing_time = time.time() - start_time
-            self._update_performance_stats(final_result, processing_time)
+        # 更新统计信息
+        processing_time = time.time() - start_time
+        self._update_performance_stats(final_result, processing_time)
 
-            final_result.processing_time = processing_time
-            final_result.analysis_timestamp = analysis_timestamp
+        final_result.processing_time = processing_time
+        final_result.analysis_timestamp = analysis_timestamp
 
-            return final_result
+        return final_result
 
-        except Exception as e:
-            self.logger.error(f"异步日志分析失败: {e}")
-            processing_time = time.time() - start_time
-
-            return LogAnalysisResult(
-                log_entry=log_entry,
-                rule_matches=[],
-                ai_analysis=None,
-                final_threat_score=0.0,
-                risk_level="unknown",
-                recommendations=[f"分析失败: {str(e)}"],
-                processing_time=processing_time,
-                analysis_timestamp=analysis_timestamp,
-                analysis_source="error"
-            )
+    @staticmethod
+    def _error_result(log_entry: Dict[str, Any], error: Exception, start_time: float,
+                      analysis_timestamp: datetime) -> LogAnalysisResult:
+        """分析失败时的结果"""
+        return LogAnalysisResult(
+            log_entry=log_entry,
+            rule_matches=[],
+            ai_analysis=None,
+            final_threat_score=0.0,
+            risk_level="unknown",
+            recommendations=[f"分析失败: {str(error)}"],
+            processing_time=time.time() - start_time,
+            analysis_timestamp=analysis_timestamp,
+            analysis_source="error"
+        )
 
     def analyze_batch(self, log_entries: List[Dict[str, Any]], force_ai: bool = False) -> BatchAnalysisResult:
         """批量分析日志条目"""
@@ -274,43 +358,94 @@ class IntelligentLogAnalyzer:
         )
 
     async def analyze_batch_async(self, log_entries: List[Dict[str, Any]], force_ai: bool = False) -> BatchAnalysisResult:
-        """异步批量分析日志条目"""
+        """异步批量分析日志条目，需要AI分析的日志每batch_size条合并为一次AI请求"""
         start_time = time.time()
+        analysis_timestamp = datetime.now()
 
-        # 创建异步任务
-        semaphore = asyncio.Semaphore(self.max_concurrent)
-
-        async def analyze_with_semaphore(log_entry):
-            async with semaphore:
-                return await self.analyze_log_async(log_entry, force_ai)
+        # 第一阶段：传统规则匹配，整批在线程池中执行，不阻塞事件循环
+        loop = asyncio.get_running_loop()
+        match_outcomes = await loop.run_in_executor(None, self._match_rules_batch, log_entries)
+        # 规则匹配和AI分析按批执行，各条目的处理耗时取所在阶段耗时的平均分摊
+        rule_share = (time.time() - start_time) / max(1, len(log_entries))
+
+        # 划分出需要AI分析的日志
+        rule_matches_list: List[Optional[List[Dict[str, Any]]]] = [None] * len(log_entries)
+        ai_modes: List[Optional[str]] = [None] * len(log_entries)  # "enhanced"、"only"或None
+        match_errors = {}
+        for index, (log_entry, rule_matches) in enumerate(zip(log_entries, match_outcomes)):
+            if isinstance(rule_matches, Exception):
+                match_errors[index] = rule_matches
+                continue
+            rule_matches_list[index] = rule_matches
 
-        # 并发执行分析
-        tasks = [analyze_with_semaphore(log_entry) for log_entry in log_entries]
-        results = await asyncio.gather(*tasks, return_exceptions=True)
+            if self.ai_analyzer and (force_ai or self._should_use_ai_analysis(log_entry, rule_matches)):
+                ai_modes[index] = "enhanced"
+            elif not rule_matches and self.ai_analyzer:
+                # 如果规则没有匹配，尝试纯AI分析
+                ai_modes[index] = "only"
+
+        # 第二阶段：AI分析，N条日志只需约N/batch_size次请求，请求并发数由AI分析器控制
+        ai_indices = [index for index, mode in enumerate(ai_modes) if mode is not None]
+        ai_results = {}
+        ai_share = 0.0
+        if ai_indices:
+            ai_start = time.time()
+            try:
+                batch_results = await self.ai_analyzer.analyze_log_batch_marshaled_async(
+                    [log_entries[index] for index in ai_indices],
+                    [[match['rule']['name'] for match in rule_matches_list[index]] for index in ai_indices],
+                    k=max(1, self.batch_size)
+                )
+                ai_results = dict(zip(ai_indices, batch_results))
+            except Exception as e:
+                self.logger.error(f"异步批量AI分析失败: {e}")
+            ai_share = (time.time() - ai_start) / len(ai_indices)
 
-        # 处理结果
+        # 第三至五阶段：按原始顺序融合结果，IP声誉增量按IP汇总后统一更新
         processed_results = []
-        successful = 0
         failed = 0
         threat_detections = 0
-
-        for result in results:
-            if isinstance(result, Exception):
-                self.logger.error(f"异步批量分析中发生异常: {result}")
+        reputation_deltas = Counter()
+
+        for index, log_entry in enumerate(log_entries):
+            entry_start = time.time() - rule_share - (ai_share if ai_modes[index] else 0.0)
+            error = match_errors.get(index)
+            if error is None:
+                ai_analysis = ai_results.get(index)
+                mode = ai_modes[index]
+                if mode == "enhanced" and not ai_analysis:
+                    self.performance_stats['ai_failures'] += 1
+                try:
+                    result = self._finalize_analysis(
+                        log_entry, rule_matches_list[index], ai_analysis, False,
+                        mode == "enhanced" and bool(ai_analysis), mode == "only" and bool(ai_analysis),
+                        entry_start, analysis_timestamp, update_reputation=False
+                    )
+                except Exception as e:
+                    error = e
+                else:
+                    src_ip = log_entry.get('src_ip', '')
+                    delta = _reputation_delta(result.final_threat_score)
+                    if src_ip and delta:
+                        reputation_deltas[src_ip] += delta
+            if error is not None:
+                self.logger.error(f"异步日志分析失败: {error}")
+                result = self._error_result(log_entry, error, entry_start, analysis_timestamp)
                 failed += 1
-            else:
-                processed_results.append(result)
-                successful += 1
 
-                if result.final_threat_score >= self.thresholds.threat_score_threshold:
-                    threat_detections += 1
+            processed_results.append(result)
+            if result.final_threat_score >= self.thresholds.threat_score_threshold:
+                threat_detections += 1
+
+        for src_ip, delta in reputation_deltas.items():
+            self.ip_reputation[src_ip] += delta
 
         processing_time = time.time() - start_time
         statistics = self._calculate_batch_statistics(processed_results)
 
         return BatchAnalysisResult(
             total_logs=len(log_entries),
-            successful_analyses=successful,
+            successful_analyses=len(processed_results) - failed,
             failed_analyses=failed,
             threat_detections=threat_detections,
             processing_time=processing_time,
@@ -318,6 +453,66 @@ class IntelligentLogAnalyzer:
             statistics=statistics
         )
 
+    def _match_rules(self, log_entry: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """规则匹配，内容相同的日志复用缓存的匹配结果"""
+        key, rule_matches = self._lookup_rule_matches(log_entry)
+        if rule_matches is None:
+            rule_matches = self.rule_engine.match_log(log_entry)
+            self._store_rule_matches(key, rule_matches)
+        return rule_matches
+
+    async def _match_rules_async(self, log_entry: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """规则匹配，未命中缓存时在线程池中执行"""
+        key, rule_matches = self._lookup_rule_matches(log_entry)
+        if rule_matches is None:
+            loop = asyncio.get_running_loop()
+            rule_matches = await loop.run_in_executor(None, self.rule_engine.match_log, log_entry)
+            self._store_rule_matches(key, rule_matches)
+        return rule_matches
+
+    def _match_rules_batch(self, log_entries: List[Dict[str, Any]]) -> List[Union[List[Dict[str, Any]], Exception]]:
+        """逐条规则匹配，单条失败时在对应位置返回异常对象"""
+        outcomes = []
+        for log_entry in log_entries:
+            try:
+                outcomes.append(self._match_rules(log_entry))
+            except Exception as e:
+                outcomes.append(e)
+        return outcomes
+
+    def _lookup_rule_matches(self, log_entry: Dict[str, Any]) -> Tuple[Optional[bytes], Optional[List[Dict[str, Any]]]]:
+        """查询规则匹配缓存，返回(缓存键, 匹配结果)，未命中时匹配结果为None"""
+        if self.match_cache_size <= 0:
+            return None, None
+
+        key = _log_signature(log_entry)
+        with self._match_cache_lock:
+            cached = self._match_cache.get(key)
+            if cached is None:
+                return key, None
+            self._match_cache.move_to_end(key)
+
+            # 命中缓存时同样计入规则匹配统计，匹配结果指向当前日志
+            now = time.time()
+            rule_stats = self.rule_engine.rule_stats
+            rule_matches = []
+            for match in cached:
+                rule_id = match.get('rule_id')
+                rule_stats['unknown' if rule_id is None else rule_id] += 1
+                rule_matches.append(_copy_rule_match(match, log_entry=log_entry, timestamp=now))
+        return key, rule_matches
+
+    def _store_rule_matches(self, key: Optional[bytes], rule_matches: List[Dict[str, Any]]):
+        """写入规则匹配缓存，超出容量时淘汰最久未使用的条目"""
+        if key is None:
+            return
+        # 缓存副本：返回给首个调用方的匹配结果可能被原地修改（如调整威胁评分）
+        cached = [_copy_rule_match(match) for match in rule_matches]
+        with self._match_cache_lock:
+            self._match_cache[key] = cached
+            if len(self._match_cache) > self.match_cache_size:
+                self._match_cache.popitem(last=False)
+
     def _should_use_ai_analysis(self, log_entry: Dict[str, Any], rule_matches: List[Dict[str, Any]]) -> bool:
         """判断是否应该使用AI分析"""
         if not self.ai_analyzer:
@@ -338,9 +533,7 @@ class IntelligentLogAnalyzer:
             return True
 
         # 检查敏感请求路径
-        sensitive_paths = ['/admin', '/api/', '/config', '/system', '/root']
-        request_path = log_entry.get('request_path', '').lower()
-        if any(sensitive in request_path for sensitive in sensitive_paths):
+        if _SENSITIVE_PATH_RE.search(log_entry.get('request_path', '')):
             return True
 
         return False
@@ -369,32 +562,21 @@ class IntelligentLogAnalyzer:
 
         elif ai_enhanced and ai_analysis:
             # AI增强分析：融合规则和AI评分
-            rule_score = max([m['threat_score'].score for m in rule_matches]) if rule_matches else 0.0
+            rule_score, rule_risk_level = _rule_score_and_level(rule_matches)
             ai_score = ai_analysis.threat_analysis.threat_score
 
             final_threat_score = (rule_score * self.scoring_weights.rule_weight +
                                  ai_score * self.scoring_weights.ai_weight)
 
-            # 根据AI分析调整风险级别
+            # 根据AI分析调整风险级别，否则使用规则匹配的最高风险级别
             if ai_analysis.is_malicious:
                 risk_level = ai_analysis.threat_analysis.threat_level
             else:
-                # 使用规则匹配的最高风险级别
-                if rule_matches:
-                    severity_scores = {'critical': 4, 'high': 3, 'medium': 2, 'low': 1}
-                    max_severity = max([severity_scores.get(m['threat_score'].severity, 0)
-                                      for m in rule_matches])
-                    severity_map = {4: 'critical', 3: 'high', 2: 'medium', 1: 'low'}
-                    risk_level = severity_map.get(max_severity, 'low')
+                risk_level = rule_risk_level
 
         elif rule_matches:
             # 仅规则匹配
-            final_threat_score = max([m['threat_score'].score for m in rule_matches])
-            severity_scores = {'critical': 4, 'high': 3, 'medium': 2, 'low': 1}
-            max_severity = max([severity_scores.get(m['threat_score'].severity, 0)
-                              for m in rule_matches])
-            severity_map = {4: 'critical', 3: 'high', 2: 'medium', 1: 'low'}
-            risk_level = severity_map.get(max_severity, 'low')
+            final_threat_score, risk_level = _rule_score_and_level(rule_matches)
 
         # 生成建议
         recommendations = []
@@ -420,10 +602,8 @@ class IntelligentLogAnalyzer:
         if result.final_threat_score < self.thresholds.threat_score_threshold:
             return
 
-        # 提取关键特征
+        # 模式按规则/攻击类型区分，只额外记录来源IP
         src_ip = result.log_entry.get('src_ip', '')
-        request_path = result.log_entry.get('request_path', '')
-        user_agent = result.log_entry.get('user_agent', '')
 
         # 基于规则匹配的模式识别
         if result.rule_matches:
@@ -440,15 +620,15 @@ class IntelligentLogAnalyzer:
                         severity=result.risk_level,
                         first_seen=result.analysis_timestamp,
                         last_seen=result.analysis_timestamp,
-                        affected_ips=[]
+                        affected_ips={}
                     )
 
                 pattern = self.threat_patterns[pattern_key]
                 pattern.frequency += 1
                 pattern.last_seen = result.analysis_timestamp
 
-                if src_ip and src_ip not in pattern.affected_ips:
-                    pattern.affected_ips.append(src_ip)
+                if src_ip:
+                    pattern.affected_ips[src_ip] = None
 
         # 基于AI分析的模式识别
         if result.ai_analysis and result.ai_analysis.threat_analysis.attack_types:
@@ -464,15 +644,15 @@ class IntelligentLogAnalyzer:
                         severity=result.risk_level,
                         first_seen=result.analysis_timestamp,
                         last_seen=result.analysis_timestamp,
-                        affected_ips=[]
+                        affected_ips={}
                     )
 
                 pattern = self.threat_patterns[pattern_key]
                 pattern.frequency += 1
                 pattern.last_seen = result.analysis_timestamp
 
-                if src_ip and src_ip not in pattern.affected_ips:
-                    pattern.affected_ips.append(src_ip)
+                if src_ip:
+                    pattern.affected_ips[src_ip] = None
 
     def _update_ip_reputation(self, result: LogAnalysisResult):
         """更新IP声誉"""
@@ -480,13 +660,10 @@ class IntelligentLogAnalyzer:
         if not src_ip:
             return
 
-        # 根据威胁评分调整IP声誉
-        if result.final_threat_score >= 8.0:
-            self.ip_reputation[src_ip] += 3  # 严重威胁
-        elif result.final_threat_score >= 6.0:
-            self.ip_reputation[src_ip] += 2  # 高威胁
-        elif result.final_threat_score >= 4.0:
-            self.ip_reputation[src_ip] += 1  # 中等威胁
+        # 根据威胁评分调整IP声誉：严重威胁加3，高威胁加2，中等威胁加1
+        delta = _reputation_delta(result.final_threat_score)
+        if delta:
+            self.ip_reputation[src_ip] += delta
 
     def _update_performance_stats(self, result: LogAnalysisResult, processing_time: float):
         """更新性能统计"""
@@ -507,26 +684,21 @@ class IntelligentLogAnalyzer:
         processing_times = [r.processing_time for r in results]
 
         stats = {
-            'avg_threat_score': statistics.mean(threat_scores),
+            'avg_threat_score': _mean(threat_scores),
             'max_threat_score': max(threat_scores),
             'min_threat_score': min(threat_scores),
-            'avg_processing_time': statistics.mean(processing_times),
+            'avg_processing_time': _mean(processing_times),
             'max_processing_time': max(processing_times),
             'min_processing_time': min(processing_times),
-            'threat_distribution': defaultdict(int),
-            'analysis_source_distribution': defaultdict(int),
+            # 威胁分布统计，计数在Counter的C实现中完成
+            'threat_distribution': defaultdict(int, Counter(r.risk_level for r in results)),
+            'analysis_source_distribution': defaultdict(int, Counter(r.analysis_source for r in results)),
             'top_threat_patterns': []
         }
 
-        # 威胁分布统计
-        for result in results:
-            stats['threat_distribution'][result.risk_level] += 1
-            stats['analysis_source_distribution'][result.analysis_source] += 1
-
-        # 获取热门威胁模式
+        # 获取热门威胁模式，只取前10个无需对全部模式排序
         if self.threat_patterns:
-            top_patterns = sorted(self.threat_patterns.values(),
-                                key=lambda x: x.frequency, reverse=True)[:10]
+            top_patterns = heapq.nlargest(10, self.threat_patterns.values(), key=lambda x: x.frequency)
             stats['top_threat_patterns'] = [
                 {
                     'name': p.pattern_name,
@@ -539,15 +711,22 @@ class IntelligentLogAnalyzer:
 
         return stats
 
+    def _recent_history(self, cutoff_time: datetime) -> List[LogAnalysisResult]:
+        """按时间顺序返回分析时间不早于cutoff_time的历史记录，只从队尾向前扫描窗口内的部分"""
+        recent_results = []
+        for result in reversed(self.analysis_history):
+            if result.analysis_timestamp < cutoff_time:
+                break
+            recent_results.append(result)
+        recent_results.reverse()
+        return recent_results
+
     def get_threat_summary(self, time_window: int = 3600) -> Dict[str, Any]:
         """获取威胁摘要（指定时间窗口内，秒）"""
         cutoff_time = datetime.now() - timedelta(seconds=time_window)
 
         # 过滤时间窗口内的分析结果
-        recent_results = [
-            r for r in self.analysis_history
-            if r.analysis_timestamp >= cutoff_time
-        ]
+        recent_results = self._recent_history(cutoff_time)
 
         if not recent_results:
             return {
@@ -643,22 +822,40 @@ class IntelligentLogAnalyzer:
         """导出分析结果"""
         try:
             cutoff_time = datetime.now() - timedelta(seconds=time_window)
-            recent_results = [
-                r for r in self.analysis_history
-                if r.analysis_timestamp >= cutoff_time
-            ]
+            recent_results = self._recent_history(cutoff_time)
 
-            export_data = {
+            header = {
                 'export_timestamp': datetime.now().isoformat(),
                 'time_window': time_window,
                 'total_results': len(recent_results),
                 'performance_report': self.get_performance_report(),
                 'threat_summary': self.get_threat_summary(time_window),
                 'threat_patterns': {
-                    key: asdict(pattern) for key, pattern in self.threat_patterns.items()
-                },
-                'results': [
-                    {
+                    key: {
+                        'pattern_name': pattern.pattern_name,
+                        'description': pattern.description,
+                        'indicators': pattern.indicators,
+                        'frequency': pattern.frequency,
+                        'severity': pattern.severity,
+                        'first_seen': pattern.first_seen.isoformat(),
+                        'last_seen': pattern.last_seen.isoformat(),
+                        'affected_ips': list(pattern.affected_ips)
+                    }
+                    for key, pattern in self.threat_patterns.items()
+                }
+            }
+
+            # 逐条序列化写入，不再先构建包含全部结果的字典，内存占用与结果数量无关
+            with open(output_file, 'wb') as f:
+                f.write(b'{\n')
+                for key, value in header.items():
+                    f.write(b'  ' + json.dumps(key).encode('utf-8') + b': ')
+                    f.write(json.dumps(value, indent=2, ensure_ascii=False).encode('utf-8'))
+                    f.write(b',\n')
+                f.write(b'  "results": [')
+                for index, result in enumerate(recent_results):
+                    f.write(b'\n' if index == 0 else b',\n')
+                    f.write(_dump_row({
                         'log_entry': result.log_entry,
                         'final_threat_score': result.final_threat_score,
                         'risk_level': result.risk_level,
@@ -668,13 +865,8 @@ class IntelligentLogAnalyzer:
                         'analysis_timestamp': result.analysis_timestamp.isoformat(),
                         'rule_matches_count': len(result.rule_matches),
                         'has_ai_analysis': result.ai_analysis is not None
-                    }
-                    for result in recent_results
-                ]
-            }
-
-            with open(output_file, 'w', encoding='utf-8') as f:
-                json.dump(export_data, f, indent=2, ensure_ascii=False)
+                    }))
+                f.write(b'\n]\n}\n')
 
             self.logger.info(f"分析结果已导出到: {output_file}")
             return True
@@ -687,11 +879,10 @@ class IntelligentLogAnalyzer:
         """清理历史数据（默认清理24小时前的数据）"""
         cutoff_time = datetime.now() - timedelta(seconds=older_than)
 
+        # 历史记录按分析时间顺序追加，过期记录都在队首
         original_size = len(self.analysis_history)
-        self.analysis_history = deque(
-            [r for r in self.analysis_history if r.analysis_timestamp >= cutoff_time],
-            maxlen=1000
-        )
+        while self.analysis_history and self.analysis_history[0].analysis_timestamp < cutoff_time:
+            self.analysis_history.popleft()
 
         # 清理旧的威胁模式
         old_patterns = []
@@ -716,6 +907,7 @@ class IntelligentLogAnalyzer:
             'cache_info': {
                 'analysis_history_size': len(self.analysis_history),
                 'threat_patterns_count': len(self.threat_patterns),
+                'match_cache_size': len(self._match_cache),
                 'ip_reputation_count': len(self.ip_reputation)
             }
         }
\ No newline at end of file
@@ -1,6 +1,9 @@
+import ipaddress
+from collections import Counter
+from functools import lru_cache
 import geoip2.database
 from geoip2.errors import AddressNotFoundError
-from typing import Tuple, Optional, Dict
+from typing import Tuple, Optional, Dict, Iterable, Mapping, Union
 
 class IPGeoLocator:
     def __init__(self, db_path: str):
@@ -34,39 +37,46 @@ class IPGeoLocator:
 
     def is_private_ip(self, ip_address: str) -> bool:
         """Check if the IP address is in a private (LAN) range"""
-        import ipaddress
-        try:
-            ip = ipaddress.ip_address(ip_address)
-            return ip.is_private
-        except ValueError:
-            return False
+        return _is_private_ip(ip_address)
 
     def close(self):
         if hasattr(self, 'reader') and self.reader:
             self.reader.close()
+            # 关闭后再次查询时重新打开
+            self.reader = None
+
+
+@lru_cache(maxsize=65536)
+def _is_private_ip(ip_address: str) -> bool:
+    """判断是否为内网IP，同一IP在访问日志中反复出现，结果按IP缓存"""
+    try:
+        return ipaddress.ip_address(ip_address).is_private
+    except ValueError:
+        return False
+
 
+@lru_cache(maxsize=4)
+def _get_locator(db_path: str) -> IPGeoLocator:
+    """按数据库路径复用定位器，Reader只读查询线程安全，无需每次分析都重新打开和映射数据库"""
+    return IPGeoLocator(db_path)
 
-def analyze_ip_access(ip_list: list, db_path: str) -> Tuple[Dict[str, int], Dict[str, int]]:
-    """分析IP访问情况，返回国内和国外IP的访问次数统计"""
+
+def analyze_ip_access(ip_list: Union[Iterable[str], Mapping[str, int]], db_path: str) -> Tuple[Dict[str, int], Dict[str, int]]:
+    """分析IP访问情况，返回国内和国外IP的访问次数统计
+
+    ip_list可以是IP列表，也可以是已统计好的IP访问次数（如Counter），后者无需展开成列表
+    """
     internal_ips = {}
     external_ips = {}
-    locator = None
-
-    try:
-        # 使用传入的数据库路径初始化定位器
-        locator = IPGeoLocator(db_path)
 
-        for ip in ip_list:
-            if locator.is_private_ip(ip):
-                internal_ips[ip] = internal_ips.get(ip, 0) + 1
-            else:
-                external_ips[ip] = external_ips.get(ip, 0) + 1
-    finally:
-        if locator:
-            locator.close()
+    # 使用传入的数据库路径获取定位器
+    locator = _get_locator(db_path)
 
-    # 按访问次数排序
-    internal_ips = dict(sorted(internal_ips.items(), key=lambda x: x[1], reverse=True))
-    external_ips = dict(sorted(external_ips.items(), key=lambda x: x[1], reverse=True))
+    # 先按IP计数并按访问次数排序，每个不同的IP只判断一次是否为内网地址，分组后保持有序
+    for ip, count in Counter(ip_list).most_common():
+        if locator.is_private_ip(ip):
+            internal_ips[ip] = count
+        else:
+            external_ips[ip] = count
 
-    return internal_ips, external_ips
\ No newline at end of file
+    return internal_ips, external_ips
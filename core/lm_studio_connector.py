@@ -8,11 +8,19 @@ import requests
 import json
 import logging
 import time
+import random
 from typing import Dict, List, Any, Optional, AsyncGenerator
 from dataclasses import dataclass
 import asyncio
 import aiohttp
 from pathlib import Path
+from .http_utils import AdaptiveTokenBucket, parse_retry_after
+
+# 异步连接池上限与keep-alive空闲保持秒数
+_ASYNC_POOL_LIMIT = 32
+_KEEPALIVE_TIMEOUT = 60
+# 异步重试单次等待的上限秒数
+_RETRY_MAX_WAIT = 30.0
 
 @dataclass
 class LMStudioAPIConfig:
@@ -36,6 +44,8 @@ class LMStudioModelConfig:
     preferred_model: str = ""
     model_mapping: Dict[str, str] = None
     max_tokens: int = 2048
+    # 多条日志合并为一次请求时max_tokens按条数放大，但不超过该上限，避免超出本地模型上下文
+    marshal_max_tokens: int = 4096
     temperature: float = 0.7
     top_p: float = 0.9
     frequency_penalty: float = 0.0
@@ -57,6 +67,9 @@ class LMStudioConfig:
     timeout: int = 30
     retry_attempts: int = 3
     retry_delay: float = 1.0
+    retry_backoff: float = 2.0  # 指数退避的底数
+    max_concurrency: int = 8  # 批量分析时的最大并发请求数
+    rate_limit: float = 0.0  # 每秒请求数上限，0表示不限速
     api: LMStudioAPIConfig = None
     model: LMStudioModelConfig = None
 
@@ -89,6 +102,36 @@ class ChatMessage:
     content: str
     timestamp: float = None
 
+# 安全日志分析的系统提示词在模块加载时构建一次；每次请求的消息都以完全相同的前缀开头，
+# LM Studio等推理服务可直接复用该前缀的KV缓存，省去重复的预填充计算
+_SECURITY_LOG_SYSTEM_MESSAGE = ChatMessage(role="system", content="""你是一个专业的网络安全分析师。请分析以下日志条目，识别潜在的安全威胁、攻击模式或异常行为。
+
+请提供以下分析：
+1. 威胁等级评估（低/中/高/严重）
+2. 攻击类型识别
+3. 风险因素分析
+4. 建议的响应措施
+
+请用中文回答，保持专业和准确。""")
+
+def _build_security_log_messages(log_entry: Dict[str, Any]) -> List[ChatMessage]:
+    """构建安全日志分析的消息列表，只有用户消息随日志条目变化"""
+    user_prompt = f"""请分析以下安全日志：
+
+时间戳: {log_entry.get('timestamp', 'N/A')}
+源IP: {log_entry.get('src_ip', 'N/A')}
+请求方法: {log_entry.get('request_method', 'N/A')}
+请求路径: {log_entry.get('request_path', 'N/A')}
+用户代理: {log_entry.get('user_agent', 'N/A')}
+状态码: {log_entry.get('status_code', 'N/A')}
+
+请求头: {log_entry.get('request_headers', {})}
+请求体: {log_entry.get('request_body', 'N/A')}
+
+其他信息: {log_entry.get('additional_info', 'N/A')}"""
+
+    return [_SECURITY_LOG_SYSTEM_MESSAGE, ChatMessage(role="user", content=user_prompt)]
+
 class LMStudioConnector:
     """LM Studio模型连接器"""
 
@@ -96,10 +139,12 @@ class LMStudioConnector:
         self.config = config or LMStudioConfig()
         self.logger = logging.getLogger(__name__)
         self.base_url = self.config.api.base_url
-        self.session = None
+        self.session = None  # 异步请求使用的aiohttp会话，首次异步调用时创建
+        self._http_session = None  # 同步请求使用的requests会话，复用keep-alive连接
         self.available_models = []
         self.current_model = None
         self._headers = self.config.api.headers.copy()
+        self._rate_bucket = self._create_rate_bucket()
 
         # 添加API密钥（如果配置了）
         if self.config.api.api_key:
@@ -109,8 +154,35 @@ class LMStudioConnector:
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        if self.session:
-            self.session.close()
+        self.close()
+
+    def close(self):
+        """关闭同步HTTP会话，释放连接池中的keep-alive连接"""
+        if self._http_session is not None:
+            self._http_session.close()
+            self._http_session = None
+
+    @property
+    def _sync_session(self) -> requests.Session:
+        """同步请求共用的HTTP会话，首次使用时创建"""
+        if self._http_session is None:
+            self._http_session = requests.Session()
+        return self._http_session
+
+    def _create_rate_bucket(self) -> Optional[AdaptiveTokenBucket]:
+        """按配置创建异步请求共用的令牌桶，未启用限速时返回None"""
+        rate = self.config.rate_limit
+        if not rate or rate <= 0:
+            return None
+        # 以配置值为速率上限，遇到限流时最多降到十分之一
+        return AdaptiveTokenBucket(rate, max(rate, 1.0), rate * 0.1, rate)
+
+    def _retry_wait_time(self, attempt: int, retry_after: Optional[float]) -> float:
+        """计算下次重试前的等待秒数，优先使用服务端给出的Retry-After"""
+        if retry_after is None:
+            # 带随机抖动的指数退避，避免并发请求同时重试
+            retry_after = self.config.retry_delay * (self.config.retry_backoff ** attempt) * random.uniform(0.5, 1.5)
+        return min(retry_after, _RETRY_MAX_WAIT)
 
     async def __aenter__(self):
         await self._ensure_session()
@@ -123,7 +195,10 @@ class LMStudioConnector:
     async def _ensure_session(self):
         """确保HTTP会话存在"""
         if self.session is None:
+            # 与同步请求使用相同的请求头（含API密钥）
             self.session = aiohttp.ClientSession(
+                headers=self._headers,
+                connector=aiohttp.TCPConnector(limit=_ASYNC_POOL_LIMIT, keepalive_timeout=_KEEPALIVE_TIMEOUT),
                 timeout=aiohttp.ClientTimeout(total=self.config.timeout)
             )
 
@@ -131,7 +206,8 @@ class LMStudioConnector:
         """检查与LM Studio的连接"""
         try:
             models_url = f"{self.base_url}{self.config.api.models_endpoint}"
-            response = requests.get(models_url, headers=self._headers, timeout=5)
+            # 同时预热连接池，后续请求可直接复用这条连接
+            response = self._sync_session.get(models_url, headers=self._headers, timeout=5)
             if response.status_code == 200:
                 models = response.json().get("data", [])
                 self.available_models = [model["id"] for model in models]
@@ -211,7 +287,7 @@ class LMStudioConnector:
         if 'headers' in kwargs:
             headers.update(kwargs.pop('headers'))
 
-        return requests.request(method, url, headers=headers, **kwargs)
+        return self._sync_session.request(method, url, headers=headers, **kwargs)
 
     def chat_completion(self, messages: List[ChatMessage], **kwargs) -> Optional[str]:
         """同步聊天完成"""
@@ -241,28 +317,49 @@ class LMStudioConnector:
         """异步聊天完成"""
         await self._ensure_session()
 
+        bucket = self._rate_bucket
         for attempt in range(self.config.retry_attempts):
+            if bucket is not None:
+                wait_time = bucket.reserve()
+                if wait_time > 0:
+                    await asyncio.sleep(wait_time)
+
+            retry_after = None
             try:
                 payload = self._prepare_chat_payload(messages, **kwargs)
 
                 async with self.session.post(
-                    f"{self.base_url}/v1/chat/completions",
+                    f"{self.base_url}{self.config.api.chat_endpoint}",
                     json=payload
                 ) as response:
                     if response.status == 200:
                         result = await response.json()
+                        if bucket is not None:
+                            bucket.on_success()
                         return result["choices"][0]["message"]["content"]
-                    else:
+                    if response.status != 429 and response.status < 500:
+                        # 客户端错误重试也不会成功
                         self.logger.error(f"异步聊天请求失败: HTTP {response.status}")
-
+                        return None
+
+                    # 限流或服务端错误：降低发送速率后退避重试
+                    if bucket is not None:
+                        bucket.on_throttle()
+                    retry_after = parse_retry_after(response)
+                    self.logger.warning(f"异步聊天请求失败: HTTP {response.status} "
+                                        f"(尝试 {attempt + 1}/{self.config.retry_attempts})")
+
+            except asyncio.TimeoutError:
+                if bucket is not None:
+                    bucket.on_throttle()
+                self.logger.warning(f"异步聊天请求超时 (尝试 {attempt + 1}/{self.config.retry_attempts})")
             except Exception as e:
                 self.logger.warning(f"异步聊天完成异常 (尝试 {attempt + 1}/{self.config.retry_attempts}): {e}")
-                if attempt < self.config.retry_attempts - 1:
-                    await asyncio.sleep(self.config.retry_delay)
-                else:
-                    self.logger.error(f"异步聊天完成最终失败: {e}")
-                    return None
 
+            if attempt < self.config.retry_attempts - 1:
+                await asyncio.sleep(self._retry_wait_time(attempt, retry_after))
+
+        self.logger.error("异步聊天完成最终失败")
         return None
 
     async def chat_completion_stream(self, messages: List[ChatMessage], **kwargs) -> AsyncGenerator[str, None]:
@@ -273,7 +370,7 @@ class LMStudioConnector:
             payload = self._prepare_chat_payload(messages, stream=True, **kwargs)
 
             async with self.session.post(
-                f"{self.base_url}/v1/chat/completions",
+                f"{self.base_url}{self.config.api.chat_endpoint}",
                 json=payload
             ) as response:
                 if response.status == 200:
@@ -300,67 +397,13 @@ class LMStudioConnector:
 
     def analyze_security_log(self, log_entry: Dict[str, Any]) -> Optional[str]:
         """分析安全日志"""
-        system_prompt = """你是一个专业的网络安全分析师。请分析以下日志条目，识别潜在的安全威胁、攻击模式或异常行为。
-
-请提供以下分析：
-1. 威胁等级评估（低/中/高/严重）
-2. 攻击类型识别
-3. 风险因素分析
-4. 建议的响应措施
-
-请用中文回答，保持专业和准确。"""
-
-        user_prompt = f"""请分析以下安全日志：
-
-时间戳: {log_entry.get('timestamp', 'N/A')}
-源IP: {log_entry.get('src_ip', 'N/A')}
-请求方法: {log_entry.get('request_method', 'N/A')}
-请求路径: {log_entry.get('request_path', 'N/A')}
-用户代理: {log_entry.get('user_agent', 'N/A')}
-状态码: {log_entry.get('status_code', 'N/A')}
-
-请求头: {log_entry.get('request_headers', {})}
-请求体: {log_entry.get('request_body', 'N/A')}
-
-其他信息: {log_entry.get('additional_info', 'N/A')}"""
-
-        messages = [
-            ChatMessage(role="system", content=system_prompt),
-            ChatMessage(role="user", content=user_prompt)
-        ]
+        messages = _build_security_log_messages(log_entry)
 
         return self.chat_completion(messages, temperature=0.3)
 
     async def analyze_security_log_async(self, log_entry: Dict[str, Any]) -> Optional[str]:
         """异步分析安全日志"""
-        system_prompt = """你是一个专业的网络安全分析师。请分析以下日志条目，识别潜在的安全威胁、攻击模式或异常行为。
-
-请提供以下分析：
-1. 威胁等级评估（低/中/高/严重）
-2. 攻击类型识别
-3. 风险因素分析
-4. 建议的响应措施
-
-请用中文回答，保持专业和准确。"""
-
-        user_prompt = f"""请分析以下安全日志：
-
-时间戳: {log_entry.get('timestamp', 'N/A')}
-源IP: {log_entry.get('src_ip', 'N/A')}
-请求方法: {log_entry.get('request_method', 'N/A')}
-请求路径: {log_entry.get('request_path', 'N/A')}
-用户代理: {log_entry.get('user_agent', 'N/A')}
-状态码: {log_entry.get('status_code', 'N/A')}
-
-请求头: {log_entry.get('request_headers', {})}
-请求体: {log_entry.get('request_body', 'N/A')}
-
-其他信息: {log_entry.get('additional_info', 'N/A')}"""
-
-        messages = [
-            ChatMessage(role="system", content=system_prompt),
-            ChatMessage(role="user", content=user_prompt)
-        ]
+        messages = _build_security_log_messages(log_entry)
 
         return await self.chat_completion_async(messages, temperature=0.3)
 
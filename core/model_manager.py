@@ -5,16 +5,26 @@
 """
 
 import asyncio
+import csv
+import io
 import json
 import logging
 import time
-from typing import Dict, List, Optional, Any, Tuple
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Any, Tuple, BinaryIO, TextIO
 from dataclasses import dataclass, asdict
+from functools import cached_property
 from pathlib import Path
 
 from core.lm_studio_connector import LMStudioConnector, LMStudioConfig, get_lm_studio_connector
 from core.ai_config_manager import get_ai_config_manager
 
+# orjson为可选依赖，直接输出UTF-8字节，导出大列表时更快
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 @dataclass
 class ModelInfo:
     """模型信息"""
@@ -30,6 +40,11 @@ class ModelInfo:
     recommended: bool = False
     compatibility_score: float = 0.0
 
+    @cached_property
+    def search_text(self) -> str:
+        """用于关键词搜索的小写文本（名称、ID、描述），首次访问时生成"""
+        return f"{self.name}\n{self.id}\n{self.description or ''}".lower()
+
 @dataclass
 class ServerStatus:
     """服务器状态"""
@@ -351,8 +366,8 @@ class ModelManager:
     def select_model(self, model_id: str) -> bool:
         """选择模型"""
         try:
-            # 验证模型是否可用
-            available_models = self.refresh_models()
+            # 验证模型是否可用（调用方通常刚刷新过列表，优先使用缓存）
+            available_models = self.refresh_models(force_refresh=False)
             model_ids = [m.id for m in available_models]
 
             if model_id not in model_ids:
@@ -494,6 +509,25 @@ class ModelManager:
             self.logger.error(f"获取模型推荐失败: {e}")
             return []
 
+    def _write_model_csv(self, models: List[ModelInfo], output: TextIO):
+        """以CSV格式写入模型列表"""
+        writer = csv.writer(output)
+
+        # 写入标题行
+        writer.writerow(["ID", "名称", "参数", "量化", "推荐", "兼容性评分", "描述"])
+
+        # 写入数据行
+        for model in models:
+            writer.writerow([
+                model.id,
+                model.name,
+                model.parameters or "",
+                model.quantization or "",
+                "是" if model.recommended else "否",
+                f"{model.compatibility_score:.1f}",
+                model.description or ""
+            ])
+
     def export_model_list(self, format: str = "json") -> str:
         """导出模型列表"""
         try:
@@ -504,35 +538,51 @@ class ModelManager:
                                 indent=2, ensure_ascii=False)
 
             elif format.lower() == "csv":
-                import csv
-                import io
-
                 output = io.StringIO()
-                writer = csv.writer(output)
+                self._write_model_csv(models, output)
+                return output.getvalue()
 
-                # 写入标题行
-                writer.writerow(["ID", "名称", "参数", "量化", "推荐", "兼容性评分", "描述"])
+            else:
+                raise ValueError(f"不支持的导出格式: {format}")
 
-                # 写入数据行
-                for model in models:
-                    writer.writerow([
-                        model.id,
-                        model.name,
-                        model.parameters or "",
-                        model.quantization or "",
-                        "是" if model.recommended else "否",
-                        f"{model.compatibility_score:.1f}",
-                        model.description or ""
-                    ])
+        except Exception as e:
+            self.logger.error(f"导出模型列表失败: {e}")
+            return ""
 
-                return output.getvalue()
+    def write_model_list(self, fp: BinaryIO, format: str = "json") -> bool:
+        """将模型列表直接写入以二进制模式打开的文件，不在内存中拼出完整字符串"""
+        try:
+            models = self.refresh_models()
+
+            if format.lower() == "json":
+                data = [asdict(model) for model in models]
+                if orjson is not None:
+                    fp.write(orjson.dumps(data, option=orjson.OPT_INDENT_2))
+                else:
+                    with _text_writer(fp) as output:
+                        json.dump(data, output, indent=2, ensure_ascii=False)
+
+            elif format.lower() == "csv":
+                with _text_writer(fp, newline="") as output:
+                    self._write_model_csv(models, output)
 
             else:
                 raise ValueError(f"不支持的导出格式: {format}")
 
+            return True
+
         except Exception as e:
             self.logger.error(f"导出模型列表失败: {e}")
-            return ""
+            return False
+
+@contextmanager
+def _text_writer(fp: BinaryIO, newline: Optional[str] = None):
+    """在二进制文件上临时包一层UTF-8文本写入器，结束（包括出错）时分离，不关闭底层文件"""
+    output = io.TextIOWrapper(fp, encoding="utf-8", newline=newline)
+    try:
+        yield output
+    finally:
+        output.detach()
 
 # 全局模型管理器实例
 _global_model_manager = None
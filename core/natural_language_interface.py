@@ -8,6 +8,7 @@ import asyncio
 import json
 import logging
 import re
+from itertools import islice
 from typing import Dict, List, Any, Optional, Tuple, AsyncGenerator
 from datetime import datetime, timedelta
 from dataclasses import dataclass
@@ -441,7 +442,7 @@ class NaturalLanguageInterface:
                 answer += f"   影响IP数量：{len(pattern.affected_ips)}\n\n"
 
                 if pattern.affected_ips:
-                    answer += f"   主要来源IP：{', '.join(pattern.affected_ips[:5])}\n\n"
+                    answer += f"   主要来源IP：{', '.join(islice(pattern.affected_ips, 5))}\n\n"
         else:
             answer = "🔎 **威胁模式搜索结果**\n\n当前未检测到特定的威胁模式。"
 
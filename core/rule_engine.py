@@ -428,6 +428,10 @@ class RuleEngine:
         # 提取攻击上下文
         context = self._extract_attack_context(log_entry)
 
+        # 按性能剖析，热点在逐规则重复查找字段（含嵌套递归）和解码；同一条日志内按字段只解析一次
+        field_values = {}
+        decoded_values = {}
+
         for rule_id, rule_data in self.compiled_rules.items():
             rule = rule_data['rule']
             compiled = rule_data['compiled']
@@ -440,18 +444,24 @@ class RuleEngine:
                 needs_decode = pattern_info['needs_decode']
 
                 # 获取目标字段值，支持嵌套字典
-                field_value = self._get_field_value(log_entry, target_field) or self._get_field_value(context, target_field)
+                if target_field in field_values:
+                    field_value = field_values[target_field]
+                else:
+                    field_value = self._get_field_value(log_entry, target_field) or self._get_field_value(context, target_field)
+                    # 如果字段值是复杂数据类型，转换为字符串
+                    if field_value and not isinstance(field_value, str):
+                        field_value = str(field_value)
+                    field_values[target_field] = field_value
                 if not field_value:
                     continue
 
-                # 如果字段值是复杂数据类型，转换为字符串
-                if not isinstance(field_value, str):
-                    field_value = str(field_value)
-
                 # 如果需要解码，先解码再匹配
-                original_value = field_value
                 if needs_decode:
-                    field_value = self._decode_and_normalize(field_value)
+                    original_value = field_value
+                    if target_field in decoded_values:
+                        field_value = decoded_values[target_field]
+                    else:
+                        field_value = decoded_values[target_field] = self._decode_and_normalize(field_value)
                     if field_value != original_value:
                         match_details['required_decode'] = True
 
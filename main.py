@@ -48,6 +48,7 @@ class LogHunter:
         self.batch_size = self.config.get('analysis', {}).get('batch_size', 1000)
         self.max_events = self.config.get('analysis', {}).get('max_events', 100)
         self.memory_limit = self.config.get('analysis', {}).get('memory_limit_mb', 500) * 1024 * 1024
+        self.ai_settings = self.config_manager.get_ai_analysis_settings()
 
         try:
             self.parser = LogParser(self.config['log_format'])
@@ -458,11 +459,11 @@ class LogHunter:
             reverse=True
         )
         
-        ai_config = self.config.get('ai_analysis', {})
-        high_risk_only = ai_config.get('high_risk_only', True)
-        successful_attacks_only = ai_config.get('successful_attacks_only', True) 
-        success_status_codes = ai_config.get('success_status_codes', ['200', '201', '202', '204', '301', '302', '304'])
-        high_risk_severity = ai_config.get('high_risk_severity', 'high')
+        ai_settings = self.ai_settings
+        high_risk_only = ai_settings.high_risk_only
+        successful_attacks_only = ai_settings.successful_attacks_only
+        success_status_codes = ai_settings.success_status_codes
+        high_risk_severity = ai_settings.high_risk_severity
         
         filtered_entries = []
         for entry in sorted_entries:
@@ -486,8 +487,7 @@ class LogHunter:
     
     def _get_top_critical_entries(self, filtered_entries: List[Dict]) -> List[Dict]:
         """获取需要AI分析的前N个条目"""
-        ai_config = self.config.get('ai_analysis', {})
-        max_ai_analysis = ai_config.get('max_ai_analysis', 5)
+        max_ai_analysis = self.ai_settings.max_ai_analysis
         
         top_critical_entries = filtered_entries[:max_ai_analysis]
         self.logger.info(f"总计发现 {len(filtered_entries)} 个安全事件")
@@ -502,9 +502,8 @@ class LogHunter:
         if not top_critical_entries:
             return ai_results
 
-        ai_config = self.config.get('ai_analysis', {})
-        high_risk_only = ai_config.get('high_risk_only', True)
-        successful_attacks_only = ai_config.get('successful_attacks_only', True)
+        high_risk_only = self.ai_settings.high_risk_only
+        successful_attacks_only = self.ai_settings.successful_attacks_only
 
         attack_type = "高风险成功攻击" if high_risk_only and successful_attacks_only else "重要安全事件"
 
@@ -560,7 +559,7 @@ class LogHunter:
     def _process_ip_statistics(self) -> tuple:
         """处理IP统计信息"""
         if not self._check_interrupted():
-            internal_ips, external_ips = analyze_ip_access(list(self.ip_counter.elements()), self.config['geoip_db_path'])
+            internal_ips, external_ips = analyze_ip_access(self.ip_counter, self.config['geoip_db_path'])
             external_ip_details = []
             if external_ips:
                 try:
@@ -597,7 +596,7 @@ def main():
         log_hunter = LogHunter(args.config, ai_enabled=True)
         rules = log_hunter.ai_analyzer.generate_parsing_rules(args.generate_rules)
         if 'fields' in rules:
-            success = log_hunter.update_log_format_config(rules['fields'])
+            success = log_hunter.update_log_format_config(rules['raw'])
             if success:
                 print("日志解析规则已成功生成并更新到config.yaml")
             else:
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+AI分析器测试用例
+使用本地桩服务模拟Ollama接口，不依赖真实AI服务
+"""
+
+import asyncio
+import json
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+# 添加项目根目录到路径
+sys.path.append(str(Path(__file__).parent.parent))
+
+from core.ai_analyzer import AIAnalyzer, _SPECIALIZED_PROMPTS, _select_prompt_template
+
+
+@pytest.fixture
+def ollama_stub():
+    """在后台线程中运行的Ollama桩服务，返回 (chat接口地址, 收到的请求列表, 选项)
+
+    合并请求按日志段数返回JSON数组，选项 batch_reply 为 'invalid' 时返回无法解析的内容
+    """
+    web = pytest.importorskip("aiohttp.web")
+    requests_seen = []
+    options = {'batch_reply': 'json'}
+    started = threading.Event()
+    state = {}
+
+    async def chat(request):
+        body = await request.json()
+        requests_seen.append(body)
+        prompt = body['messages'][-1]['content']
+        count = prompt.count('\n--- LOG ')
+        if not count:
+            content = f"分析结果{len(requests_seen)}"
+        elif options['batch_reply'] == 'invalid':
+            content = "无法按要求输出JSON数组"
+        else:
+            content = json.dumps([f"批量结果{i}" for i in range(1, count + 1)], ensure_ascii=False)
+        return web.json_response({'message': {'content': content}})
+
+    async def serve():
+        app = web.Application()
+        app.router.add_post('/api/chat', chat)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, '127.0.0.1', 0)
+        await site.start()
+        state['port'] = site._server.sockets[0].getsockname()[1]
+        state['stop'] = asyncio.Event()
+        state['loop'] = asyncio.get_running_loop()
+        started.set()
+        await state['stop'].wait()
+        await runner.cleanup()
+
+    thread = threading.Thread(target=asyncio.run, args=(serve(),), daemon=True)
+    thread.start()
+    assert started.wait(10)
+    yield f"http://127.0.0.1:{state['port']}/api/chat", requests_seen, options
+    state['loop'].call_soon_threadsafe(state['stop'].set)
+    thread.join(10)
+
+
+@pytest.fixture
+def local_analyzer(tmp_path, ollama_stub):
+    """使用默认配置、指向桩服务的本地AI分析器"""
+    analyzer = AIAnalyzer(str(tmp_path / 'missing_config.yaml'))
+    analyzer.ai_type = 'local'
+    analyzer.local_provider = 'ollama'
+    analyzer.local_chat_url = ollama_stub[0]
+    analyzer.stream_responses = False
+    analyzer.cache_size = 0
+    yield analyzer
+    analyzer.close()
+
+
+def test_async_session_survives_new_event_loop(local_analyzer, ollama_stub):
+    """连续两次 asyncio.run 使用同一分析器时，会话随事件循环重新创建"""
+    first = asyncio.run(local_analyzer.analyze_log_async('GET /index.php?id=1 OR 1=1'))
+    second = asyncio.run(local_analyzer.analyze_log_async('GET /etc/passwd'))
+
+    assert first.startswith('分析结果')
+    assert second.startswith('分析结果')
+    assert len(ollama_stub[1]) == 2
+
+    asyncio.run(local_analyzer.aclose())
+    assert local_analyzer._aclient is None
+
+
+def _batch_items():
+    return [
+        ('GET /index.php?id=1 OR 1=1', 'injection', 'SQL Injection', 8.0),
+        ('   ', None, None, None),
+        ('GET /search?q=<script>alert(1)</script>', 'xss', 'XSS', 6.0),
+        ('GET /etc/passwd', None, None, None),
+    ]
+
+
+def test_batch_merges_logs_and_keeps_order(local_analyzer, ollama_stub):
+    """每 max_batch_size 段日志合并为一次请求，空日志不发请求，结果按输入顺序返回"""
+    local_analyzer.max_batch_size = 2
+
+    results = local_analyzer.analyze_logs_batch(_batch_items())
+
+    assert results[1] == "无有效日志内容可供分析"
+    assert results[0] == "批量结果1"
+    assert results[2] == "批量结果2"
+    # 最后一批只有一段日志，直接逐条分析
+    assert results[3].startswith("分析结果")
+
+    prompts = [body['messages'][-1]['content'] for body in ollama_stub[1]]
+    assert len(prompts) == 2
+    assert prompts[0].count('\n--- LOG ') == 2
+    assert 'OR 1=1' in prompts[0] and '<script>' in prompts[0]
+    assert '/etc/passwd' in prompts[1] and '--- LOG ' not in prompts[1]
+
+
+def test_batch_falls_back_to_single_requests(local_analyzer, ollama_stub):
+    """合并结果无法解析时该批逐条分析"""
+    ollama_stub[2]['batch_reply'] = 'invalid'
+    local_analyzer.max_batch_size = 10
+
+    results = asyncio.run(local_analyzer.analyze_logs_batch_async(_batch_items()))
+
+    assert results[1] == "无有效日志内容可供分析"
+    assert all(result.startswith("分析结果") for result in (results[0], results[2], results[3]))
+    # 1次合并请求 + 3次逐条请求
+    assert len(ollama_stub[1]) == 4
+    asyncio.run(local_analyzer.aclose())
+
+
+@pytest.mark.parametrize("content", [
+    None,
+    "",
+    "没有JSON",
+    '["只有一条"]',
+    '["a", 2]',
+    '{"a": "b", "c": "d"}',
+    '["a", "b"',
+])
+def test_parse_batch_response_rejects_mismatch(tmp_path, content):
+    """数量不符、元素非字符串或JSON不完整时返回None"""
+    analyzer = AIAnalyzer(str(tmp_path / 'missing_config.yaml'))
+    assert analyzer._parse_batch_response(content, 2) is None
+
+
+def test_parse_batch_response_accepts_wrapped_array(tmp_path):
+    """JSON数组前后附带说明文字时仍可解析"""
+    analyzer = AIAnalyzer(str(tmp_path / 'missing_config.yaml'))
+    assert analyzer._parse_batch_response('结果如下：\n["a", "b"]\n以上', 2) == ["a", "b"]
+
+
+def test_batch_max_tokens_is_capped(tmp_path):
+    """合并请求的max_tokens按段数累加，但不超过 batch_max_tokens"""
+    analyzer = AIAnalyzer(str(tmp_path / 'missing_config.yaml'))
+    analyzer.deepseek_config['max_tokens'] = 2048
+    analyzer.batch_max_tokens = 8192
+
+    assert analyzer._batch_max_tokens(2) == 4096
+    assert analyzer._batch_max_tokens(10) == 8192
+
+    # 上限小于单条max_tokens时仍保证单条的长度
+    analyzer.batch_max_tokens = 1000
+    assert analyzer._batch_max_tokens(3) == 2048
+
+
+def _legacy_attack_category(attack_name):
+    """原实现中按攻击名称推断类别的顺序判断"""
+    name = attack_name.lower()
+    if 'sql' in name or 'injection' in name:
+        return 'injection'
+    if 'xss' in name or 'script' in name:
+        return 'xss'
+    if 'rce' in name or 'command' in name or 'exec' in name:
+        return 'rce'
+    if 'ssrf' in name:
+        return 'ssrf'
+    if 'api' in name or 'graphql' in name or 'rest' in name:
+        return 'api_security'
+    if 'kubernetes' in name or 'docker' in name or 'cloud' in name:
+        return 'cloud_security'
+    return None
+
+
+@pytest.mark.parametrize("attack_name", [
+    "SQL Injection", "apinjection", "restxss", "graphqlscript", "cloudexec", "dockerssrf",
+    "XSS via API", "Remote Command Execution", "commandsql", "ssrfapi", "KUBERNETES API",
+    "execscript", "prescript", "interesting", "Brute Force", "", "Path Traversal",
+])
+def test_attack_name_prompt_matches_legacy_mapping(attack_name):
+    """按攻击名称选择的专用提示词与原先逐个关键字判断的结果一致"""
+    category = _legacy_attack_category(attack_name)
+    template = _select_prompt_template(None, attack_name)
+    if category is None:
+        assert template not in _SPECIALIZED_PROMPTS.values()
+    else:
+        assert template == _SPECIALIZED_PROMPTS[category]
+
+
+def test_retry_after_is_capped(tmp_path):
+    """服务端给出的Retry-After不超过 retry_max_wait"""
+    analyzer = AIAnalyzer(str(tmp_path / 'missing_config.yaml'))
+    analyzer.retry_max_wait = 10
+    deadline = time.monotonic() + 120
+
+    assert analyzer._retry_wait_time(0, 100.0, deadline) == 10
+    assert analyzer._retry_wait_time(0, 3.0, deadline) == 3.0
+    # 即使截到上限仍会超出总时限时放弃重试
+    assert analyzer._retry_wait_time(0, 100.0, time.monotonic() + 5) is None
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+AI配置管理器测试用例
+验证getter缓存、延迟保存等行为
+"""
+
+import shutil
+import sys
+from pathlib import Path
+
+import pytest
+
+# 添加项目根目录到路径
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.append(str(PROJECT_ROOT))
+
+from core.ai_config_manager import AIConfigManager, AIAnalysisConfig
+
+
+@pytest.fixture
+def manager(tmp_path):
+    """基于临时配置文件的配置管理器"""
+    config_file = tmp_path / "ai_config.yaml"
+    shutil.copy(PROJECT_ROOT / "config" / "ai_config.yaml", config_file)
+    return AIConfigManager(str(config_file))
+
+
+def test_lm_studio_config_is_not_shared(manager):
+    """调用方修改返回的LM Studio配置不影响后续调用"""
+    first = manager.get_lm_studio_config()
+    first.model_name = "other-model"
+    first.model.max_tokens = 1
+
+    second = manager.get_lm_studio_config()
+    assert second is not first
+    assert getattr(second, "model_name", None) != "other-model"
+    assert second.model.max_tokens != 1
+
+
+def test_memoized_getters_follow_config_changes(manager):
+    """配置未变时复用缓存，修改配置后重新构建"""
+    perf = manager.get_performance_config()
+    assert manager.get_performance_config() is perf
+
+    features = manager.get_ai_features_config()
+    assert manager.get_ai_features_config() is features
+    assert manager.update_ai_features(AIAnalysisConfig(threat_analysis=False))
+    updated = manager.get_ai_features_config()
+    assert updated is not features
+    assert updated.threat_analysis is False
+    assert manager.is_feature_enabled("threat_analysis") is False
+
+
+def test_defer_saves_writes_once(manager, monkeypatch):
+    """defer_saves 内的多次修改只在退出时写入一次"""
+    saves = []
+    original_save = manager.save_config
+
+    def counting_save():
+        saves.append(1)
+        return original_save()
+
+    monkeypatch.setattr(manager, "save_config", counting_save)
+
+    with manager.defer_saves():
+        manager.disable_ai_feature("threat_analysis")
+        manager.disable_ai_feature("rule_explanation")
+        manager.enable_ai_feature("batch_analysis")
+        assert not saves
+
+    assert len(saves) == 1
+    reloaded = AIConfigManager(str(manager.config_file))
+    assert reloaded.is_feature_enabled("threat_analysis") is False
+    assert reloaded.is_feature_enabled("rule_explanation") is False
+    assert reloaded.is_feature_enabled("batch_analysis") is True
+
+
+def test_load_skips_sidecar_when_directory_is_read_only(tmp_path, monkeypatch):
+    """配置目录不可写时加载配置不写入JSON缓存"""
+    import core.ai_config_manager as ai_config_manager
+
+    config_file = tmp_path / "readonly.yaml"
+    shutil.copy(PROJECT_ROOT / "config" / "ai_config.yaml", config_file)
+    monkeypatch.setattr(ai_config_manager.os, "access", lambda path, mode: False)
+
+    manager = AIConfigManager(str(config_file))
+
+    assert manager.get_lm_studio_config().port == 1234
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["readonly.yaml"]
+
+
+def test_load_reuses_sidecar(tmp_path, monkeypatch):
+    """配置目录可写时生成JSON缓存，YAML未变时后续加载直接读取缓存"""
+    import core.ai_config_manager as ai_config_manager
+
+    config_file = tmp_path / "cached.yaml"
+    shutil.copy(PROJECT_ROOT / "config" / "ai_config.yaml", config_file)
+    first = AIConfigManager(str(config_file))
+    assert (tmp_path / "cached.yaml.json").exists()
+
+    # 清空进程内缓存并禁止YAML解析，确认配置来自JSON缓存
+    monkeypatch.setattr(ai_config_manager, "_PARSED_CACHE", {})
+    monkeypatch.setattr(ai_config_manager, "_yaml_io", lambda: pytest.fail("不应重新解析YAML"))
+    second = AIConfigManager(str(config_file))
+    assert second.get_full_config_copy() == first.get_full_config_copy()
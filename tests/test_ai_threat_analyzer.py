@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+AI威胁分析器测试用例
+使用桩连接器，不依赖LM Studio服务
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+
+# 添加项目根目录到路径
+sys.path.append(str(Path(__file__).parent.parent))
+
+from core.ai_threat_analyzer import AIThreatAnalyzer
+from core.lm_studio_connector import LMStudioConnector
+
+
+@pytest.fixture
+def analyzer(monkeypatch):
+    """不连接LM Studio的分析器"""
+    monkeypatch.setattr(LMStudioConnector, "test_connection", lambda self: False)
+    return AIThreatAnalyzer()
+
+
+def test_cache_key_keeps_status_code(analyzer):
+    """状态码原样参与缓存键"""
+    blocked = {'request_path': '/admin', 'status_code': 403}
+    allowed = {'request_path': '/admin', 'status_code': 200}
+    assert analyzer._generate_cache_key(blocked) != analyzer._generate_cache_key(allowed)
+
+    probe = {'request_path': '/x?id=1', 'status_code': 500}
+    hit = {'request_path': '/x?id=9999', 'status_code': 200}
+    assert analyzer._generate_cache_key(probe) != analyzer._generate_cache_key(hit)
+
+
+def test_cache_key_collapses_id_segments(analyzer):
+    """纯数字/UUID路径段和查询参数值归一化，源IP不参与"""
+    first = {
+        'src_ip': '1.2.3.4',
+        'request_path': '/users/42/orders/123e4567-e89b-12d3-a456-426614174000?id=7&page=2',
+        'status_code': 200,
+    }
+    second = {
+        'src_ip': '5.6.7.8',
+        'request_path': '/users/99/orders/00000000-0000-0000-0000-000000000000?id=8&page=3',
+        'status_code': 200,
+    }
+    assert analyzer._generate_cache_key(first) == analyzer._generate_cache_key(second)
+
+
+def test_cache_key_keeps_embedded_digits(analyzer):
+    """非整段ID的数字、User-Agent和请求体不做归一化"""
+    base = {'request_path': '/api/v1/items', 'user_agent': 'sqlmap/1.5', 'request_body': 'a=1'}
+    assert analyzer._generate_cache_key(base) != analyzer._generate_cache_key(
+        dict(base, request_path='/api/v2/items'))
+    assert analyzer._generate_cache_key(base) != analyzer._generate_cache_key(
+        dict(base, user_agent='sqlmap/1.6'))
+    assert analyzer._generate_cache_key(base) != analyzer._generate_cache_key(
+        dict(base, request_body='a=2'))
+    assert analyzer._generate_cache_key(base) != analyzer._generate_cache_key(
+        dict(base, request_path='/api/v1/items?q=1%27%20OR%201=1'))
+
+
+class _StubConnector:
+    """记录调用的桩连接器，合并请求返回预设响应，逐条请求返回固定分析"""
+
+    def __init__(self, marshaled_response):
+        self.marshaled_response = marshaled_response
+        self.marshaled_calls = []
+        self.single_calls = []
+        self.session = None
+        self.current_model = "stub-model"
+
+    async def chat_completion_async(self, messages, temperature=None, max_tokens=None):
+        self.marshaled_calls.append(max_tokens)
+        return self.marshaled_response
+
+    async def analyze_security_log_async(self, log_entry):
+        self.single_calls.append(log_entry['request_path'])
+        return f"威胁等级: 高\n单条分析 {log_entry['request_path']}"
+
+
+def _attack_entries(count):
+    return [{'src_ip': '10.0.0.1', 'request_path': f'/item?q=%27union%20select%20{i}--x{i}', 'status_code': 200}
+            for i in range(count)]
+
+
+def test_split_marshaled_response():
+    """合并响应按条拆分，条数不符或格式错误时返回None"""
+    split = AIThreatAnalyzer._split_marshaled_response
+    assert split('结果如下：\n["分析一", "分析二"]\n', 2) == ["分析一", "分析二"]
+    assert split('["分析一"]', 2) is None
+    assert split('["分析一", ""]', 2) is None
+    assert split('["分析一", 2]', 2) is None
+    assert split('[不是JSON]', 1) is None
+    assert split('', 1) is None
+    assert split(None, 1) is None
+
+
+def test_marshaled_max_tokens_is_capped(analyzer):
+    """合并请求的max_tokens按条数放大但不超过上限"""
+    model = analyzer.lm_config.model
+    assert analyzer._marshaled_max_tokens(1) == model.max_tokens
+    assert analyzer._marshaled_max_tokens(10) == max(model.max_tokens, model.marshal_max_tokens)
+    assert analyzer._marshaled_max_tokens(10) < model.max_tokens * 10
+
+
+def test_marshaled_batch_uses_one_request(analyzer):
+    """响应可拆分时整组日志只发一次请求，结果按输入顺序返回"""
+    entries = _attack_entries(3)
+    analyzer.connector = _StubConnector('["威胁等级: 高\\n第0条", "威胁等级: 中\\n第1条", "威胁等级: 低\\n第2条"]')
+
+    results = asyncio.run(analyzer.analyze_log_batch_marshaled_async(entries, [['SQL注入']] * 3, k=10))
+
+    assert len(analyzer.connector.marshaled_calls) == 1
+    assert analyzer.connector.marshaled_calls[0] <= analyzer.lm_config.model.marshal_max_tokens
+    assert not analyzer.connector.single_calls
+    assert [result.raw_analysis.split('\n')[1] for result in results] == ["第0条", "第1条", "第2条"]
+
+
+def test_marshaled_batch_falls_back_to_single_requests(analyzer):
+    """响应无法拆分时逐条分析，结果仍与输入一一对应"""
+    entries = _attack_entries(3)
+    analyzer.connector = _StubConnector('["只有一条"]')
+
+    results = asyncio.run(analyzer.analyze_log_batch_marshaled_async(entries, [['SQL注入']] * 3, k=10))
+
+    assert len(analyzer.connector.marshaled_calls) == 1
+    assert sorted(analyzer.connector.single_calls) == sorted(entry['request_path'] for entry in entries)
+    assert [result.raw_analysis.rsplit(' ', 1)[1] for result in results] == [entry['request_path'] for entry in entries]
+
+
+class _SlowStubConnector(_StubConnector):
+    """逐条分析时让出事件循环，记录同时进行的最大请求数"""
+
+    def __init__(self):
+        super().__init__(None)
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def analyze_security_log_async(self, log_entry):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(0.01)
+            if log_entry['request_path'].endswith('x3'):
+                raise RuntimeError("LM Studio超时")
+            return await super().analyze_security_log_async(log_entry)
+        finally:
+            self.in_flight -= 1
+
+
+def test_log_batch_limits_concurrency(analyzer):
+    """并发请求数不超过 max_concurrency，结果按输入顺序返回，失败条目为None"""
+    entries = _attack_entries(6)
+    connector = _SlowStubConnector()
+    previous_session = object()
+    connector.session = previous_session
+    analyzer.connector = connector
+    analyzer.lm_config.max_concurrency = 2
+
+    results = analyzer.analyze_log_batch(entries, [['SQL注入']] * 6)
+
+    assert connector.max_in_flight == 2
+    assert len(connector.single_calls) == 5
+    assert results[3] is None
+    assert [result.raw_analysis.rsplit(' ', 1)[1] for i, result in enumerate(results) if i != 3] == [
+        entry['request_path'] for i, entry in enumerate(entries) if i != 3
+    ]
+    # 临时事件循环结束后恢复原会话
+    assert connector.session is previous_session
+
+
+def _static_entry(**overrides):
+    entry = {
+        'src_ip': '10.0.0.1',
+        'request_path': '/static/app.js?v=3',
+        'status_code': 200,
+        'user_agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64)',
+    }
+    entry.update(overrides)
+    return entry
+
+
+def test_prefilter_skips_plain_static_asset(analyzer):
+    """无规则命中的正常静态资源请求不调用AI，直接返回低威胁结果"""
+    analyzer.connector = _StubConnector(None)
+
+    result = analyzer.analyze_log_entry(_static_entry(), [])
+
+    assert not analyzer.connector.single_calls
+    assert result.is_malicious is False
+    assert result.model_used == "预筛"
+    assert result.threat_analysis.threat_level == "低"
+
+
+@pytest.mark.parametrize("overrides, rule_matches", [
+    ({'user_agent': 'sqlmap/1.7'}, []),
+    ({'user_agent': ''}, []),
+    ({}, ['SQL注入']),
+    ({'request_body': 'id=1 OR 1=1'}, []),
+    ({'status_code': 404}, []),
+    ({'request_path': '/static/app.js.php'}, []),
+])
+def test_prefilter_keeps_suspicious_requests(analyzer, overrides, rule_matches):
+    """可疑UA、命中规则、带请求体、异常状态码或非静态资源时仍需AI分析"""
+    assert analyzer._should_ai_analyze(_static_entry(**overrides), rule_matches) is True
+
+
+def test_prefilter_can_be_disabled(analyzer):
+    """关闭预筛后静态资源请求也交给AI分析"""
+    analyzer.prefilter_enabled = False
+    assert analyzer._should_ai_analyze(_static_entry(), []) is True
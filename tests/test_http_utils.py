@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+HTTP公共工具测试用例
+"""
+
+import sys
+from email.utils import format_datetime
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from types import SimpleNamespace
+
+# 添加项目根目录到路径
+sys.path.append(str(Path(__file__).parent.parent))
+
+from core.http_utils import AdaptiveTokenBucket, parse_retry_after
+
+
+def _response(retry_after=None):
+    headers = {} if retry_after is None else {'Retry-After': retry_after}
+    return SimpleNamespace(headers=headers)
+
+
+def test_parse_retry_after():
+    """支持秒数和HTTP日期，缺失、无效或非有限值时返回None"""
+    assert parse_retry_after(_response('3')) == 3.0
+    assert parse_retry_after(_response('-1')) == 0.0
+    assert parse_retry_after(_response()) is None
+    assert parse_retry_after(_response('soon')) is None
+    assert parse_retry_after(None) is None
+    for value in ('nan', 'inf', '-inf', '1e400'):
+        assert parse_retry_after(_response(value)) is None
+
+    retry_at = datetime.now(timezone.utc) + timedelta(seconds=30)
+    assert 0.0 < parse_retry_after(_response(format_datetime(retry_at, usegmt=True))) <= 30.0
+
+
+def test_adaptive_token_bucket():
+    """令牌用尽后需要等待，限流时速率减半，成功时逐步恢复"""
+    bucket = AdaptiveTokenBucket(rate=2.0, capacity=1.0, min_rate=0.5, max_rate=4.0)
+    assert bucket.reserve() == 0.0
+    assert bucket.reserve() > 0.0
+
+    bucket.on_throttle()
+    assert bucket.rate == 1.0
+    bucket.on_throttle()
+    bucket.on_throttle()
+    assert bucket.rate == 0.5
+
+    for _ in range(100):
+        bucket.on_success()
+    assert bucket.rate == 4.0
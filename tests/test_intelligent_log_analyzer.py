@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+智能日志分析器测试用例
+使用桩规则引擎和桩AI分析器，不依赖规则文件和LM Studio服务
+"""
+
+import asyncio
+import sys
+from collections import defaultdict
+from datetime import datetime
+from pathlib import Path
+
+# 添加项目根目录到路径
+sys.path.append(str(Path(__file__).parent.parent))
+
+from core.ai_threat_analyzer import AIDetectionResult, ThreatAnalysis
+from core.intelligent_log_analyzer import IntelligentLogAnalyzer
+from core.rule_engine import ThreatScore
+
+
+class _StubRuleEngine:
+    """按请求路径返回固定匹配结果的规则引擎"""
+
+    def __init__(self):
+        self.rule_stats = defaultdict(int)
+        self.match_calls = 0
+
+    def match_log(self, log_entry):
+        self.match_calls += 1
+        path = log_entry['request_path']
+        if path.startswith('/boom'):
+            raise ValueError("规则匹配异常")
+        if path.startswith('/hit'):
+            return [{
+                'rule': {'name': 'SQL注入', 'description': '测试规则'},
+                'rule_id': 'sql-001',
+                'threat_score': ThreatScore(8.0, 'high', 0.9, ['sql_injection'], []),
+                'details': {'matched_fields': ['request_path'], 'required_decode': False},
+                'log_entry': log_entry,
+                'timestamp': 0.0,
+            }]
+        return []
+
+
+class _StubAIAnalyzer:
+    """合并分析桩：路径以 -none 结尾时返回None，raise_error 时整批抛出异常，delay 模拟请求耗时"""
+
+    def __init__(self, raise_error=False, delay=0.0):
+        self.raise_error = raise_error
+        self.delay = delay
+        self.calls = []
+
+    async def analyze_log_batch_marshaled_async(self, log_entries, rule_matches_list, k=8):
+        self.calls.append(([entry['request_path'] for entry in log_entries], rule_matches_list, k))
+        await asyncio.sleep(self.delay)
+        if self.raise_error:
+            raise RuntimeError("LM Studio不可用")
+        return [None if entry['request_path'].endswith('-none') else _detection(entry)
+                for entry in log_entries]
+
+
+def _detection(log_entry):
+    analysis = ThreatAnalysis(
+        threat_level="高",
+        attack_types=["SQL注入"],
+        risk_factors=[],
+        confidence=0.8,
+        analysis_summary=log_entry['request_path'],
+        recommendations=["阻断来源IP"],
+        timestamp=datetime.now(),
+        rule_matches=[],
+        threat_score=7.5,
+    )
+    return AIDetectionResult(True, analysis, log_entry['request_path'], 0.0, "stub-model", 0.8)
+
+
+def _logs():
+    return [
+        {'src_ip': '10.0.0.1', 'request_path': '/hit?id=1'},
+        {'src_ip': '10.0.0.2', 'request_path': '/index'},
+        {'src_ip': '10.0.0.3', 'request_path': '/boom'},
+        {'src_ip': '10.0.0.4', 'request_path': '/hit-none'},
+        {'src_ip': '10.0.0.5', 'request_path': '/about-none'},
+    ]
+
+
+def test_batch_async_keeps_order_and_statistics():
+    """结果按输入顺序返回，失败条目和AI失败次数计入统计"""
+    ai = _StubAIAnalyzer()
+    analyzer = IntelligentLogAnalyzer(_StubRuleEngine(), ai)
+    logs = _logs()
+
+    batch = asyncio.run(analyzer.analyze_batch_async(logs))
+
+    assert [result.log_entry for result in batch.results] == logs
+    assert [result.analysis_source for result in batch.results] == [
+        "ai_enhanced", "ai_enhanced", "error", "rules_only", "rules_only"
+    ]
+    assert batch.total_logs == 5
+    assert batch.failed_analyses == 1
+    assert batch.successful_analyses == 4
+    assert analyzer.performance_stats['ai_failures'] == 2
+
+    # 需要AI分析的日志只发起一次合并调用，规则名称随日志传入
+    assert len(ai.calls) == 1
+    paths, rule_names, k = ai.calls[0]
+    assert paths == ['/hit?id=1', '/index', '/hit-none', '/about-none']
+    assert rule_names == [['SQL注入'], [], ['SQL注入'], []]
+    assert k == max(1, analyzer.batch_size)
+
+
+def test_batch_async_times_each_entry():
+    """各条目的处理耗时为分摊后的自身耗时，合计不超过整批耗时"""
+    analyzer = IntelligentLogAnalyzer(_StubRuleEngine(), _StubAIAnalyzer(delay=0.2))
+    logs = _logs()
+
+    batch = asyncio.run(analyzer.analyze_batch_async(logs))
+
+    times = [result.processing_time for result in batch.results]
+    assert all(0.0 <= t < batch.processing_time for t in times)
+    assert sum(times) <= batch.processing_time + 1e-3
+    # 四条AI分析条目分摊一次0.2秒的合并调用
+    assert all(t >= 0.04 for t, result in zip(times, batch.results) if result.analysis_source != "error")
+    assert analyzer.performance_stats['total_processing_time'] <= batch.processing_time + 1e-3
+
+
+def test_batch_async_survives_marshaled_call_failure():
+    """合并AI调用抛出异常时退回规则结果，需增强分析的条目计为AI失败"""
+    analyzer = IntelligentLogAnalyzer(_StubRuleEngine(), _StubAIAnalyzer(raise_error=True))
+    logs = _logs()
+
+    batch = asyncio.run(analyzer.analyze_batch_async(logs))
+
+    assert [result.log_entry for result in batch.results] == logs
+    assert [result.analysis_source for result in batch.results] == [
+        "rules_only", "rules_only", "error", "rules_only", "rules_only"
+    ]
+    assert batch.results[0].final_threat_score == 8.0
+    assert batch.failed_analyses == 1
+    assert analyzer.performance_stats['ai_failures'] == 4
+
+
+def test_match_cache_returns_independent_copies():
+    """相同日志命中匹配缓存，调用方修改返回结果不影响后续命中"""
+    rule_engine = _StubRuleEngine()
+    analyzer = IntelligentLogAnalyzer(rule_engine)
+    analyzer.match_cache_size = 16
+    first_entry = {'src_ip': '10.0.0.1', 'request_path': '/hit?id=1', 'timestamp': '2024-01-01 10:00:00'}
+    second_entry = dict(first_entry, timestamp='2024-01-01 10:00:05')
+
+    first = analyzer._match_rules(first_entry)
+    first[0]['threat_score'].score = 1.0
+    first[0]['threat_score'].attack_vectors.append('tampered')
+    first[0]['details']['matched_fields'].append('tampered')
+
+    second = analyzer._match_rules(second_entry)
+    assert rule_engine.match_calls == 1
+    assert second[0]['log_entry'] is second_entry
+    assert second[0]['threat_score'].score == 8.0
+    assert second[0]['threat_score'].attack_vectors == ['sql_injection']
+    assert second[0]['details']['matched_fields'] == ['request_path']
+    assert rule_engine.rule_stats['sql-001'] == 1
+
+    # 内容不同的日志不会命中缓存
+    analyzer._match_rules(dict(first_entry, request_path='/hit?id=2'))
+    assert rule_engine.match_calls == 2
+
+
+def test_match_cache_can_be_disabled():
+    """match_cache_size为0时每次都执行规则匹配"""
+    rule_engine = _StubRuleEngine()
+    analyzer = IntelligentLogAnalyzer(rule_engine)
+    analyzer.match_cache_size = 0
+    entry = {'src_ip': '10.0.0.1', 'request_path': '/hit?id=1'}
+
+    analyzer._match_rules(entry)
+    analyzer._match_rules(entry)
+    assert rule_engine.match_calls == 2
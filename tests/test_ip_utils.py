@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+IP工具测试用例
+使用桩定位器，不依赖GeoIP数据库文件
+"""
+
+import ipaddress
+import sys
+from collections import Counter
+from pathlib import Path
+
+import pytest
+
+# 添加项目根目录到路径
+sys.path.append(str(Path(__file__).parent.parent))
+
+pytest.importorskip("geoip2")
+
+import core.ip_utils as ip_utils
+
+
+class _StubLocator:
+    """只判断内网地址并记录调用次数的定位器"""
+
+    def __init__(self):
+        self.calls = []
+
+    def is_private_ip(self, ip):
+        self.calls.append(ip)
+        return ipaddress.ip_address(ip).is_private
+
+
+@pytest.fixture
+def locator(monkeypatch):
+    stub = _StubLocator()
+    monkeypatch.setattr(ip_utils, "_get_locator", lambda db_path: stub)
+    return stub
+
+
+_EXPECTED = (
+    {'10.0.0.1': 3, '192.168.1.5': 1},
+    {'8.8.8.8': 2},
+)
+
+
+@pytest.mark.parametrize("ip_input", [
+    ['10.0.0.1', '8.8.8.8', '10.0.0.1', '192.168.1.5', '8.8.8.8', '10.0.0.1'],
+    Counter({'10.0.0.1': 3, '8.8.8.8': 2, '192.168.1.5': 1}),
+    {'10.0.0.1': 3, '8.8.8.8': 2, '192.168.1.5': 1},
+])
+def test_analyze_ip_access_accepts_list_and_counts(locator, ip_input):
+    """IP列表、Counter和普通计数字典得到相同的分组统计，每个IP只判断一次"""
+    internal_ips, external_ips = ip_utils.analyze_ip_access(ip_input, 'unused.mmdb')
+
+    assert (internal_ips, external_ips) == _EXPECTED
+    assert sorted(locator.calls) == ['10.0.0.1', '192.168.1.5', '8.8.8.8']
+    # 分组结果按访问次数从高到低排列
+    assert list(internal_ips) == ['10.0.0.1', '192.168.1.5']
+
+
+def test_analyze_ip_access_empty_input(locator):
+    """空输入返回两个空字典"""
+    assert ip_utils.analyze_ip_access(Counter(), 'unused.mmdb') == ({}, {})
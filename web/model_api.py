@@ -1431,7 +1431,7 @@ def get_ai_config():
         config = config_manager.get_full_config()
         return jsonify({
             "success": True,
-            "config": config
+            "config": dict(config)
         })
     except Exception as e:
         logger.error(f"获取AI配置失败: {e}")
@@ -1601,7 +1601,7 @@ def add_model_mapping():
         display_name = data['display_name']
 
         # 获取当前配置
-        config = config_manager.get_full_config()
+        config = config_manager.config
         lm_config = config.setdefault('lm_studio', {})
         model_config = lm_config.setdefault('model', {})
         model_mapping = model_config.setdefault('model_mapping', {})
@@ -1645,7 +1645,7 @@ def remove_model_mapping():
         actual_model_id = data['actual_model_id']
 
         # 获取当前配置
-        config = config_manager.get_full_config()
+        config = config_manager.config
         lm_config = config.get('lm_studio', {})
         model_config = lm_config.get('model', {})
         model_mapping = model_config.get('model_mapping', {})